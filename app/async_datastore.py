@@ -0,0 +1,132 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bootstrap
+import datastore
+from utils.kdf_service import get_kdf_service
+
+# Bulk decryption gets its own workers so revealing a large vault cannot hold up the
+# quick SQLite calls, which use asyncio's default executor. Created on first use with
+# CRYPTO_WORKERS threads.
+_crypto_executor = None
+_crypto_executor_lock = threading.Lock()
+# Calls that derive a master key get one thread per KDF service slot, so every admitted
+# call waits in the service's bounded queue and the process pool is kept busy
+_kdf_executor = None
+_kdf_executor_lock = threading.Lock()
+
+
+def _get_kdf_executor(capacity: int) -> ThreadPoolExecutor:
+    global _kdf_executor
+    with _kdf_executor_lock:
+        if _kdf_executor is None:
+            _kdf_executor = ThreadPoolExecutor(max_workers=capacity, thread_name_prefix='kdf')
+        return _kdf_executor
+
+
+def _get_crypto_executor() -> ThreadPoolExecutor:
+    global _crypto_executor
+    with _crypto_executor_lock:
+        if _crypto_executor is None:
+            _crypto_executor = ThreadPoolExecutor(max_workers=bootstrap.settings().crypto_workers,
+                                                  thread_name_prefix='crypto')
+        return _crypto_executor
+
+
+async def _run_crypto(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_crypto_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def _run_kdf(func, *args, **kwargs):
+    # Admission happens here, before anything is queued: a call over the KDF service's
+    # capacity raises KdfBusyError straight away
+    service = get_kdf_service()
+    with service.admit():
+        loop = asyncio.get_running_loop()
+        executor = _get_kdf_executor(service.capacity())
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def _run_io(func, *args, **kwargs):
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+async def master_password_exists(username: str) -> bool:
+    return await _run_io(datastore.master_password_exists, username)
+
+
+async def set_master_password(username: str, master_password: str) -> bool:
+    return await _run_kdf(datastore.set_master_password, username, master_password)
+
+
+async def check_master_password(username: str, master_password: str) -> bool:
+    return await _run_kdf(datastore.check_master_password, username, master_password)
+
+
+async def register(username: str, master_password: str):
+    return await _run_kdf(datastore.register, username, master_password)
+
+
+async def authenticate(username: str, master_password: str, on_progress=None):
+    return await _run_kdf(datastore.authenticate, username, master_password, on_progress)
+
+
+async def unlock(username: str, master_password: str, on_progress=None):
+    return await _run_kdf(datastore.unlock, username, master_password, on_progress)
+
+
+async def get_meta(username: str):
+    return await _run_io(datastore.get_meta, username)
+
+
+async def update_master_password(username: str, old_master_password: str, new_master_password: str, on_progress=None) -> bool:
+    return await _run_kdf(datastore.update_master_password, username, old_master_password, new_master_password, on_progress)
+
+
+async def save_password(meta_id: int, username: str, platform: str, password: str, keys):
+    return await _run_io(datastore.save_password, meta_id, username, platform, password, keys)
+
+
+async def get_all_passwords(meta_id: int, keys, show_real_passwords=False):
+    run = _run_crypto if show_real_passwords else _run_io
+    return await run(datastore.get_all_passwords, meta_id, keys, show_real_passwords=show_real_passwords)
+
+
+async def get_passwords_page(meta_id: int, sort_by: str = 'date', descending: bool = False,
+                             filter_text: str = '', after: tuple | None = None, offset: int = 0,
+                             limit: int = datastore.PAGE_SIZE) -> list:
+    return await _run_io(datastore.get_passwords_page, meta_id, sort_by, descending, filter_text, after, offset, limit)
+
+
+async def count_passwords(meta_id: int, filter_text: str = '') -> int:
+    return await _run_io(datastore.count_passwords, meta_id, filter_text)
+
+
+async def search_passwords(meta_id: int, query_text: str, limit: int = datastore.SEARCH_LIMIT) -> list[int]:
+    return await _run_io(datastore.search_passwords, meta_id, query_text, limit)
+
+
+async def get_passwords_by_ids(meta_id: int, password_ids: list[int]) -> list:
+    return await _run_io(datastore.get_passwords_by_ids, meta_id, password_ids)
+
+
+async def get_password_by_id(password_id: int, meta_id: int, keys):
+    return await _run_io(datastore.get_password_by_id, password_id, meta_id, keys)
+
+
+async def delete_password(meta_id: int, password_id: int) -> bool:
+    return await _run_io(datastore.delete_password, meta_id, password_id)
+
+
+async def update_password(meta_id: int, password_id: int, username: str, platform: str, password: str, keys) -> bool:
+    return await _run_io(datastore.update_password, meta_id, password_id, username, platform, password, keys)
+
+
+async def backfill_audit(meta_id: int, keys, on_progress=None) -> int:
+    return await _run_crypto(datastore.backfill_audit, meta_id, keys, on_progress)
+
+
+async def get_vault_audit(meta_id: int, keys) -> tuple[list, list]:
+    return await _run_io(datastore.get_vault_audit, meta_id, keys)
@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from sqlalchemy import insert
+import bootstrap
+import datastore
+import utils.password_utils as pe
+from model.models import Password
+from services.password_service import PasswordService
+from storage import create_storage_engine
+from utils.key_ring import KeyRing
+
+# python app/benchmark.py [--sizes 10,1000,100000] [--save] [--threshold 0.25]
+# Times the crypto and datastore hot paths and compares them with a saved JSON baseline.
+# The run fails when an operation got slower than the baseline by more than the threshold.
+
+VAULT_SIZES = (10, 1_000, 100_000)
+ROUNDS = 5
+# Each round repeats the call until it has run at least this long
+MIN_ROUND_TIME = 0.2
+MASTER_PASSWORDS = ('BenchMaster1!', 'BenchMaster2!')
+# Seeded entries cycle through this many distinct passwords, so seeding 100k rows does
+# not spend minutes on strength estimates
+DISTINCT_PASSWORDS = 1_000
+
+
+def measure(func, rounds: int = ROUNDS, min_round_time: float = MIN_ROUND_TIME) -> dict:
+    # Seconds per call: the fastest round, which is the least disturbed by the rest of the
+    # machine, and the median round
+    loops = 1
+    while True:
+        elapsed = _time_loops(func, loops)
+        if elapsed >= min_round_time or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_round_time / 10 else 2
+    timings = [elapsed / loops] + [_time_loops(func, loops) / loops for _ in range(rounds - 1)]
+    return {'min': min(timings), 'median': statistics.median(timings), 'loops': loops}
+
+
+def _time_loops(func, loops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return time.perf_counter() - started
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> list[tuple[str, float]]:
+    # (name, slowdown) for every benchmark slower than its baseline by more than threshold;
+    # benchmarks missing on either side are skipped
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        slowdown = result['min'] / previous['min'] - 1
+        if slowdown > threshold:
+            regressions.append((name, slowdown))
+    return regressions
+
+
+def _seed_vault(size: int) -> tuple[int, KeyRing]:
+    username = f'bench{size}'
+    meta, keys = datastore.register(username, MASTER_PASSWORDS[0])
+    passwords = [f'Bench#{i:04d}-{size}' for i in range(min(size, DISTINCT_PASSWORDS))]
+    audit = {password: datastore._audit_fields(password, keys) for password in passwords}
+    rows = []
+    for i in range(size):
+        password = passwords[i % len(passwords)]
+        fingerprint, strength = audit[password]
+        rows.append({'meta_id': meta.id, 'username': f'user{i}', 'platform': f'site{i}.com',
+                     'password': keys.encrypt(password), 'fingerprint': fingerprint, 'strength': strength})
+    with datastore._get_engine().begin() as connection:
+        connection.execute(insert(Password), rows)
+    return meta.id, keys
+
+
+def _micro_benchmarks() -> dict:
+    params = pe.new_kdf_params()
+    encrypted = pe.encrypt_password('secret', MASTER_PASSWORDS[0])
+    service = PasswordService('bench', 0, KeyRing.generate())
+    return {
+        'kdf.derive_key': lambda: pe.derive_key(MASTER_PASSWORDS[0]),
+        f'kdf.derive_master_key[{params.algorithm}]': lambda: pe.derive_master_key(MASTER_PASSWORDS[0], params),
+        'kdf.encrypt_password': lambda: pe.encrypt_password('secret', MASTER_PASSWORDS[0]),
+        'kdf.decrypt_password': lambda: pe.decrypt_password(encrypted, MASTER_PASSWORDS[0]),
+        'service.generate': lambda: service.generate(16),
+        'service.check_strength': lambda: service.check_strength('Tr0ub4dour&3horse'),
+    }
+
+
+def _vault_benchmarks(size: int) -> dict:
+    meta_id, keys = _seed_vault(size)
+    username = f'bench{size}'
+    current = [0]
+
+    def rotate_master_password():
+        old, new = MASTER_PASSWORDS[current[0]], MASTER_PASSWORDS[1 - current[0]]
+        assert datastore.update_master_password(username, old, new)
+        current[0] = 1 - current[0]
+
+    return {
+        f'datastore.get_all_passwords[{size}]': lambda: datastore.get_all_passwords(meta_id, keys),
+        f'datastore.get_all_passwords_reveal[{size}]': lambda: datastore.get_all_passwords(meta_id, keys, show_real_passwords=True),
+        f'datastore.update_master_password[{size}]': rotate_master_password,
+    }
+
+
+def run(sizes=VAULT_SIZES, rounds: int = ROUNDS, name_filter: str = '', out=sys.stdout) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_storage_engine(db_file_name=os.path.join(directory, 'bench.db'))
+        datastore._engine = engine
+        datastore.init_database()
+        try:
+            suites = [_micro_benchmarks] + [lambda size=size: _vault_benchmarks(size) for size in sizes]
+            for suite in suites:
+                for name, func in suite().items():
+                    if name_filter not in name:
+                        continue
+                    results[name] = measure(func, rounds)
+                    print(f'{name:<50} {results[name]["min"] * 1000:>10.3f} ms  '
+                          f'(median {results[name]["median"] * 1000:.3f} ms, {results[name]["loops"]} loops)', file=out)
+        finally:
+            engine.dispose()
+    return results
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def save_baseline(results: dict, path: str):
+    # Timings only compare on the same kind of host, so the baseline notes where it ran
+    document = {
+        'host': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'kdf': {'algorithm': pe.kdf_policy()[0], 'cost': pe.kdf_policy()[1]},
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def main(argv=None) -> int:
+    # Loads .env first; the modules imported above read their settings only when used, so
+    # KDF_* and DB_* apply here as they do in the app
+    settings = bootstrap.settings()
+    parser = argparse.ArgumentParser(description='Benchmark the crypto and datastore hot paths.')
+    parser.add_argument('--sizes', default=','.join(map(str, VAULT_SIZES)), help='vault sizes to seed')
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--baseline', default=settings.bench_baseline_path)
+    parser.add_argument('--threshold', type=float, default=settings.bench_threshold, help='allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--save', action='store_true', help='write this run as the new baseline')
+    args = parser.parse_args(argv)
+
+    results = run([int(size) for size in args.sizes.split(',') if size], args.rounds, args.filter)
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f'No baseline at {args.baseline}, run with --save to create one')
+        return 0
+    regressions = compare(baseline, results, args.threshold)
+    for name, slowdown in regressions:
+        print(f'REGRESSION {name}: {slowdown:+.0%} against the baseline')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# python app/bootstrap.py [--budget-ms 2000] [--top 15] [module ...]
+# Start-up happens in one place: load_config() reads .env before any module looks at its
+# settings, then main() imports the app. The import report shows where start-up time goes.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# What main() imports before the server starts
+STARTUP_MODULES = ('datastore', 'ui.layout', 'ui.metrics_route', 'ui.profiling_route')
+
+
+class Settings:
+    # Every setting the app reads from the environment, parsed once by load_config(). Modules
+    # look them up through settings() when they use them, never at import time, so the
+    # order in which they are imported does not matter.
+
+    def __init__(self, environ):
+        def flag(name: str) -> bool:
+            return environ.get(name, '').lower() in ('1', 'true', 'yes')
+
+        self.db_profile = environ.get('DB_PROFILE', 'default')
+        self.db_file_name = environ.get('DB_FILE_NAME')
+        self.salt = environ.get('SALT')
+        self.styles_path = environ.get('STYLES_PATH')
+        self.storage_secret = environ.get('STORAGE_SECRET')
+        # Empty picks the strongest algorithm installed, see utils/password_utils.py
+        self.kdf_algorithm = environ.get('KDF_ALGORITHM') or None
+        self.kdf_target_ms = int(environ.get('KDF_TARGET_MS', 250))
+        self.kdf_upgrade_margin = float(environ.get('KDF_UPGRADE_MARGIN', 0.25))
+        self.kdf_workers = int(environ.get('KDF_WORKERS', os.cpu_count() or 1))
+        self.kdf_max_queue = int(environ.get('KDF_MAX_QUEUE', 32))
+        self.crypto_workers = int(environ.get('CRYPTO_WORKERS', min(4, os.cpu_count() or 1)))
+        self.key_ring_ttl = int(environ.get('KEY_RING_TTL', 900))
+        self.session_capacity = int(environ.get('SESSION_CAPACITY', 500))
+        self.session_ttl = int(environ.get('SESSION_TTL', self.key_ring_ttl))
+        self.metrics_enabled = flag('METRICS_ENABLED')
+        self.profile_enabled = flag('PROFILE_ENABLED')
+        self.profile_dir = environ.get('PROFILE_DIR', os.path.join(APP_DIR, 'profiles'))
+        self.profile_threshold_ms = float(environ.get('PROFILE_THRESHOLD_MS', 500))
+        self.profile_keep = int(environ.get('PROFILE_KEEP', 50))
+        self.profile_admin_token = environ.get('PROFILE_ADMIN_TOKEN')
+        self.wordlist_path = environ.get('WORDLIST_PATH', os.path.join(APP_DIR, 'wordlists', 'passphrase.txt'))
+        self.breach_corpus_path = environ.get('BREACH_CORPUS_PATH', os.path.join(APP_DIR, 'breach', 'pwned.bin'))
+        self.bench_baseline_path = environ.get('BENCH_BASELINE_PATH', os.path.join(APP_DIR, 'bench_baseline.json'))
+        self.bench_threshold = float(environ.get('BENCH_THRESHOLD', 0.25))
+        self.import_budget_ms = float(environ.get('IMPORT_BUDGET_MS', 2000))
+
+
+_settings = None
+
+
+def load_config():
+    # The only load_dotenv() call; later calls do nothing. Variables already set in the
+    # environment win over .env.
+    global _settings
+    if _settings is not None:
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    _settings = Settings(os.environ)
+
+
+def settings() -> Settings:
+    # Loads the configuration if start-up has not done so yet, e.g. in tests and tools
+    load_config()
+    return _settings
+
+
+def _import_times(code: str) -> list[tuple[str, float, float]]:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=APP_DIR, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.rstrip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def import_report(modules=STARTUP_MODULES) -> tuple[float, list[tuple[str, float, float]]]:
+    # Total import time in ms and (module, self ms, cumulative ms) for every module loaded,
+    # measured by `python -X importtime` in a fresh interpreter. Modules the interpreter
+    # loads on its own are left out.
+    interpreter = {name.strip() for name, _, _ in _import_times('pass')}
+    rows = [row for row in _import_times(f'import bootstrap; bootstrap.load_config(); import {", ".join(modules)}')
+            if row[0].strip() not in interpreter]
+    return sum(self_ms for _, self_ms, _ in rows), rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Report the import time of the app start-up.')
+    parser.add_argument('modules', nargs='*', default=STARTUP_MODULES)
+    parser.add_argument('--budget-ms', type=float, default=settings().import_budget_ms)
+    parser.add_argument('--top', type=int, default=15, help='slowest top-level imports to list')
+    args = parser.parse_args(argv)
+
+    total, rows = import_report(args.modules)
+    # Top-level imports carry a single leading space; nested ones are indented further
+    top_level = [row for row in rows if not row[0].startswith('  ')]
+    for name, _, cumulative in sorted(top_level, key=lambda row: -row[2])[:args.top]:
+        print(f'{cumulative:>9.1f} ms  {name.strip()}')
+    print(f'{total:>9.1f} ms  total for {len(rows)} modules (budget {args.budget_ms:.0f} ms)')
+    if total > args.budget_ms:
+        print('Import time is over budget')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,23 +1,63 @@
-import os
+import threading
 import utils.password_utils as pe
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from utils.key_ring import KeyRing
+from utils import metrics
+from sqlalchemy import func, inspect, or_, select, text, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
 from model.models import Base, Meta, Password
+from storage import create_storage_engine
+from search_index import create_search_index, search
+from utils.strength import LABELS, estimate_strength
 
-DB_FILE_NAME = os.getenv('DB_FILE_NAME')
+# Built on first use, once the configuration has been loaded (see bootstrap.load_config)
+_engine = None
+_engine_lock = threading.Lock()
 
-load_dotenv()
-
-_engine = create_engine(f"sqlite:///{DB_FILE_NAME}")
+ROTATION_CHUNK_SIZE = 500
+PAGE_SIZE = 25
+SEARCH_LIMIT = 200
+EXPORT_CHUNK_SIZE = 500
+AUDIT_CHUNK_SIZE = 500
+# Scores below this are listed as weak by the vault audit
+WEAK_SCORE = 2
+SORT_COLUMNS = {
+    'username': Password.username,
+    'platform': Password.platform,
+    'date': Password.created_at,
+}
 
 
 def _get_engine():
-    return _engine
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_storage_engine()
+        return _engine
 
 
 def init_database():
     Base.metadata.create_all(_get_engine())
+    _upgrade_schema()
+    with _get_engine().begin() as connection:
+        create_search_index(connection)
+
+
+def _upgrade_schema():
+    # create_all() does not touch existing tables, so add columns introduced later
+    engine = _get_engine()
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
 
 
 def master_password_exists(username: str) -> bool:
@@ -25,14 +65,38 @@ def master_password_exists(username: str) -> bool:
         return session.query(Meta).filter_by(username=username).first() is not None
 
 
+@metrics.timed('db', 'register')
+def register(username: str, master_password: str) -> tuple[Meta, KeyRing] | None:
+    # Creates the user and returns it with its data key ready for the session, deriving the
+    # master key once. A taken username is caught by the unique constraint on insert
+    # instead of a lookup first; None means the name is taken.
+    params = pe.new_kdf_params()
+    master_keys = KeyRing.from_master(master_password, params)
+    data_keys = KeyRing.generate()
+    try:
+        meta = Meta(
+            username=username,
+            master_password=master_keys.encrypt(master_password),
+            data_key=master_keys.wrap(data_keys),
+            **params.to_columns(),
+        )
+        with Session(_get_engine(), expire_on_commit=False) as session:
+            session.add(meta)
+            session.commit()
+        return meta, data_keys
+    except IntegrityError:
+        data_keys.wipe()
+        return None
+    finally:
+        master_keys.wipe()
+
+
 def set_master_password(username: str, master_password: str) -> bool:
-    with Session(_get_engine()) as session:
-        if session.query(Meta).filter_by(username=username).first() is not None:
-            return False
-        encrypted_master = pe.encrypt_password(master_password, master_password)
-        session.add(Meta(username=username, master_password=encrypted_master))
-        session.commit()
-        return True
+    registered = register(username, master_password)
+    if registered is None:
+        return False
+    registered[1].wipe()
+    return True
 
 
 def check_master_password(username: str, master_password: str) -> bool:
@@ -40,11 +104,11 @@ def check_master_password(username: str, master_password: str) -> bool:
         meta = session.query(Meta).filter_by(username=username).first()
         if meta is None:
             return False
-        try:
-            decrypted = pe.decrypt_password(meta.master_password, master_password)
-            return decrypted == master_password
-        except Exception:
-            return False
+    keys = KeyRing.from_master(master_password, pe.KdfParams.from_meta(meta))
+    try:
+        return _verify(keys, meta.master_password, master_password)
+    finally:
+        keys.wipe()
 
 
 def get_meta(username: str) -> Meta | None:
@@ -53,41 +117,167 @@ def get_meta(username: str) -> Meta | None:
 
 
 def _reencrypt_all_passwords(
-        session: Session,
         meta_id: int,
-        old_master_password: str,
-        new_master_password: str) -> bool:
-    passwords = session.query(Password).filter_by(meta_id=meta_id).all()
-    for pwd in passwords:
-        try:
-            decrypted = pe.decrypt_password(pwd.password, old_master_password)
-            pwd.password = pe.encrypt_password(decrypted, new_master_password)
-        except Exception:
-            return False
-    return True
+        old_keys: KeyRing,
+        new_keys: KeyRing,
+        on_progress=None):
+    # Streams the vault in chunks ordered by id. Every chunk is committed together with
+    # meta.rotation_cursor, so an interrupted rotation picks up after the last chunk.
+    # Rows the old key cannot decrypt are left as they are and counted in
+    # meta.unreadable_entries.
+    with Session(_get_engine()) as session:
+        meta = session.get(Meta, meta_id)
+        vault = session.query(Password).filter(Password.meta_id == meta_id)
+        total = vault.with_entities(func.count(Password.id)).scalar()
+        done = vault.filter(Password.id <= meta.rotation_cursor).with_entities(func.count(Password.id)).scalar()
+        if on_progress:
+            on_progress(done, total)
+        while True:
+            chunk = (vault.filter(Password.id > meta.rotation_cursor)
+                     .order_by(Password.id)
+                     .limit(ROTATION_CHUNK_SIZE)
+                     .all())
+            if not chunk:
+                return
+            decrypted = old_keys.decrypt_many([pwd.password for pwd in chunk])
+            for pwd, plain in zip(chunk, decrypted):
+                if plain is None:
+                    meta.unreadable_entries = (meta.unreadable_entries or 0) + 1
+                    continue
+                pwd.password = new_keys.encrypt(plain)
+                pwd.fingerprint, pwd.strength = _audit_fields(plain, new_keys)
+            meta.rotation_cursor = chunk[-1].id
+            session.commit()
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, total)
+
+
+@metrics.timed('db', 'login')
+def authenticate(username: str, master_password: str, on_progress=None) -> tuple[Meta, KeyRing] | None:
+    # Login in one query and one key derivation: returns the user row and its unwrapped
+    # data key, or None for an unknown user or a wrong master password. Accounts whose
+    # KDF parameters are behind the current policy are re-keyed on the way.
+    with Session(_get_engine(), expire_on_commit=False) as session:
+        meta = session.query(Meta).filter_by(username=username).first()
+    if meta is None:
+        return None
+    params = pe.KdfParams.from_meta(meta)
+    master_keys = KeyRing.from_master(master_password, params)
+    try:
+        if not _verify(master_keys, meta.master_password, master_password):
+            return None
+        if meta.data_key is not None:
+            data_keys = master_keys.unwrap(meta.data_key)
+        else:
+            data_keys = _migrate_to_data_key(meta.id, master_keys, on_progress)
+            meta = get_meta(username)
+        if params.needs_upgrade():
+            meta = _upgrade_kdf(meta, master_password, data_keys)
+        return meta, data_keys
+    finally:
+        master_keys.wipe()
+
+
+def _upgrade_kdf(meta: Meta, master_password: str, data_keys: KeyRing) -> Meta:
+    # Re-wraps the data key under a master key derived with the current policy and a fresh
+    # salt. Only the meta row changes; the entries stay encrypted under the data key.
+    params = pe.new_kdf_params(pe.KdfParams.from_meta(meta))
+    new_keys = KeyRing.from_master(master_password, params)
+    try:
+        with Session(_get_engine(), expire_on_commit=False) as session:
+            meta = session.get(Meta, meta.id)
+            meta.master_password = new_keys.encrypt(master_password)
+            meta.data_key = new_keys.wrap(data_keys)
+            for column, value in params.to_columns().items():
+                setattr(meta, column, value)
+            session.commit()
+            return meta
+    finally:
+        new_keys.wipe()
+
 
+def unlock(username: str, master_password: str, on_progress=None) -> KeyRing | None:
+    authenticated = authenticate(username, master_password, on_progress)
+    return authenticated[1] if authenticated is not None else None
 
+
+def _migrate_to_data_key(meta_id: int, master_keys: KeyRing, on_progress=None) -> KeyRing:
+    # Vaults created before envelope encryption have their entries encrypted with the master
+    # password key. They are re-encrypted once under a new data key, which stays in
+    # meta.rotation_key until every chunk is done. The master password is already verified,
+    # so entries that fail to decrypt do not block the login; they are counted in
+    # meta.unreadable_entries and read back as None like any other broken row.
+    with Session(_get_engine()) as session:
+        meta = session.get(Meta, meta_id)
+        if meta.rotation_key is None:
+            data_keys = KeyRing.generate()
+            meta.rotation_key = master_keys.wrap(data_keys)
+            meta.rotation_cursor = 0
+            meta.unreadable_entries = None
+            session.commit()
+        else:
+            data_keys = master_keys.unwrap(meta.rotation_key)
+
+    _reencrypt_all_passwords(meta_id, master_keys, data_keys, on_progress)
+
+    with Session(_get_engine()) as session:
+        meta = session.get(Meta, meta_id)
+        meta.data_key = meta.rotation_key
+        meta.rotation_key = None
+        meta.rotation_cursor = None
+        session.commit()
+    return data_keys
+
+
+@metrics.timed('db', 'rotate')
 def update_master_password(
         username: str,
         old_master_password: str,
-        new_master_password: str) -> bool:
-    if not check_master_password(username, old_master_password):
+        new_master_password: str,
+        on_progress=None) -> bool:
+    # Only the wrapped data key changes, the entries themselves are left untouched
+    authenticated = authenticate(username, old_master_password, on_progress)
+    if authenticated is None:
         return False
-    with Session(_get_engine()) as session:
-        meta = session.query(Meta).filter_by(username=username).first()
-        reencrypted = _reencrypt_all_passwords(session, meta.id, old_master_password, new_master_password)
-        if not reencrypted:
-            return False
-        meta.master_password = pe.encrypt_password(new_master_password, new_master_password)
-        session.commit()
-        return True
+    meta, data_keys = authenticated
+    params = pe.new_kdf_params(pe.KdfParams.from_meta(meta))
+    new_keys = KeyRing.from_master(new_master_password, params)
+    try:
+        with Session(_get_engine()) as session:
+            meta = session.query(Meta).filter_by(username=username).first()
+            meta.master_password = new_keys.encrypt(new_master_password)
+            meta.data_key = new_keys.wrap(data_keys)
+            for column, value in params.to_columns().items():
+                setattr(meta, column, value)
+            session.commit()
+            return True
+    finally:
+        data_keys.wipe()
+        new_keys.wipe()
+
+
+def _verify(keys: KeyRing, encrypted_master: str, master_password: str) -> bool:
+    try:
+        return keys.decrypt(encrypted_master) == master_password
+    except Exception:
+        return False
+
 
+def _audit_fields(password: str, keys: KeyRing) -> tuple[str, str]:
+    # (fingerprint, strength) as stored on a Password row. Both are MACs under the session
+    # key, so equal passwords share a fingerprint but the column reveals nothing by itself.
+    return keys.mac(f'password:{password}'), keys.mac(f'strength:{estimate_strength(password).score}')
 
-def save_password(meta_id: int, username: str, platform: str, password: str, master_password: str):
-    encrypted_password = pe.encrypt_password(password, master_password)
+
+@metrics.timed('db', 'save')
+def save_password(meta_id: int, username: str, platform: str, password: str, keys: KeyRing):
+    encrypted_password = keys.encrypt(password)
+    fingerprint, strength = _audit_fields(password, keys)
     with Session(_get_engine()) as session:
         try:
-            entry = Password(meta_id=meta_id, username=username, platform=platform, password=encrypted_password)
+            entry = Password(meta_id=meta_id, username=username, platform=platform, password=encrypted_password,
+                             fingerprint=fingerprint, strength=strength)
             session.add(entry)
             session.commit()
             return entry.id
@@ -96,28 +286,143 @@ def save_password(meta_id: int, username: str, platform: str, password: str, mas
             return None
 
 
-def get_all_passwords(meta_id: int, master_password: str, show_real_passwords=False):
+@metrics.timed('db', 'save_bulk')
+def save_passwords_bulk(meta_id: int, entries: list, keys: KeyRing) -> tuple[int, list]:
+    # Inserts (username, platform, password) entries in one transaction with a single
+    # executemany. Entries clashing with the vault or with an earlier entry of the same
+    # batch are left out and returned as (username, platform) pairs instead of failing it.
+    # The lookup skips encrypting known duplicates; ON CONFLICT DO NOTHING catches entries
+    # saved concurrently after it.
     with Session(_get_engine()) as session:
-        rows = session.query(Password).filter_by(meta_id=meta_id).all()
-        results = []
-        for row in rows:
-            if show_real_passwords:
-                password = pe.decrypt_password(row.password, master_password)
-            else:
-                password = '********'
-            results.append((row.id, row.username, row.platform, password, row.created_at))
-        return results
+        pairs = {(username, platform) for username, platform, _ in entries}
+        taken = set(
+            session.query(Password.username, Password.platform)
+            .filter(Password.meta_id == meta_id, tuple_(Password.username, Password.platform).in_(pairs))
+            .all()
+        )
+        fresh, duplicates = [], []
+        for username, platform, password in entries:
+            if (username, platform) in taken:
+                duplicates.append((username, platform))
+                continue
+            taken.add((username, platform))
+            fresh.append((username, platform, password))
+        inserted = set()
+        if fresh:
+            rows = []
+            for username, platform, password in fresh:
+                fingerprint, strength = _audit_fields(password, keys)
+                rows.append({'meta_id': meta_id, 'username': username, 'platform': platform,
+                             'password': keys.encrypt(password), 'fingerprint': fingerprint, 'strength': strength})
+            statement = sqlite_insert(Password).on_conflict_do_nothing().returning(Password.username, Password.platform)
+            inserted = {tuple(row) for row in session.execute(statement, rows)}
+            session.commit()
+        duplicates += [(username, platform) for username, platform, _ in fresh if (username, platform) not in inserted]
+        return len(inserted), duplicates
+
+
+def get_all_passwords(meta_id: int, keys: KeyRing, show_real_passwords=False):
+    with metrics.timed('db', 'reveal_all' if show_real_passwords else 'list'), Session(_get_engine()) as session:
+        rows = session.query(Password).filter_by(meta_id=meta_id).order_by(Password.id).all()
+        if show_real_passwords:
+            # Rows that cannot be decrypted come back with None as password
+            passwords = keys.decrypt_many([row.password for row in rows])
+        else:
+            passwords = ['********'] * len(rows)
+        return [
+            (row.id, row.username, row.platform, password, row.created_at)
+            for row, password in zip(rows, passwords)
+        ]
     
-def get_password_by_id(password_id: int, meta_id: int, master_password: str) -> str | None:
+def _filtered_vault(session: Session, meta_id: int, filter_text: str):
+    query = session.query(Password).filter(Password.meta_id == meta_id)
+    if filter_text:
+        pattern = f"%{filter_text}%"
+        query = query.filter(or_(Password.username.like(pattern), Password.platform.like(pattern)))
+    return query
+
+
+@metrics.timed('db', 'page')
+def get_passwords_page(
+        meta_id: int,
+        sort_by: str = 'date',
+        descending: bool = False,
+        filter_text: str = '',
+        after: tuple | None = None,
+        offset: int = 0,
+        limit: int = PAGE_SIZE) -> list:
+    # `after` is the (sort value, id) key of the last row of the previous page. With it the
+    # page is an index range scan; `offset` is only the fallback for jumping to a page.
+    column = SORT_COLUMNS[sort_by]
+    with Session(_get_engine()) as session:
+        query = _filtered_vault(session, meta_id, filter_text)
+        if after is not None:
+            key, value = tuple_(column, Password.id), tuple_(*after)
+            query = query.filter(key < value if descending else key > value)
+        if descending:
+            query = query.order_by(column.desc(), Password.id.desc())
+        else:
+            query = query.order_by(column, Password.id)
+        if after is None and offset:
+            query = query.offset(offset)
+        rows = query.limit(limit).all()
+        return [(row.id, row.username, row.platform, '********', row.created_at) for row in rows]
+
+
+@metrics.timed('db', 'count')
+def count_passwords(meta_id: int, filter_text: str = '') -> int:
+    with Session(_get_engine()) as session:
+        return _filtered_vault(session, meta_id, filter_text).with_entities(func.count(Password.id)).scalar()
+
+
+@metrics.timed('db', 'search')
+def search_passwords(meta_id: int, query_text: str, limit: int = SEARCH_LIMIT) -> list[int]:
+    # Ids of matching entries, best match first
+    with _get_engine().connect() as connection:
+        return search(connection, meta_id, query_text, limit)
+
+
+def get_passwords_by_ids(meta_id: int, password_ids: list[int]) -> list:
+    with Session(_get_engine()) as session:
+        rows = session.query(Password).filter(Password.meta_id == meta_id, Password.id.in_(password_ids)).all()
+        by_id = {row.id: row for row in rows}
+        return [
+            (row.id, row.username, row.platform, '********', row.created_at)
+            for row in (by_id.get(password_id) for password_id in password_ids) if row is not None
+        ]
+
+
+def stream_passwords(meta_id: int, keys: KeyRing, chunk_size: int = EXPORT_CHUNK_SIZE):
+    # Yields lists of decrypted (username, platform, password, created_at) rows. yield_per
+    # keeps the SQLite cursor open and fetches one chunk at a time, so memory does not
+    # grow with the vault. Rows that cannot be decrypted are left out.
+    statement = (
+        select(Password.username, Password.platform, Password.password, Password.created_at)
+        .where(Password.meta_id == meta_id)
+        .order_by(Password.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    with Session(_get_engine()) as session:
+        for partition in session.execute(statement).partitions():
+            decrypted = keys.decrypt_many([row.password for row in partition])
+            yield [
+                (row.username, row.platform, password, row.created_at)
+                for row, password in zip(partition, decrypted) if password is not None
+            ]
+
+
+@metrics.timed('db', 'reveal')
+def get_password_by_id(password_id: int, meta_id: int, keys: KeyRing) -> str | None:
     with Session(_get_engine()) as session:
         entry = session.query(Password).filter_by(id=password_id, meta_id=meta_id).first()
         if entry is None:
             return None
         try:
-            return pe.decrypt_password(entry.password, master_password)
+            return keys.decrypt(entry.password)
         except Exception:
             return None
 
+@metrics.timed('db', 'delete')
 def delete_password(meta_id: int, password_id: int) -> bool:
     with Session(_get_engine()) as session:
         # Añadimos la comprobación de meta_id para evitar IDOR
@@ -129,8 +434,10 @@ def delete_password(meta_id: int, password_id: int) -> bool:
         return True
     
 
-def update_password(meta_id: int, password_id: int, username: str, platform: str, password: str, master: str) -> bool:
-    encrypted_password = pe.encrypt_password(password, master)
+@metrics.timed('db', 'update')
+def update_password(meta_id: int, password_id: int, username: str, platform: str, password: str, keys: KeyRing) -> bool:
+    encrypted_password = keys.encrypt(password)
+    fingerprint, strength = _audit_fields(password, keys)
     with Session(_get_engine()) as session:
         try:
             # Añadimos la comprobación de meta_id para evitar IDOR
@@ -140,8 +447,62 @@ def update_password(meta_id: int, password_id: int, username: str, platform: str
             entry.username = username
             entry.platform = platform
             entry.password = encrypted_password
+            entry.fingerprint = fingerprint
+            entry.strength = strength
             session.commit()
             return True
         except Exception:
             session.rollback()
-            return False
\ No newline at end of file
+            return False
+
+
+def backfill_audit(meta_id: int, keys: KeyRing, on_progress=None, chunk_size: int = AUDIT_CHUNK_SIZE) -> int:
+    # Entries saved before the audit columns existed get them here, one committed chunk at
+    # a time, so an interrupted backfill just continues with the rows still left
+    with Session(_get_engine()) as session:
+        pending = session.query(Password).filter(Password.meta_id == meta_id, Password.fingerprint.is_(None))
+        total = pending.with_entities(func.count(Password.id)).scalar()
+        done = 0
+        last_id = 0
+        while True:
+            chunk = pending.filter(Password.id > last_id).order_by(Password.id).limit(chunk_size).all()
+            if not chunk:
+                return done
+            # Rows that cannot be decrypted stay without audit data
+            for row, plain in zip(chunk, keys.decrypt_many([row.password for row in chunk])):
+                if plain is not None:
+                    row.fingerprint, row.strength = _audit_fields(plain, keys)
+            session.commit()
+            last_id = chunk[-1].id
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, total)
+
+
+@metrics.timed('db', 'audit')
+def get_vault_audit(meta_id: int, keys: KeyRing) -> tuple[list, list]:
+    # Returns (reuse groups, weak entries) from a single pass over the fingerprint index.
+    # Groups are lists of (id, username, platform); weak entries are (id, username,
+    # platform, strength label). Nothing is decrypted.
+    scores = {keys.mac(f'strength:{score}'): score for score in range(len(LABELS))}
+    weak_tags = [tag for tag, score in scores.items() if score < WEAK_SCORE]
+    uses = func.count().over(partition_by=Password.fingerprint).label('uses')
+    audited = (
+        select(Password.id, Password.username, Password.platform, Password.fingerprint, Password.strength, uses)
+        .where(Password.meta_id == meta_id, Password.fingerprint.is_not(None))
+        .subquery()
+    )
+    statement = (
+        select(audited)
+        .where(or_(audited.c.uses > 1, audited.c.strength.in_(weak_tags)))
+        .order_by(audited.c.fingerprint, audited.c.id)
+    )
+    groups = {}
+    weak = []
+    with Session(_get_engine()) as session:
+        for row in session.execute(statement):
+            if row.uses > 1:
+                groups.setdefault(row.fingerprint, []).append((row.id, row.username, row.platform))
+            if row.strength in scores and scores[row.strength] < WEAK_SCORE:
+                weak.append((row.id, row.username, row.platform, LABELS[scores[row.strength]]))
+    return list(groups.values()), sorted(weak, key=lambda entry: (entry[2], entry[1]))
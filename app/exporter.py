@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import os
+import struct
+from utils.password_utils import derive_key
+
+# cryptography is imported when an archive is written or read, not when the app starts
+
+# Encrypted archive layout:
+#   MAGIC | salt (16 bytes) | PBKDF2 iterations (uint32)
+#   then one record per chunk: length (uint32) | Fernet token
+# Each token holds {"seq": n, "final": bool, "entries": [...]}. Fernet authenticates every
+# chunk, the sequence numbers catch reordered or dropped chunks and the final flag catches
+# a truncated file.
+MAGIC = b'PGVAULT1'
+SALT_LENGTH = 16
+ARCHIVE_ITERATIONS = 600000
+_HEADER = struct.Struct('>I')
+
+CSV_COLUMNS = ['name', 'url', 'username', 'password', 'note']
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _archive_fernet(passphrase: str, salt: bytes, iterations: int):
+    from cryptography.fernet import Fernet
+    return Fernet(derive_key(passphrase, salt, iterations))
+
+
+def _entry(username, platform, password, created_at) -> list:
+    return [username, platform, password, created_at.isoformat() if created_at else None]
+
+
+def write_archive(chunks, passphrase: str, iterations: int = ARCHIVE_ITERATIONS):
+    # `chunks` is what datastore.stream_passwords yields; output is produced one chunk
+    # at a time so it can be streamed straight into a response
+    salt = os.urandom(SALT_LENGTH)
+    fernet = _archive_fernet(passphrase, salt, iterations)
+    yield MAGIC + salt + _HEADER.pack(iterations)
+    seq = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        yield _record(fernet, seq, False, [_entry(*row) for row in chunk])
+        seq += 1
+    yield _record(fernet, seq, True, [])
+
+
+def _record(fernet, seq: int, final: bool, entries: list) -> bytes:
+    token = fernet.encrypt(json.dumps({'seq': seq, 'final': final, 'entries': entries}).encode())
+    return _HEADER.pack(len(token)) + token
+
+
+def read_archive(stream, passphrase: str):
+    # Yields (username, platform, password, created_at ISO string) from a binary file object
+    from cryptography.fernet import InvalidToken
+    header = stream.read(len(MAGIC) + SALT_LENGTH + _HEADER.size)
+    if len(header) < len(MAGIC) + SALT_LENGTH + _HEADER.size or not header.startswith(MAGIC):
+        raise ArchiveError('Not a vault archive')
+    salt = header[len(MAGIC):len(MAGIC) + SALT_LENGTH]
+    (iterations,) = _HEADER.unpack(header[len(MAGIC) + SALT_LENGTH:])
+    fernet = _archive_fernet(passphrase, salt, iterations)
+    expected_seq = 0
+    while True:
+        length_bytes = stream.read(_HEADER.size)
+        if len(length_bytes) < _HEADER.size:
+            raise ArchiveError('Archive is truncated')
+        (length,) = _HEADER.unpack(length_bytes)
+        token = stream.read(length)
+        try:
+            record = json.loads(fernet.decrypt(token))
+        except InvalidToken:
+            raise ArchiveError('Wrong passphrase or corrupted archive') from None
+        if record['seq'] != expected_seq:
+            raise ArchiveError('Archive chunks are out of order')
+        expected_seq += 1
+        for entry in record['entries']:
+            yield tuple(entry)
+        if record['final']:
+            return
+
+
+def write_csv(chunks):
+    # Same columns as a Chrome export, so the file can be imported again
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for chunk in chunks:
+        for username, platform, password, _ in chunk:
+            writer.writerow([platform, '', username, password, ''])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
@@ -0,0 +1,93 @@
+import csv
+from itertools import islice
+from urllib.parse import urlparse
+import datastore
+
+IMPORT_CHUNK_SIZE = 500
+
+# Column names (lower case) used by each export. A format is picked when all of its
+# `detect` columns are in the header; the first one that matches wins.
+FORMATS = {
+    'bitwarden': {'detect': {'login_password'}, 'username': 'login_username',
+                  'password': 'login_password', 'url': 'login_uri', 'name': 'name'},
+    'firefox': {'detect': {'url', 'httprealm'}, 'username': 'username',
+                'password': 'password', 'url': 'url', 'name': None},
+    'keepassxc': {'detect': {'title', 'password'}, 'username': 'username',
+                  'password': 'password', 'url': 'url', 'name': 'title'},
+    'keepass': {'detect': {'account', 'login name', 'password'}, 'username': 'login name',
+                'password': 'password', 'url': 'web site', 'name': 'account'},
+    'chrome': {'detect': {'name', 'url', 'username', 'password'}, 'username': 'username',
+               'password': 'password', 'url': 'url', 'name': 'name'},
+}
+
+
+class ImportReport:
+
+    def __init__(self, source_format: str):
+        self.source_format = source_format
+        self.imported = 0
+        self.duplicates = []
+        self.skipped = 0
+
+    def __repr__(self):
+        return (f'ImportReport(format={self.source_format!r}, imported={self.imported}, '
+                f'duplicates={len(self.duplicates)}, skipped={self.skipped})')
+
+
+def detect_format(header: list[str]) -> str:
+    columns = {column.strip().lower() for column in header}
+    for name, spec in FORMATS.items():
+        if spec['detect'] <= columns:
+            return name
+    raise ValueError('Unrecognised CSV export, expected Chrome, Firefox, Bitwarden or KeePass columns')
+
+
+def _platform(url: str, name: str) -> str:
+    host = urlparse(url if '://' in url else f'//{url}').hostname if url else None
+    if host:
+        return host[4:] if host.startswith('www.') else host
+    return name
+
+
+def read_entries(lines, report: ImportReport | None = None):
+    # Yields (username, platform, password) one row at a time, so the file is never
+    # held in memory. `lines` is anything csv.reader accepts, e.g. an open text file.
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    source_format = detect_format(header)
+    spec = FORMATS[source_format]
+    if report is not None:
+        report.source_format = source_format
+    index = {column.strip().lower(): i for i, column in enumerate(header)}
+
+    def field(row, column):
+        i = index.get(column) if column else None
+        return row[i].strip() if i is not None and i < len(row) else ''
+
+    for row in reader:
+        username = field(row, spec['username'])
+        password = field(row, spec['password'])
+        platform = _platform(field(row, spec['url']), field(row, spec['name']))
+        if not username or not password or not platform:
+            if report is not None and any(row):
+                report.skipped += 1
+            continue
+        yield username, platform, password
+
+
+def import_csv(meta_id: int, keys, lines, chunk_size: int = IMPORT_CHUNK_SIZE) -> ImportReport:
+    report = ImportReport(source_format='unknown')
+    entries = read_entries(lines, report)
+    while chunk := list(islice(entries, chunk_size)):
+        imported, duplicates = datastore.save_passwords_bulk(meta_id, chunk, keys)
+        report.imported += imported
+        report.duplicates.extend(duplicates)
+    return report
+
+
+def import_csv_file(meta_id: int, keys, path: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> ImportReport:
+    # utf-8-sig drops the byte order mark some exporters put in front of the header
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return import_csv(meta_id, keys, f, chunk_size)
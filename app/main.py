@@ -1,35 +1,49 @@
 import os
+import secrets
 import sys
-import ui.layout as layout
-import datastore
+import bootstrap
 
-from dotenv import load_dotenv
-from nicegui import ui
 
+def load_styles() -> dict:
+    styles_path = bootstrap.settings().styles_path
+    if styles_path and os.path.exists(styles_path):
+        try:
+            import json
+            with open(styles_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading styles from {styles_path}: {e}")
+    return {}
 
-load_dotenv()
-
-custom_colors = {}
-styles_path = os.getenv('STYLES_PATH')
-if styles_path and os.path.exists(styles_path):
-    try:
-        import json
-        with open(styles_path, 'r') as f:
-            custom_colors = json.load(f)
-    except Exception as e:
-        print(f"Error loading styles from {styles_path}: {e}")
-
-def inject_styles():
-    if custom_colors:
-        ui.colors(**custom_colors)
-    else:
-        ui.colors(primary='purple')
-
-layout.set_styles_injector(inject_styles)
 
 def main():
+    bootstrap.load_config()
+    # Imported only now: settings are parsed once, above, and the import report (bootstrap.py)
+    # measures the app modules in this order
+    import datastore
+    import ui.layout as layout
+    import ui.metrics_route
+    import ui.profiling_route
+    from nicegui import ui
+    from utils import strength
+
+    custom_colors = load_styles()
+
+    def inject_styles():
+        if custom_colors:
+            ui.colors(**custom_colors)
+        else:
+            ui.colors(primary='purple')
+
+    layout.set_styles_injector(inject_styles)
+    layout.register_assets()
+    layout.start_session_sweep()
     datastore.init_database()
-    ui.run(title='Password Manager', favicon='🔐')
+    strength.preload()
+    # Signs the browser id cookie that sessions are keyed by. Without a fixed secret every
+    # restart starts fresh, which is fine since the session keys only live in memory anyway.
+    storage_secret = bootstrap.settings().storage_secret or secrets.token_urlsafe(32)
+    ui.run(title='Password Manager', favicon='🔐', storage_secret=storage_secret)
 
 if __name__ in {"__main__", "__mp_main__"}:
     main()
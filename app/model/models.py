@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import DateTime, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -13,17 +13,42 @@ class Meta(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     username: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     master_password: Mapped[str] = mapped_column(String, nullable=False)
+    # Random per-user key that encrypts the entries, wrapped with the master password key
+    data_key: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Set while entries are being re-encrypted under a new key so the run can be resumed
+    rotation_key: Mapped[str | None] = mapped_column(String, nullable=True)
+    rotation_cursor: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Entries the data key migration could not decrypt; they are left as they were
+    unreadable_entries: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # How the master key is derived: algorithm, base64 salt and JSON cost parameters.
+    # NULL for accounts from before per-user parameters, which use the shared salt.
+    kdf_algorithm: Mapped[str | None] = mapped_column(String, nullable=True)
+    kdf_salt: Mapped[str | None] = mapped_column(String, nullable=True)
+    kdf_params: Mapped[str | None] = mapped_column(String, nullable=True)
 
 
 class Password(Base):
     __tablename__ = "passwords"
-    __table_args__ = (UniqueConstraint("username", "platform", "meta_id"),)
+    __table_args__ = (
+        UniqueConstraint("username", "platform", "meta_id"),
+        # One index per sortable column, led by meta_id so each user's page is a range scan
+        Index("ix_passwords_meta_username", "meta_id", "username", "id"),
+        Index("ix_passwords_meta_platform", "meta_id", "platform", "id"),
+        Index("ix_passwords_meta_created_at", "meta_id", "created_at", "id"),
+        # Covers the vault audit: reuse groups by fingerprint, weak entries by strength
+        Index("ix_passwords_meta_fingerprint", "meta_id", "fingerprint", "strength"),
+        Index("ix_passwords_meta_strength", "meta_id", "strength"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     meta_id: Mapped[int] = mapped_column(Integer, ForeignKey("meta.id"), nullable=False)
     username: Mapped[str] = mapped_column(String, nullable=False)
     platform: Mapped[str] = mapped_column(String, nullable=False)
     password: Mapped[str] = mapped_column(String, nullable=False)
+    # Keyed MACs of the plain password and of its strength score, written with the entry so
+    # the audit can find reuse and weak entries without decrypting anything
+    fingerprint: Mapped[str | None] = mapped_column(String, nullable=True)
+    strength: Mapped[str | None] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=lambda: datetime.now(timezone.utc)
     )
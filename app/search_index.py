@@ -0,0 +1,88 @@
+import difflib
+import re
+from sqlalchemy import text
+
+# SQLAlchemy has no construct for FTS5, so the index is plain SQL. passwords_fts is an
+# external-content table: it stores only the index and reads platform/username from
+# passwords, and the triggers keep it in step with every insert, update and delete.
+_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts USING fts5(
+        platform, username,
+        content='passwords', content_rowid='id',
+        prefix='2 3'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts_vocab USING fts5vocab(passwords_fts, 'row')""",
+    """CREATE TRIGGER IF NOT EXISTS passwords_fts_insert AFTER INSERT ON passwords BEGIN
+        INSERT INTO passwords_fts(rowid, platform, username) VALUES (new.id, new.platform, new.username);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS passwords_fts_delete AFTER DELETE ON passwords BEGIN
+        INSERT INTO passwords_fts(passwords_fts, rowid, platform, username)
+        VALUES ('delete', old.id, old.platform, old.username);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS passwords_fts_update AFTER UPDATE OF platform, username ON passwords BEGIN
+        INSERT INTO passwords_fts(passwords_fts, rowid, platform, username)
+        VALUES ('delete', old.id, old.platform, old.username);
+        INSERT INTO passwords_fts(rowid, platform, username) VALUES (new.id, new.platform, new.username);
+    END""",
+]
+
+# Platform hits count double compared to username hits
+_SEARCH = text("""
+    SELECT passwords.id FROM passwords_fts
+    JOIN passwords ON passwords.id = passwords_fts.rowid
+    WHERE passwords_fts MATCH :match AND passwords.meta_id = :meta_id
+    ORDER BY bm25(passwords_fts, 2.0, 1.0)
+    LIMIT :limit
+""")
+
+_SIMILAR_TERMS = text("""
+    SELECT term FROM passwords_fts_vocab
+    WHERE term >= :first AND term < :after_first AND length(term) BETWEEN :shortest AND :longest
+""")
+
+FUZZY_CUTOFF = 0.75
+
+
+def create_search_index(connection):
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'passwords_fts'")
+    ).first()
+    for statement in _SCHEMA:
+        connection.execute(text(statement))
+    if not exists:
+        # Index rows that were saved before the search index existed
+        connection.execute(text("INSERT INTO passwords_fts(passwords_fts) VALUES ('rebuild')"))
+
+
+def search(connection, meta_id: int, query_text: str, limit: int) -> list[int]:
+    tokens = re.findall(r'\w+', query_text.lower())
+    if not tokens:
+        return []
+    # Every token has to match the start of a word in platform or username
+    ids = _run(connection, meta_id, ' AND '.join(f'"{token}"*' for token in tokens), limit)
+    if ids:
+        return ids
+    # Nothing matched as typed: allow each token to be any close spelling from the index
+    groups = []
+    for token in tokens:
+        candidates = [token] + _similar_terms(connection, token)
+        groups.append('(' + ' OR '.join(f'"{term}"*' for term in candidates) + ')')
+    return _run(connection, meta_id, ' AND '.join(groups), limit)
+
+
+def _run(connection, meta_id: int, match: str, limit: int) -> list[int]:
+    rows = connection.execute(_SEARCH, {'match': match, 'meta_id': meta_id, 'limit': limit})
+    return [row[0] for row in rows]
+
+
+def _similar_terms(connection, token: str) -> list[str]:
+    # Only terms sharing the first character and of similar length are compared, which
+    # keeps the candidate list small even for very large vocabularies
+    rows = connection.execute(_SIMILAR_TERMS, {
+        'first': token[0],
+        'after_first': chr(ord(token[0]) + 1),
+        'shortest': len(token) - 2,
+        'longest': len(token) + 2,
+    })
+    terms = [row[0] for row in rows]
+    return difflib.get_close_matches(token, terms, n=5, cutoff=FUZZY_CUTOFF)
@@ -1,49 +1,203 @@
+import asyncio
+import functools
 import datastore
-from utils.password_utils import get_password_strength
-import string
-import secrets
+import async_datastore
+import importer
+import exporter
+from utils.key_ring import KeyRing, KeyRingExpiredError
+from utils.password_generator import build_alphabet, generate_batch, generate_stream
+from utils.password_strategies import PassphraseStrategy
+from utils.strength import StrengthReport, estimate_strength
+from utils.wordlist import load_wordlist, wordlist_available
+from utils.breach import corpus_available, load_corpus
+
+def _activity(method):
+    # Every call made for the user counts as activity, so a session that is in use is not
+    # swept as idle while the page stays open
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.touch()
+        return method(self, *args, **kwargs)
+    return wrapper
 
 class PasswordService:
 
-    def __init__(self, username: str, meta_id: int, master: str):
+    def __init__(self, username: str, meta_id: int, keys: KeyRing):
         self._username = username
         self._meta_id = meta_id
-        self._master = master
+        self._keys = keys
+        self._on_activity = None
+
+    def is_active(self) -> bool:
+        return self._keys.is_active()
+
+    def logout(self):
+        self._keys.wipe()
+
+    def ensure_active(self):
+        if not self.is_active():
+            raise KeyRingExpiredError('Key ring expired, please log in again')
+
+    def on_activity(self, callback):
+        self._on_activity = callback
 
+    def touch(self):
+        self._keys.touch()
+        if self._on_activity is not None:
+            self._on_activity()
+
+    @_activity
     def save(self, username: str, platform: str, password: str) -> int | None:
-        return datastore.save_password(self._meta_id, username, platform, password, self._master)
+        return datastore.save_password(self._meta_id, username, platform, password, self._keys)
 
+    @_activity
     def delete(self, password_id: int) -> bool:
         return datastore.delete_password(self._meta_id, password_id)
 
+    @_activity
     def get_all(self, show_real: bool = False) -> list:
-        return datastore.get_all_passwords(self._meta_id, self._master, show_real_passwords=show_real)
+        return datastore.get_all_passwords(self._meta_id, self._keys, show_real_passwords=show_real)
+
+    @_activity
+    def get_page(self, sort_by: str = 'date', descending: bool = False, filter_text: str = '',
+                 after: tuple | None = None, offset: int = 0, limit: int = datastore.PAGE_SIZE) -> list:
+        return datastore.get_passwords_page(self._meta_id, sort_by, descending, filter_text, after, offset, limit)
+
+    @_activity
+    def count(self, filter_text: str = '') -> int:
+        return datastore.count_passwords(self._meta_id, filter_text)
+
+    @_activity
+    def search(self, query_text: str) -> list[int]:
+        return datastore.search_passwords(self._meta_id, query_text)
 
+    @_activity
+    def get_by_ids(self, password_ids: list[int]) -> list:
+        return datastore.get_passwords_by_ids(self._meta_id, password_ids)
+
+    @_activity
+    def import_csv(self, path: str) -> importer.ImportReport:
+        return importer.import_csv_file(self._meta_id, self._keys, path)
+
+    @_activity
+    def export_archive(self, passphrase: str):
+        return exporter.write_archive(datastore.stream_passwords(self._meta_id, self._keys), passphrase)
+
+    @_activity
+    def export_csv(self):
+        return exporter.write_csv(datastore.stream_passwords(self._meta_id, self._keys))
+
+    @_activity
+    def backfill_audit(self, on_progress=None) -> int:
+        return datastore.backfill_audit(self._meta_id, self._keys, on_progress)
+
+    @_activity
+    def audit(self) -> tuple[list, list]:
+        return datastore.get_vault_audit(self._meta_id, self._keys)
+
+    @_activity
     def get_password(self, password_id: int) -> str | None:
-        return datastore.get_password_by_id(password_id, self._meta_id, self._master)
+        return datastore.get_password_by_id(password_id, self._meta_id, self._keys)
 
-    def check_strength(self, password: str) -> str:
-        return get_password_strength(password)
+    @_activity
+    def check_strength(self, password: str) -> StrengthReport:
+        return estimate_strength(password)
 
-    def update_master(self, old_master: str, new_master: str) -> bool:
-        return datastore.update_master_password(self._username, old_master, new_master)
+    @_activity
+    def check_breach(self, password: str) -> int | None:
+        # Times the password appears in the local breach corpus, None when there is no corpus
+        if not password or not corpus_available():
+            return None
+        return load_corpus().check(password)
 
+    @_activity
+    def update_master(self, old_master: str, new_master: str, on_progress=None) -> bool:
+        return datastore.update_master_password(self._username, old_master, new_master, on_progress)
+
+    @_activity
     def check_master(self, master: str) -> bool:
         return datastore.check_master_password(self._username, master)
 
+    @_activity
     def update_password(self, password_id: int, username: str, platform: str, password: str) -> bool:
-        return datastore.update_password(self._meta_id, password_id, username, platform, password, self._master)
+        return datastore.update_password(self._meta_id, password_id, username, platform, password, self._keys)
+
+    @_activity
+    async def save_async(self, username: str, platform: str, password: str) -> int | None:
+        return await async_datastore.save_password(self._meta_id, username, platform, password, self._keys)
 
+    @_activity
+    async def delete_async(self, password_id: int) -> bool:
+        return await async_datastore.delete_password(self._meta_id, password_id)
+
+    @_activity
+    async def get_all_async(self, show_real: bool = False) -> list:
+        return await async_datastore.get_all_passwords(self._meta_id, self._keys, show_real_passwords=show_real)
+
+    @_activity
+    async def get_page_async(self, sort_by: str = 'date', descending: bool = False, filter_text: str = '',
+                             after: tuple | None = None, offset: int = 0, limit: int = datastore.PAGE_SIZE) -> list:
+        return await async_datastore.get_passwords_page(self._meta_id, sort_by, descending, filter_text, after, offset, limit)
+
+    @_activity
+    async def count_async(self, filter_text: str = '') -> int:
+        return await async_datastore.count_passwords(self._meta_id, filter_text)
+
+    @_activity
+    async def search_async(self, query_text: str) -> list[int]:
+        return await async_datastore.search_passwords(self._meta_id, query_text)
+
+    @_activity
+    async def get_by_ids_async(self, password_ids: list[int]) -> list:
+        return await async_datastore.get_passwords_by_ids(self._meta_id, password_ids)
+
+    @_activity
+    async def import_csv_async(self, path: str) -> importer.ImportReport:
+        return await asyncio.to_thread(self.import_csv, path)
+
+    @_activity
+    async def backfill_audit_async(self, on_progress=None) -> int:
+        return await async_datastore.backfill_audit(self._meta_id, self._keys, on_progress)
+
+    @_activity
+    async def audit_async(self) -> tuple[list, list]:
+        return await async_datastore.get_vault_audit(self._meta_id, self._keys)
+
+    @_activity
+    async def get_password_async(self, password_id: int) -> str | None:
+        return await async_datastore.get_password_by_id(password_id, self._meta_id, self._keys)
+
+    @_activity
+    async def update_master_async(self, old_master: str, new_master: str, on_progress=None) -> bool:
+        return await async_datastore.update_master_password(self._username, old_master, new_master, on_progress)
+
+    @_activity
+    async def check_master_async(self, master: str) -> bool:
+        return await async_datastore.check_master_password(self._username, master)
+
+    @_activity
+    async def update_password_async(self, password_id: int, username: str, platform: str, password: str) -> bool:
+        return await async_datastore.update_password(self._meta_id, password_id, username, platform, password, self._keys)
+
+    @_activity
     def generate(self, length: int = 16, use_upper: bool = True, use_lower: bool = True, use_numbers: bool = True, use_symbols: bool = True) -> str:
-        from utils.password_strategies import UppercaseStrategy, LowercaseStrategy, NumberStrategy, SymbolStrategy
-        strategies = []
-        if use_upper: strategies.append(UppercaseStrategy())
-        if use_lower: strategies.append(LowercaseStrategy())
-        if use_numbers: strategies.append(NumberStrategy())
-        if use_symbols: strategies.append(SymbolStrategy())
-        all_chars = ''.join(s.get_chars() for s in strategies)
-        if not all_chars:
-            all_chars = string.ascii_letters + string.digits
         if length <= 0:
             return ''
-        return ''.join(secrets.choice(all_chars) for _ in range(length))
\ No newline at end of file
+        alphabet = build_alphabet(use_upper, use_lower, use_numbers, use_symbols)
+        return generate_batch(1, length, alphabet)[0]
+
+    @_activity
+    def generate_batch(self, n: int, length: int = 16, use_upper: bool = True, use_lower: bool = True, use_numbers: bool = True, use_symbols: bool = True, stream: bool = False):
+        alphabet = build_alphabet(use_upper, use_lower, use_numbers, use_symbols)
+        if stream:
+            return generate_stream(n, length, alphabet)
+        return generate_batch(n, length, alphabet)
+
+    @_activity
+    def passphrase_available(self) -> bool:
+        return wordlist_available()
+
+    @_activity
+    def generate_passphrase(self, word_count: int = 6, separator: str = '-', capitalize: str = 'lower') -> tuple[str, float]:
+        strategy = PassphraseStrategy(load_wordlist(), word_count, separator, capitalize)
+        return strategy.generate(), strategy.entropy_bits()
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+import bootstrap
+
+
+class SessionRegistry:
+    # Logged-in PasswordService per browser session, least recently used first. A session is
+    # dropped when it idles past the TTL, its key ring expires, or room is needed for a new
+    # one; whatever is dropped is logged out, which wipes its key material. Every call on a
+    # registered service counts as use, not only fetching it for a page load.
+
+    def __init__(self, capacity: int | None = None, ttl: float | None = None, clock=time.monotonic):
+        # Defaults are SESSION_CAPACITY and SESSION_TTL
+        settings = bootstrap.settings()
+        self._capacity = settings.session_capacity if capacity is None else capacity
+        self._ttl = settings.session_ttl if ttl is None else ttl
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str):
+        with self._lock:
+            self._evict_expired()
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            service, _ = entry
+            if not service.is_active():
+                self._drop(session_id)
+                self.evicted += 1
+                return None
+            self._sessions[session_id] = (service, self._clock())
+            self._sessions.move_to_end(session_id)
+            return service
+
+    def put(self, session_id: str, service):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+            self._evict_expired()
+            while len(self._sessions) >= self._capacity:
+                self._drop(next(iter(self._sessions)))
+                self.evicted += 1
+            self._sessions[session_id] = (service, self._clock())
+        service.on_activity(lambda: self.touch(session_id))
+
+    def touch(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions[session_id] = (entry[0], self._clock())
+                self._sessions.move_to_end(session_id)
+
+    def remove(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            return self._evict_expired()
+
+    def clear(self):
+        with self._lock:
+            while self._sessions:
+                self._drop(next(iter(self._sessions)))
+
+    def _evict_expired(self) -> int:
+        # Entries are in last-use order, so the expired ones are all at the front
+        count = 0
+        deadline = self._clock() - self._ttl
+        while self._sessions:
+            session_id, (_, last_seen) = next(iter(self._sessions.items()))
+            if last_seen > deadline:
+                break
+            self._drop(session_id)
+            count += 1
+        self.evicted += count
+        return count
+
+    def _drop(self, session_id: str):
+        service, _ = self._sessions.pop(session_id)
+        service.logout()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_session_registry() -> SessionRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SessionRegistry()
+        return _registry
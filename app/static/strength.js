@@ -0,0 +1,552 @@
+// Browser copy of utils/strength.py so the strength meter runs without a server round
+// trip per keystroke. The dictionaries, keyboard layouts and constants are fetched once
+// from /static/strength-tables.json (built from the server tables); the matching and
+// scoring below mirror the Python functions of the same name. Keep the two in step.
+(function () {
+  'use strict';
+
+  const STYLES = [
+    ['❌', '#EF4444'],
+    ['❌', '#F97316'],
+    ['✅', '#F59E0B'],
+    ['🔐', '#10B981'],
+    ['🔐', '#059669'],
+  ];
+
+  // Python indexes strings by code point, JS by UTF-16 unit, so an emoji would count as
+  // two characters here. Positions and lengths below are taken over code points.
+  const codePoints = (s) => Array.from(s);
+  const cpLength = (s) => codePoints(s).length;
+  const cpIndex = (s, unitIndex) => cpLength(s.slice(0, unitIndex));
+  // Same as Python's str.isupper() / str.islower() on one character
+  const isUpper = (c) => /^\p{Uppercase}$/u.test(c);
+  const isLower = (c) => /^\p{Lowercase}$/u.test(c);
+  const isDigits = (s) => /^\d+$/.test(s);
+
+  let T = null;
+  let loading = null;
+
+  function load() {
+    if (!loading) {
+      loading = fetch('/static/strength-tables.json')
+        .then((response) => response.json())
+        .then(prepare);
+    }
+    return loading;
+  }
+
+  function prepare(data) {
+    const ranked = new Map();
+    let maxWordLength = 0;
+    for (const [name, words] of Object.entries(data.dictionaries)) {
+      const ranks = new Map();
+      words.forEach((word, index) => {
+        ranks.set(word, index + 1);
+        maxWordLength = Math.max(maxWordLength, cpLength(word));
+      });
+      ranked.set(name, ranks);
+    }
+    const graphs = new Map();
+    for (const [name, rows] of Object.entries(data.keyboards)) graphs.set(name, adjacencyGraph(rows));
+    const l33tLetters = new Map();
+    for (const [letter, subs] of Object.entries(data.l33t)) {
+      for (const sub of subs) {
+        if (!l33tLetters.has(sub)) l33tLetters.set(sub, []);
+        l33tLetters.get(sub).push(letter);
+      }
+    }
+    const shifted = new Map();
+    [...data.shiftedKeys].forEach((key, index) => shifted.set(key, data.unshiftedKeys[index]));
+    T = { ...data, ranked, maxWordLength, graphs, l33tLetters, shifted };
+  }
+
+  function adjacencyGraph(rows) {
+    const positions = new Map();
+    rows.forEach(([offset, row], y) => [...row].forEach((key, x) => positions.set(key, [y, offset + x])));
+    const graph = new Map();
+    let degrees = 0;
+    for (const [key, [y, x]] of positions) {
+      const neighbours = new Map();
+      for (const [other, [oy, ox]] of positions) {
+        if (other !== key && Math.abs(oy - y) <= 1 && Math.abs(ox - x) <= 1) neighbours.set(other, `${oy - y},${ox - x}`);
+      }
+      graph.set(key, neighbours);
+      degrees += neighbours.size;
+    }
+    return { graph, keys: graph.size, degree: degrees / graph.size };
+  }
+
+  function match(pattern, i, j, token, guesses, details = {}) {
+    return { pattern, i, j, token, guesses, details };
+  }
+
+  // ---- matching -------------------------------------------------------------
+
+  function omnimatch(password) {
+    return [
+      ...dictionaryMatches(password),
+      ...reverseMatches(password),
+      ...l33tMatches(password),
+      ...spatialMatches(password),
+      ...repeatMatches(password),
+      ...sequenceMatches(password),
+      ...dateMatches(password),
+    ];
+  }
+
+  function dictionaryMatches(password, lower) {
+    const chars = codePoints(password);
+    const lowerChars = codePoints(lower || password.toLowerCase());
+    const matches = [];
+    const n = chars.length;
+    for (let i = 0; i < n; i++) {
+      for (let j = i + 1; j < Math.min(n, i + T.maxWordLength); j++) {
+        const word = lowerChars.slice(i, j + 1).join('');
+        for (const [name, ranks] of T.ranked) {
+          const rank = ranks.get(word);
+          if (rank !== undefined) {
+            const token = chars.slice(i, j + 1).join('');
+            matches.push(match('dictionary', i, j, token, rank * uppercaseVariations(token),
+              { dictionary: name, word, rank }));
+          }
+        }
+      }
+    }
+    return matches;
+  }
+
+  function reverseMatches(password) {
+    const n = cpLength(password);
+    const reversedPassword = [...password].reverse().join('');
+    const matches = [];
+    for (const m of dictionaryMatches(reversedPassword)) {
+      const token = [...m.token].reverse().join('');
+      if (cpLength(m.token) > 2 && m.token !== token) {
+        matches.push(match('dictionary', n - 1 - m.j, n - 1 - m.i, token, m.guesses * 2,
+          { ...m.details, reversed: true }));
+      }
+    }
+    return matches;
+  }
+
+  function product(options) {
+    let result = [[]];
+    for (const choices of options) {
+      const next = [];
+      for (const prefix of result) for (const choice of choices) next.push([...prefix, choice]);
+      result = next;
+    }
+    return result;
+  }
+
+  function l33tMatches(password) {
+    const present = [...new Set([...password].filter((c) => T.l33tLetters.has(c)))].sort();
+    if (!present.length) return [];
+    const lower = password.toLowerCase();
+    const matches = [];
+    const seen = new Set();
+    const options = present.map((c) => T.l33tLetters.get(c).map((letter) => [c, letter]));
+    for (const substitution of product(options).slice(0, T.maxL33tVariants)) {
+      const table = new Map(substitution);
+      const subbed = [...lower].map((c) => table.get(c) || c).join('');
+      for (const m of dictionaryMatches(password, subbed)) {
+        const used = substitution.filter(([c]) => m.token.includes(c));
+        const key = `${m.i},${m.j},${m.details.word}`;
+        if (!used.length || cpLength(m.token) === 1 || seen.has(key)) continue;
+        seen.add(key);
+        matches.push(match('dictionary', m.i, m.j, m.token, m.guesses * l33tVariations(m.token, used),
+          { ...m.details, l33t: Object.fromEntries(used) }));
+      }
+    }
+    return matches;
+  }
+
+  function spatialMatches(password) {
+    const matches = [];
+    const chars = codePoints(password);
+    const unshifted = codePoints(password.toLowerCase()).map((c) => T.shifted.get(c) || c);
+    for (const [name, { graph, keys, degree }] of T.graphs) {
+      let i = 0;
+      while (i < chars.length - 2) {
+        let j = i;
+        let turns = 0;
+        let direction = null;
+        while (j + 1 < chars.length && graph.has(unshifted[j]) && graph.get(unshifted[j]).has(unshifted[j + 1])) {
+          const step = graph.get(unshifted[j]).get(unshifted[j + 1]);
+          if (step !== direction) {
+            turns += 1;
+            direction = step;
+          }
+          j += 1;
+        }
+        if (j - i >= 2) {
+          const token = chars.slice(i, j + 1).join('');
+          const shifted = [...token].filter((c) => isUpper(c) || T.shifted.has(c)).length;
+          matches.push(match('spatial', i, j, token, spatialGuesses(j - i + 1, turns, keys, degree, shifted),
+            { graph: name, turns }));
+          i = j;
+        } else {
+          i += 1;
+        }
+      }
+    }
+    return matches;
+  }
+
+  function repeatMatches(password) {
+    const matches = [];
+    for (const found of password.matchAll(/(.+?)\1+/gu)) {
+      const base = found[1];
+      const [baseGuesses] = mostGuessable(base, omnimatch(base));
+      const count = Math.floor(cpLength(found[0]) / cpLength(base));
+      const i = cpIndex(password, found.index);
+      matches.push(match('repeat', i, i + cpLength(found[0]) - 1, found[0],
+        baseGuesses * count, { base, count }));
+    }
+    return matches;
+  }
+
+  function sequenceMatches(password) {
+    const matches = [];
+    const codes = codePoints(password).map((c) => c.codePointAt(0));
+    const n = codes.length;
+    let i = 0;
+    while (i < n - 2) {
+      const delta = codes[i + 1] - codes[i];
+      let j = i + 1;
+      while (j + 1 < n && codes[j + 1] - codes[j] === delta) j += 1;
+      if (j - i >= 2 && delta !== 0 && Math.abs(delta) <= 5) {
+        const token = String.fromCodePoint(...codes.slice(i, j + 1));
+        const first = String.fromCodePoint(codes[i]);
+        let base = 26;
+        if ('aAzZ019'.includes(first)) base = 4;
+        else if (isDigits(first)) base = 10;
+        matches.push(match('sequence', i, j, token, base * (j - i + 1) * (delta > 0 ? 1 : 2),
+          { ascending: delta > 0 }));
+      }
+      // Any later start inside the run has the same step and ends at j too
+      i = j;
+    }
+    return matches;
+  }
+
+  const DATE_WITH_SEPARATOR = /^(\d{1,4})([\s/\\_.-])(\d{1,2})\2(\d{1,4})$/;
+
+  function dateMatches(password) {
+    const matches = [];
+    const chars = codePoints(password);
+    const n = chars.length;
+    for (let i = 0; i < n; i++) {
+      for (let j = i + 3; j < Math.min(n, i + 10); j++) {
+        const token = chars.slice(i, j + 1).join('');
+        let year = null;
+        let separator = '';
+        if (isDigits(token)) {
+          year = yearInDigits(token);
+        } else {
+          const found = DATE_WITH_SEPARATOR.exec(token);
+          if (found) {
+            year = yearInParts(found[1], found[3], found[4]);
+            separator = found[2];
+          }
+        }
+        if (year !== null) {
+          const guesses = 365 * Math.max(Math.abs(T.referenceYear - year), T.minYearSpace) * (separator ? 4 : 1);
+          matches.push(match('date', i, j, token, guesses, { year, separator }));
+        }
+      }
+    }
+    for (const found of password.matchAll(/(?=(19\d\d|20\d\d))/g)) {
+      const year = parseInt(found[1], 10);
+      const i = cpIndex(password, found.index);
+      matches.push(match('date', i, i + 3, found[1],
+        Math.max(Math.abs(T.referenceYear - year), T.minYearSpace), { year, separator: '' }));
+    }
+    return matches;
+  }
+
+  function yearInDigits(digits) {
+    if (digits.length > 8) return null;
+    for (const yearLength of [4, 2]) {
+      for (const yearFirst of [false, true]) {
+        const restLength = digits.length - yearLength;
+        if (restLength < 2 || restLength > 4) continue;
+        const year = yearFirst ? digits.slice(0, yearLength) : digits.slice(-yearLength);
+        const rest = yearFirst ? digits.slice(yearLength) : digits.slice(0, restLength);
+        for (let cut = 1; cut < rest.length; cut++) {
+          const found = yearFirst
+            ? yearInParts(year, rest.slice(0, cut), rest.slice(cut))
+            : yearInParts(rest.slice(0, cut), rest.slice(cut), year);
+          if (found !== null) return found;
+        }
+      }
+    }
+    return null;
+  }
+
+  function yearInParts(first, second, third) {
+    let year;
+    let dayMonth;
+    if ((first.length === 2 || first.length === 4) && third.length <= 2) {
+      year = first;
+      dayMonth = [parseInt(second, 10), parseInt(third, 10)];
+    } else if ((third.length === 2 || third.length === 4) && first.length <= 2) {
+      year = third;
+      dayMonth = [parseInt(first, 10), parseInt(second, 10)];
+    } else {
+      return null;
+    }
+    const day = Math.max(...dayMonth);
+    const month = Math.min(...dayMonth);
+    if (!(month >= 1 && month <= 12 && day >= 1 && day <= 31)) return null;
+    const value = parseInt(year, 10);
+    if (year.length === 2) return value + (value > 50 ? 1900 : 2000);
+    return value >= 1000 && value <= 2050 ? value : null;
+  }
+
+  // ---- guesses --------------------------------------------------------------
+
+  function binomial(n, k) {
+    if (k < 0 || k > n) return 0;
+    let result = 1;
+    for (let i = 1; i <= k; i++) result = (result * (n - k + i)) / i;
+    return result;
+  }
+
+  function factorial(n) {
+    let result = 1;
+    for (let i = 2; i <= n; i++) result *= i;
+    return result;
+  }
+
+  function uppercaseVariations(token) {
+    const upper = [...token].filter(isUpper).length;
+    const lower = [...token].filter(isLower).length;
+    if (upper === 0) return 1;
+    const chars = codePoints(token);
+    if (lower === 0 || (upper === 1 && (isUpper(chars[0]) || isUpper(chars[chars.length - 1])))) return 2;
+    let variations = 0;
+    for (let k = 1; k <= Math.min(upper, lower); k++) variations += binomial(upper + lower, k);
+    return variations;
+  }
+
+  function l33tVariations(token, used) {
+    let variations = 1;
+    const lower = [...token.toLowerCase()];
+    for (const [sub, letter] of used) {
+      const subbed = lower.filter((c) => c === sub).length;
+      const unsubbed = lower.filter((c) => c === letter).length;
+      if (subbed === 0 || unsubbed === 0) {
+        variations *= 2;
+      } else {
+        let sum = 0;
+        for (let k = 1; k <= Math.min(subbed, unsubbed); k++) sum += binomial(subbed + unsubbed, k);
+        variations *= sum;
+      }
+    }
+    return variations;
+  }
+
+  function spatialGuesses(length, turns, keys, degree, shifted) {
+    let guesses = 0;
+    for (let i = 2; i <= length; i++) {
+      for (let j = 1; j <= Math.min(turns, i - 1); j++) guesses += binomial(i - 1, j - 1) * keys * degree ** j;
+    }
+    const unshifted = length - shifted;
+    if (shifted && !unshifted) {
+      guesses *= 2;
+    } else if (shifted) {
+      let sum = 0;
+      for (let k = 1; k <= Math.min(shifted, unshifted); k++) sum += binomial(length, k);
+      guesses *= sum;
+    }
+    return guesses;
+  }
+
+  function mostGuessable(password, matches) {
+    const chars = codePoints(password);
+    const n = chars.length;
+    if (n === 0) return [1, []];
+    const byEnd = Array.from({ length: n }, () => []);
+    for (const m of matches) byEnd[m.j].push(m);
+    // Entries are [score, product, match (null for brute force), previous length, start]
+    const best = Array.from({ length: n }, () => new Map());
+    // Sequence length -> [product, start] of the cheapest brute force run to begin
+    const runStarts = new Map();
+
+    function consider(m, start, guesses, k, length, prod) {
+      prod *= guesses;
+      const score = factorial(length) * prod + T.minGuessesBeforeGrowingSequence ** (length - 1);
+      const current = best[k].get(length);
+      if (current === undefined || score < current[0]) best[k].set(length, [score, prod, m, length - 1, start]);
+    }
+
+    for (let k = 0; k < n; k++) {
+      for (const m of byEnd[k]) {
+        let guesses = m.guesses;
+        const tokenLength = m.j - m.i + 1;
+        if (tokenLength < n) {
+          guesses = Math.max(guesses, tokenLength === 1 ? T.minSubmatchGuessesSingleChar : T.minSubmatchGuessesMultiChar);
+        }
+        if (m.i === 0) {
+          consider(m, 0, guesses, k, 1, 1);
+        } else {
+          for (const [length, [, prod]] of best[m.i - 1]) consider(m, m.i, guesses, k, length + 1, prod);
+        }
+      }
+      consider(null, 0, T.bruteforceCardinality ** (k + 1), k, 1, 1);
+      for (const [length, [prod, i]] of runStarts) {
+        consider(null, i, T.bruteforceCardinality ** (k - i + 1), k, length + 1, prod);
+      }
+
+      // Same pruning as _most_guessable: drop lengths that always lose to a shorter one
+      const candidates = best[k];
+      let fewest = Infinity;
+      let fewestOpen = Infinity;
+      for (const length of [...candidates.keys()].sort((a, b) => a - b)) {
+        const [, prod, m] = candidates.get(length);
+        if (m === null) {
+          if (prod >= fewest) candidates.delete(length);
+          else fewest = prod;
+          continue;
+        }
+        if (prod >= fewestOpen) {
+          candidates.delete(length);
+          continue;
+        }
+        fewest = Math.min(fewest, prod);
+        fewestOpen = prod;
+        const start = runStarts.get(length);
+        if (start === undefined || prod < start[0] * T.bruteforceCardinality ** (k + 1 - start[1])) {
+          runStarts.set(length, [prod, k + 1]);
+        }
+      }
+    }
+
+    let length = null;
+    let score = Infinity;
+    for (const [l, entry] of best[n - 1]) {
+      if (entry[0] < score) {
+        score = entry[0];
+        length = l;
+      }
+    }
+    const sequence = [];
+    let k = n - 1;
+    while (length) {
+      const [, , found, previous, start] = best[k].get(length);
+      const m = found || match('bruteforce', start, k, chars.slice(start, k + 1).join(''),
+        T.bruteforceCardinality ** (k - start + 1));
+      sequence.push(m);
+      k = start - 1;
+      length = previous;
+    }
+    return [score, sequence.reverse()];
+  }
+
+  // ---- feedback -------------------------------------------------------------
+
+  const DEFAULT_SUGGESTIONS = ['Use a few words, avoid common phrases', 'No need for symbols, digits, or uppercase letters'];
+
+  function feedback(password, score, sequence) {
+    if (!password) return ['', DEFAULT_SUGGESTIONS];
+    if (score > 2) return ['', []];
+    let longest = sequence[0];
+    for (const m of sequence) if (cpLength(m.token) > cpLength(longest.token)) longest = m;
+    const [warning, suggestions] = matchFeedback(longest, sequence.length === 1);
+    return [warning, ['Add another word or two. Uncommon words are better.', ...suggestions]];
+  }
+
+  function matchFeedback(m, whole) {
+    if (m.pattern === 'dictionary') return dictionaryFeedback(m, whole);
+    if (m.pattern === 'spatial') {
+      const warning = m.details.turns === 1 ? 'Straight rows of keys are easy to guess' : 'Short keyboard patterns are easy to guess';
+      return [warning, ['Use a longer keyboard pattern with more turns']];
+    }
+    if (m.pattern === 'repeat') {
+      const warning = cpLength(m.details.base) === 1
+        ? 'Repeats like "aaa" are easy to guess'
+        : 'Repeats like "abcabcabc" are only slightly harder to guess than "abc"';
+      return [warning, ['Avoid repeated words and characters']];
+    }
+    if (m.pattern === 'sequence') return ['Sequences like abc or 6543 are easy to guess', ['Avoid sequences']];
+    if (m.pattern === 'date') {
+      if (m.details.separator || cpLength(m.token) > 4) {
+        return ['Dates are often easy to guess', ['Avoid dates and years that are associated with you']];
+      }
+      return ['Recent years are easy to guess', ['Avoid recent years', 'Avoid years that are associated with you']];
+    }
+    return ['', []];
+  }
+
+  function dictionaryFeedback(m, whole) {
+    const name = m.details.dictionary;
+    let warning = '';
+    if (name === 'common_passwords') {
+      if (whole && !m.details.l33t && !m.details.reversed) {
+        if (m.details.rank <= 10) warning = 'This is a top-10 common password';
+        else if (m.details.rank <= 100) warning = 'This is a top-100 common password';
+        else warning = 'This is a very common password';
+      } else {
+        warning = 'This is similar to a commonly used password';
+      }
+    } else if (name === 'english' && whole) {
+      warning = 'A word by itself is easy to guess';
+    } else if (name === 'names') {
+      warning = whole ? 'Names and surnames by themselves are easy to guess' : 'Common names and surnames are easy to guess';
+    }
+    const suggestions = [];
+    const token = m.token;
+    const [first = '', ...rest] = codePoints(token);
+    if (isUpper(first) && rest.join('').toLowerCase() === rest.join('')) {
+      suggestions.push("Capitalization doesn't help very much");
+    } else if (token.toUpperCase() === token && token.toLowerCase() !== token) {
+      suggestions.push('All-uppercase is almost as easy to guess as all-lowercase');
+    }
+    if (m.details.reversed && cpLength(token) >= 4) suggestions.push("Reversed words aren't much harder to guess");
+    if (m.details.l33t) suggestions.push("Predictable substitutions like '@' instead of 'a' don't help very much");
+    return [warning, suggestions];
+  }
+
+  // ---- public API -----------------------------------------------------------
+
+  function estimate(password) {
+    let guesses = 1;
+    let bits = 0;
+    const sequence = [];
+    const chars = codePoints(password);
+    const chunks = Math.max(Math.ceil(chars.length / T.maxAnalysedLength), 1);
+    for (let c = 0; c < chunks; c++) {
+      const chunk = chars.slice(c * T.maxAnalysedLength, (c + 1) * T.maxAnalysedLength).join('');
+      const [chunkGuesses, chunkSequence] = mostGuessable(chunk, omnimatch(chunk));
+      guesses *= chunkGuesses;
+      bits += chunkGuesses > 1 ? Math.log2(chunkGuesses) : 0;
+      sequence.push(...chunkSequence);
+    }
+    const score = T.scoreThresholds.filter((threshold) => guesses >= threshold).length;
+    const [warning, suggestions] = feedback(password, score, sequence);
+    return { score, guesses, entropyBits: bits, label: T.labels[score], warning, suggestions, sequence };
+  }
+
+  // Updates the strength and feedback labels of a password input; ids are NiceGUI element ids
+  function render(password, labelId, feedbackId) {
+    return load().then(() => {
+      const label = document.getElementById(`c${labelId}`);
+      const note = document.getElementById(`c${feedbackId}`);
+      if (!label || !note) return;
+      if (!password) {
+        label.textContent = '';
+        note.textContent = '';
+        return;
+      }
+      const report = estimate(password);
+      const [icon, color] = STYLES[report.score];
+      const text = report.label.charAt(0).toUpperCase() + report.label.slice(1);
+      label.textContent = `${icon} ${text} (~${Math.round(report.entropyBits)} bits)`;
+      label.style.color = color;
+      note.textContent = report.warning || report.suggestions[0] || '';
+    });
+  }
+
+  window.pgStrength = { load, estimate: (password) => load().then(() => estimate(password)), render };
+})();
@@ -0,0 +1,28 @@
+// Row-level updates for ui.table. The rows live in the page's element store, so changing
+// them in place makes Vue re-render only the affected rows instead of receiving the whole
+// table again from the server.
+window.pgTable = {
+  _props(id) {
+    return mounted_app.elements[id].props;
+  },
+  patch(id, key, rows) {
+    const current = this._props(id).rows;
+    for (const row of rows) {
+      const i = current.findIndex((r) => r[key] === row[key]);
+      if (i >= 0) current.splice(i, 1, row);
+    }
+  },
+  remove(id, key, keys) {
+    const current = this._props(id).rows;
+    for (let i = current.length - 1; i >= 0; i--) {
+      if (keys.includes(current[i][key])) current.splice(i, 1);
+    }
+  },
+  insert(id, index, rows) {
+    this._props(id).rows.splice(index, 0, ...rows);
+  },
+  setPagination(id, changes) {
+    const props = this._props(id);
+    props.pagination = { ...props.pagination, ...changes };
+  },
+};
@@ -0,0 +1,58 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+import bootstrap
+
+
+# Settings applied to every SQLite connection. Profiles without a key keep SQLite's default.
+PROFILES = {
+    # Plain SQLite, the way the app always ran
+    'default': {},
+    # WAL lets readers carry on while a session writes; the rest trades a little
+    # durability on power loss (not on crash) and memory for fewer syscalls
+    'tuned': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'busy_timeout': 5000,
+        'foreign_keys': 'ON',
+        'pool_size': 10,
+        'max_overflow': 20,
+    },
+    # Private in-memory database shared by all threads, for tests and tools
+    'memory': {
+        'in_memory': True,
+        'foreign_keys': 'ON',
+    },
+}
+
+_PRAGMAS = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'busy_timeout', 'foreign_keys')
+
+
+def create_storage_engine(profile: str | dict | None = None, db_file_name: str | None = None) -> Engine:
+    if profile is None:
+        profile = bootstrap.settings().db_profile
+    settings = PROFILES[profile] if isinstance(profile, str) else profile
+
+    if settings.get('in_memory'):
+        engine = create_engine(
+            'sqlite://',
+            connect_args={'check_same_thread': False},
+            poolclass=StaticPool,
+        )
+    else:
+        db_file_name = db_file_name or bootstrap.settings().db_file_name
+        pool_args = {key: settings[key] for key in ('pool_size', 'max_overflow') if key in settings}
+        engine = create_engine(f"sqlite:///{db_file_name}", **pool_args)
+
+    pragmas = [(name, settings[name]) for name in _PRAGMAS if name in settings]
+    if pragmas:
+        @event.listens_for(engine, 'connect')
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
+
+    return engine
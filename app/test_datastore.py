@@ -1,17 +1,49 @@
+import hashlib
+import json
+import math
 import sys
 import os
+import time
+import asyncio
+import threading
+import io
+import shutil
+import subprocess
+import contextlib
+import types
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+import bootstrap
 import datastore
-from utils.password_utils import get_password_strength
+from storage import create_storage_engine
+import async_datastore
+import importer
+import exporter
+import benchmark
+from model.models import Meta, Password
+from utils.strength import estimate_strength, export_tables
+import utils.strength as strength
+from utils.key_ring import KeyRing, KeyRingExpiredError
+from services.password_service import PasswordService
+from services.session_registry import SessionRegistry
+from utils.kdf_service import KdfBusyError, KdfService
+from utils import password_generator
+import utils.password_utils as pe
+from utils import kdf_service, metrics, profiling
+from utils.breach import BreachCorpus, compile_corpus
+from utils.wordlist import load_wordlist, wordlist_available
+from utils.password_strategies import PassphraseStrategy
+from ui import row_patch, session_expiry
+
+bootstrap.load_config()
 
 # Fixture that runs automatically before each test.
 # Creates a clean, in-memory SQLite database to avoid affecting real data.
 @pytest.fixture(autouse=True)
-def setup_test_db(tmp_path):
-    test_db_path = tmp_path / "test_db.sqlite"
-    test_engine = create_engine(f"sqlite:///{test_db_path}")
+def setup_test_db():
+    test_engine = create_storage_engine("memory")
     datastore._engine = test_engine
 
     datastore.init_database()
@@ -24,11 +56,12 @@ def test_unique_username_platform_pair():
     master_pwd = "MasterPassword123!"
     datastore.set_master_password("testuser", master_pwd)
     meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", master_pwd)
     
-    id_1 = datastore.save_password(meta.id, "bostoro", "github.com", "mi_pass_1", master_pwd)
+    id_1 = datastore.save_password(meta.id, "bostoro", "github.com", "mi_pass_1", keys)
     assert id_1 is not None, "Should be able to save the first password"
     
-    id_2 = datastore.save_password(meta.id, "bostoro", "github.com", "mi_pass_2", master_pwd)
+    id_2 = datastore.save_password(meta.id, "bostoro", "github.com", "mi_pass_2", keys)
     
     assert id_2 is None, "Should fail when saving a duplicate username+platform"
 
@@ -45,15 +78,16 @@ def test_save_and_retrieve_passwords():
     master = "Master123!"
     datastore.set_master_password("testuser", master)
     meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", master)
     
-    datastore.save_password(meta.id, "user1", "siteA.com", "secret1", master)
-    datastore.save_password(meta.id, "user2", "siteB.com", "secret2", master)
+    datastore.save_password(meta.id, "user1", "siteA.com", "secret1", keys)
+    datastore.save_password(meta.id, "user2", "siteB.com", "secret2", keys)
     
-    masked_results = datastore.get_all_passwords(meta.id, master, show_real_passwords=False)
+    masked_results = datastore.get_all_passwords(meta.id, keys, show_real_passwords=False)
     assert len(masked_results) == 2
     assert masked_results[0][3] == "********", "The password should be masked"
     
-    real_results = datastore.get_all_passwords(meta.id, master, show_real_passwords=True)
+    real_results = datastore.get_all_passwords(meta.id, keys, show_real_passwords=True)
     assert real_results[0][3] == "secret1", "Should decrypt and show the real password"
 
 def test_update_master_password_reencrypts_data():
@@ -62,7 +96,7 @@ def test_update_master_password_reencrypts_data():
     
     datastore.set_master_password("testuser", old_master)
     meta = datastore.get_meta("testuser")
-    datastore.save_password(meta.id, "test_user", "test_site", "my_secret", old_master)
+    datastore.save_password(meta.id, "test_user", "test_site", "my_secret", datastore.unlock("testuser", old_master))
     
     success = datastore.update_master_password("testuser", old_master, new_master)
     assert success is True
@@ -70,38 +104,124 @@ def test_update_master_password_reencrypts_data():
     assert not datastore.check_master_password("testuser", old_master)
     assert datastore.check_master_password("testuser", new_master)
     
-    results = datastore.get_all_passwords(meta.id, new_master, show_real_passwords=True)
+    assert datastore.unlock("testuser", old_master) is None
+    results = datastore.get_all_passwords(meta.id, datastore.unlock("testuser", new_master), show_real_passwords=True)
     assert results[0][3] == "my_secret"
 
 def test_delete_password():
     master = "Master123!"
     datastore.set_master_password("testuser", master)
     meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", master)
     
-    pwd_id = datastore.save_password(meta.id, "user1", "siteA", "pass1", master)
+    pwd_id = datastore.save_password(meta.id, "user1", "siteA", "pass1", keys)
     
-    assert len(datastore.get_all_passwords(meta.id, master)) == 1
+    assert len(datastore.get_all_passwords(meta.id, keys)) == 1
     
     # ¡AQUÍ ESTÁ EL CAMBIO! Pasamos meta.id como primer parámetro
     deleted = datastore.delete_password(meta.id, pwd_id)
     
     assert deleted is True
-    assert len(datastore.get_all_passwords(meta.id, master)) == 0
+    assert len(datastore.get_all_passwords(meta.id, keys)) == 0
 
 def test_password_strength_logic():
-    assert get_password_strength("weak") == "weak"
-    assert get_password_strength("12345") == "weak"
-    assert get_password_strength("Medium123") == "medium"
-    assert get_password_strength("SuperStrongP@ssw0rd!") == "strong"
+    assert estimate_strength("weak").score <= 1
+    assert estimate_strength("12345").score == 0
+    assert estimate_strength("Password1").score == 0
+    assert estimate_strength("SuperStrongP@ssw0rd!").score >= 3
+    assert estimate_strength("k8#Vq2!zLp9$").score == 4
+
+def test_strength_detects_patterns():
+    walk = estimate_strength("qwertyuiop[]")
+    assert walk.score <= 1 and walk.sequence[0].pattern == "spatial"
+    assert estimate_strength("P@ssw0rd").sequence[0].details["l33t"]
+    assert [m.pattern for m in estimate_strength("aaaaaaaa").sequence] == ["repeat"]
+    assert [m.pattern for m in estimate_strength("13051990").sequence] == ["date"]
+    report = estimate_strength("password")
+    assert report.warning == "This is a top-10 common password" and report.suggestions
+
+def test_strength_check_is_fast_on_long_inputs():
+    # The request budget is 1 ms a check; these used to take several, the long runs of one
+    # character and of l33t characters most of all
+    long_inputs = [
+        "A" * 64,
+        "8x~-Mz}0|H'F>\"T1&~;BN({Q%j~A_~7{@s'B0hS=17p}rPXQSzP21O+B0DAfCcH#",
+        "1|7!" * 16,
+        "Tr0ub4dour&3" * 5 + "!!!!",
+        "correcthorsebatterystaple",
+    ]
+    estimate_strength("warm up the tables")
+    for password in long_inputs:
+        timing = benchmark.measure(lambda: estimate_strength(password), rounds=3, min_round_time=0.02)
+        assert timing["min"] < 1e-3, (password, timing)
+
+def test_strength_tables_are_compiled_and_rebuilt(tmp_path):
+    path = str(tmp_path / "strength.tables")
+    compiled = strength.compile_tables(path)
+    assert list(strength._ranks(compiled["lookup"]["password"])) == [("common_passwords", 2)]
+    assert compiled["lookup"]["passw"] == 0, "Prefixes are kept so matching knows when to stop"
+    assert strength._load_compiled(path)["lookup"] == compiled["lookup"]
+
+    # A stale or damaged table is rebuilt from the word lists
+    with open(path, "wb") as f:
+        f.write(b"not a table")
+    assert strength._load_compiled(path)["lookup"] == compiled["lookup"]
+    os.utime(path, (0, 0))
+    assert strength._load_compiled(path)["lookup"] == compiled["lookup"]
+    assert os.path.getmtime(path) > 0
+
+def test_strength_tables_for_browser_meter():
+    tables = export_tables()
+    # The browser ranks words by list position, so the lists must keep rank order
+    assert tables["dictionaries"]["common_passwords"][:2] == ["123456", "password"]
+    assert tables["shiftedKeys"][:3] == "~!@" and tables["unshiftedKeys"][:3] == "`12"
+    json.dumps(tables)
+
+# Run through both meters; astral characters such as emoji are one character in Python
+STRENGTH_PARITY_PASSWORDS = [
+    "", "password", "P@ssw0rd", "qwerty123", "1qaz2wsx", "correcthorsebatterystaple",
+    "13051990", "12/05/1987", "abcabcabc", "zyxwvu", "Tr0ub4dour&3", "drowssap",
+    "kT9#vR2!qLm8$wXz", "ünïcødé", "😀password", "pass😀word1990", "🔐🔐🔐🔐",
+    "😀😁😂🤣", "ab😀cd2019", "𝒜𝒷𝒸qwerty",
+]
+NODE_STRENGTH_SCRIPT = """
+const fs = require('fs');
+const [, js, tables, passwords] = process.argv;
+globalThis.window = globalThis;
+globalThis.fetch = async () => ({ json: async () => JSON.parse(fs.readFileSync(tables, 'utf8')) });
+eval(fs.readFileSync(js, 'utf8'));
+(async () => {
+  const results = [];
+  for (const password of JSON.parse(fs.readFileSync(passwords, 'utf8'))) {
+    const report = await window.pgStrength.estimate(password);
+    results.push([report.score, report.guesses, report.warning]);
+  }
+  console.log(JSON.stringify(results));
+})();
+"""
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs Node.js")
+def test_browser_strength_meter_matches_server(tmp_path):
+    (tmp_path / "tables.json").write_text(json.dumps(export_tables()))
+    (tmp_path / "passwords.json").write_text(json.dumps(STRENGTH_PARITY_PASSWORDS))
+    strength_js = os.path.join(os.path.dirname(__file__), "static", "strength.js")
+    result = subprocess.run(["node", "-e", NODE_STRENGTH_SCRIPT, strength_js, str(tmp_path / "tables.json"),
+                             str(tmp_path / "passwords.json")], capture_output=True, text=True, check=True)
+
+    for password, (score, guesses, warning) in zip(STRENGTH_PARITY_PASSWORDS, json.loads(result.stdout)):
+        report = estimate_strength(password)
+        assert (password, score, warning) == (password, report.score, report.warning)
+        assert guesses == pytest.approx(report.guesses, rel=1e-9), password
 
 def test_update_password():
     master = "Master123!"
     datastore.set_master_password("testuser", master)
     meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", master)
     
-    pwd_id = datastore.save_password(meta.id, "user1", "siteA", "pass1", master)
+    pwd_id = datastore.save_password(meta.id, "user1", "siteA", "pass1", keys)
     
-    success = datastore.update_password(meta.id, pwd_id, "user1_edited", "siteA_edited", "pass1_edited", master)
+    success = datastore.update_password(meta.id, pwd_id, "user1_edited", "siteA_edited", "pass1_edited", keys)
     
     assert success is True
 
@@ -109,11 +229,12 @@ def test_update_password_duplicate():
     master = "Master123!"
     datastore.set_master_password("testuser", master)
     meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", master)
     
-    datastore.save_password(meta.id, "user1", "siteA", "pass1", master)
-    pwd_id = datastore.save_password(meta.id, "user2", "siteB", "pass2", master)
+    datastore.save_password(meta.id, "user1", "siteA", "pass1", keys)
+    pwd_id = datastore.save_password(meta.id, "user2", "siteB", "pass2", keys)
     
-    success = datastore.update_password(meta.id, pwd_id, "user1", "siteA", "pass2_edited", master)
+    success = datastore.update_password(meta.id, pwd_id, "user1", "siteA", "pass2_edited", keys)
     
     assert success is False
     
@@ -126,15 +247,722 @@ def test_user_isolation():
     
     meta_a = datastore.get_meta("userA")
     meta_b = datastore.get_meta("userB")
+    keys_a = datastore.unlock("userA", master_a)
+    keys_b = datastore.unlock("userB", master_b)
     
-    datastore.save_password(meta_a.id, "userA_account", "siteA.com", "secretA", master_a)
-    datastore.save_password(meta_b.id, "userB_account", "siteB.com", "secretB", master_b)
+    datastore.save_password(meta_a.id, "userA_account", "siteA.com", "secretA", keys_a)
+    datastore.save_password(meta_b.id, "userB_account", "siteB.com", "secretB", keys_b)
     
-    results_a = datastore.get_all_passwords(meta_a.id, master_a, show_real_passwords=True)
-    results_b = datastore.get_all_passwords(meta_b.id, master_b, show_real_passwords=True)
+    results_a = datastore.get_all_passwords(meta_a.id, keys_a, show_real_passwords=True)
+    results_b = datastore.get_all_passwords(meta_b.id, keys_b, show_real_passwords=True)
     
     assert len(results_a) == 1
     assert len(results_b) == 1
     assert results_a[0][3] == "secretA"
     assert results_b[0][3] == "secretB"
-    assert results_a[0][1] != results_b[0][1], "Users should not see each other's entries"
\ No newline at end of file
+    assert results_a[0][1] != results_b[0][1], "Users should not see each other's entries"
+
+def test_key_ring_expires_after_idle_ttl():
+    keys = KeyRing.from_master("Master123!", ttl=0.01)
+    token = keys.encrypt("secret")
+    time.sleep(0.02)
+
+    assert not keys.is_active()
+    with pytest.raises(KeyRingExpiredError):
+        keys.decrypt(token)
+
+def test_key_ring_wipe():
+    keys = KeyRing.generate()
+    assert keys.decrypt(keys.encrypt("secret")) == "secret"
+
+    keys.wipe()
+
+    assert not keys.is_active()
+    with pytest.raises(KeyRingExpiredError):
+        keys.encrypt("secret")
+
+def test_expired_session_sends_handlers_back_to_login(monkeypatch):
+    meta, keys = datastore.register("testuser", "Master123!")
+    service = PasswordService("testuser", meta.id, keys)
+    service.logout()
+    notices, navigations = [], []
+    monkeypatch.setattr(session_expiry.ui, "notify", lambda message, **kwargs: notices.append(message))
+    monkeypatch.setattr(session_expiry.ui.navigate, "to", navigations.append)
+
+    with pytest.raises(KeyRingExpiredError):
+        datastore.save_password(meta.id, "user1", "siteA", "pass1", keys)
+
+    @session_expiry.redirect_on_expiry
+    async def on_save():
+        await service.save_async("user1", "siteA", "pass1")
+        return "saved"
+
+    @session_expiry.redirect_on_expiry
+    def on_export():
+        service.ensure_active()
+
+    assert asyncio.run(on_save()) is None
+    on_export()
+    assert notices == ["Session expired, please log in again"] * 2 and navigations == ["/", "/"]
+    assert datastore.count_passwords(meta.id) == 0
+
+def test_reveal_all_keeps_order_and_reports_bad_rows():
+    master = "Master123!"
+    datastore.set_master_password("testuser", master)
+    meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", master)
+
+    for i in range(100):
+        datastore.save_password(meta.id, f"user{i}", "site.com", f"secret{i}", keys)
+    with Session(datastore._get_engine()) as session:
+        session.query(Password).filter_by(username="user42").update({"password": "not-a-token"})
+        session.commit()
+
+    results = datastore.get_all_passwords(meta.id, keys, show_real_passwords=True)
+
+    assert len(results) == 100
+    assert results[0][3] == "secret0"
+    assert results[99][3] == "secret99"
+    assert results[42][3] is None, "A broken row should not fail the whole call"
+
+def test_legacy_vault_migrates_to_data_key_and_resumes(monkeypatch):
+    master = "OldMaster!"
+    monkeypatch.setattr(datastore, "ROTATION_CHUNK_SIZE", 3)
+
+    # Vaults created before envelope encryption encrypt entries with the master key directly
+    master_keys = KeyRing.from_master(master)
+    with Session(datastore._get_engine()) as session:
+        meta = Meta(username="testuser", master_password=master_keys.encrypt(master))
+        session.add(meta)
+        session.flush()
+        for i in range(10):
+            session.add(Password(meta_id=meta.id, username=f"user{i}", platform="site.com",
+                                 password=master_keys.encrypt(f"secret{i}")))
+        session.commit()
+        meta_id = meta.id
+    with Session(datastore._get_engine()) as session:
+        session.query(Password).filter_by(username="user4").update({"password": "not-a-token"})
+        session.commit()
+    audit_fields = datastore._audit_fields
+
+    def crash_on_secret7(password, keys):
+        if password == "secret7":
+            raise RuntimeError("interrupted")
+        return audit_fields(password, keys)
+
+    monkeypatch.setattr(datastore, "_audit_fields", crash_on_secret7)
+    with pytest.raises(RuntimeError):
+        datastore.unlock("testuser", master)
+    meta = datastore.get_meta("testuser")
+    assert meta.data_key is None
+    assert meta.rotation_cursor == 6, "Chunks before the interruption stay committed"
+
+    monkeypatch.setattr(datastore, "_audit_fields", audit_fields)
+    progress = []
+    meta, keys = datastore.authenticate("testuser", master, on_progress=lambda done, total: progress.append(done))
+
+    assert progress == [6, 9, 10]
+    assert meta.data_key is not None
+    assert meta.rotation_key is None
+    assert meta.unreadable_entries == 1, "A row that cannot be decrypted is skipped, not a failed login"
+    results = datastore.get_all_passwords(meta_id, keys, show_real_passwords=True)
+    assert [r[3] for r in results] == [None if i == 4 else f"secret{i}" for i in range(10)]
+    assert datastore.unlock("testuser", master) is not None
+
+def test_update_master_password_only_rewraps_data_key():
+    datastore.set_master_password("testuser", "OldMaster!")
+    meta = datastore.get_meta("testuser")
+    datastore.save_password(meta.id, "user1", "siteA", "pass1", datastore.unlock("testuser", "OldMaster!"))
+    with Session(datastore._get_engine()) as session:
+        ciphertext_before = session.query(Password).first().password
+
+    assert datastore.update_master_password("testuser", "OldMaster!", "NewMaster123!")
+
+    with Session(datastore._get_engine()) as session:
+        assert session.query(Password).first().password == ciphertext_before
+    assert datastore.get_meta("testuser").data_key != meta.data_key
+
+def test_vault_audit_finds_reuse_and_weak_entries(monkeypatch):
+    datastore.set_master_password("testuser", "Master123!")
+    meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", "Master123!")
+    datastore.save_password(meta.id, "bob", "github.com", "Tq7#vLx9!pRz2mK", keys)
+    datastore.save_password(meta.id, "bob", "gitlab.com", "Tq7#vLx9!pRz2mK", keys)
+    weak_id = datastore.save_password(meta.id, "bob", "forum.net", "temp", keys)
+    datastore.save_passwords_bulk(meta.id, [("amy", "shop.com", "password1")], keys)
+    # Rows written before the audit columns existed
+    with datastore._get_engine().begin() as connection:
+        connection.execute(text("UPDATE passwords SET fingerprint = NULL, strength = NULL WHERE platform = 'forum.net'"))
+
+    assert datastore.backfill_audit(meta.id, keys, chunk_size=1) == 1
+    assert datastore.backfill_audit(meta.id, keys) == 0
+
+    monkeypatch.setattr(KeyRing, "decrypt_many", lambda *args: pytest.fail("The audit must not decrypt"))
+    groups, weak = datastore.get_vault_audit(meta.id, keys)
+    assert [[platform for _, _, platform in group] for group in groups] == [["github.com", "gitlab.com"]]
+    assert [(entry[0], entry[2]) for entry in weak][0] == (weak_id, "forum.net")
+    assert {entry[2] for entry in weak} == {"forum.net", "shop.com"}
+
+    datastore.update_password(meta.id, weak_id, "bob", "forum.net", "Tq7#vLx9!pRz2mK", keys)
+    groups, weak = datastore.get_vault_audit(meta.id, keys)
+    assert len(groups[0]) == 3 and [entry[2] for entry in weak] == ["shop.com"]
+
+def test_authenticate_and_register_use_one_query_and_one_derivation(monkeypatch):
+    import utils.key_ring
+    derivations = []
+    real_derive_key = utils.key_ring.derive_master_key
+    monkeypatch.setattr(utils.key_ring, "derive_master_key", lambda *args: derivations.append(1) or real_derive_key(*args))
+    statements = []
+    event.listen(datastore._get_engine(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    meta, keys = datastore.register("testuser", "Master123!")
+    assert meta.username == "testuser" and keys.is_active()
+    assert len(derivations) == 1 and len(statements) == 1
+    assert datastore.register("testuser", "Other123!") is None
+
+    derivations.clear()
+    statements.clear()
+    meta, keys = datastore.authenticate("testuser", "Master123!")
+    assert meta.username == "testuser"
+    assert len(derivations) == 1 and len(statements) == 1
+    pwd_id = datastore.save_password(meta.id, "user1", "siteA", "pass1", keys)
+    assert datastore.get_password_by_id(pwd_id, meta.id, keys) == "pass1"
+
+    assert datastore.authenticate("testuser", "Wrong123!") is None
+    assert datastore.authenticate("nobody", "Master123!") is None
+
+def test_async_datastore_round_trip():
+    async def scenario():
+        assert await async_datastore.set_master_password("testuser", "Master123!")
+        keys = await async_datastore.unlock("testuser", "Master123!")
+        meta = await async_datastore.get_meta("testuser")
+        pwd_id = await async_datastore.save_password(meta.id, "user1", "siteA", "pass1", keys)
+        assert await async_datastore.get_password_by_id(pwd_id, meta.id, keys) == "pass1"
+        results = await async_datastore.get_all_passwords(meta.id, keys, show_real_passwords=True)
+        assert results[0][3] == "pass1"
+        assert await async_datastore.delete_password(meta.id, pwd_id)
+
+    asyncio.run(scenario())
+
+def test_session_registry_lru_ttl_and_wipe():
+    now = [0.0]
+    registry = SessionRegistry(capacity=2, ttl=60, clock=lambda: now[0])
+    services = {name: PasswordService(name, i, KeyRing.generate(ttl=0)) for i, name in enumerate("abc")}
+
+    registry.put("browser-a", services["a"])
+    registry.put("browser-b", services["b"])
+    assert registry.get("browser-a") is services["a"]
+    registry.put("browser-c", services["c"])
+    # b was least recently used and makes room for c
+    assert registry.get("browser-b") is None and not services["b"].is_active()
+    assert len(registry) == 2
+
+    now[0] = 30
+    assert registry.get("browser-c") is services["c"]
+    now[0] = 75
+    assert registry.evict_expired() == 1
+    assert not services["a"].is_active() and registry.get("browser-c") is services["c"]
+
+    registry.remove("browser-c")
+    assert not services["c"].is_active() and len(registry) == 0
+    assert registry.evicted == 2
+
+def test_session_in_use_outlives_the_ttl():
+    now = [0.0]
+    registry = SessionRegistry(capacity=2, ttl=60, clock=lambda: now[0])
+    busy = PasswordService("busy", 1, KeyRing.generate(ttl=0))
+    idle = PasswordService("idle", 2, KeyRing.generate(ttl=0))
+    registry.put("browser-busy", busy)
+    registry.put("browser-idle", idle)
+
+    # Handlers on an open page call the service, never registry.get()
+    for now[0] in (40, 80, 120, 160):
+        busy.count()
+        assert registry.evict_expired() == (1 if now[0] == 80 else 0)
+
+    assert busy.is_active() and not idle.is_active()
+    now[0] = 221
+    assert registry.evict_expired() == 1 and not busy.is_active()
+
+def test_kdf_service_rejects_when_queue_is_full():
+    kdf = KdfService(workers=0, max_queue=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_derive():
+        started.set()
+        release.wait()
+        return b"key"
+
+    worker = threading.Thread(target=kdf.run, args=(slow_derive,))
+    worker.start()
+    started.wait()
+
+    assert kdf.stats()["in_flight"] == 1
+    with pytest.raises(KdfBusyError):
+        kdf.run(slow_derive)
+
+    release.set()
+    worker.join()
+    stats = kdf.stats()
+    assert stats["in_flight"] == 0
+    assert stats["completed"] == 1
+    assert stats["rejected"] == 1
+
+def test_async_logins_beyond_kdf_capacity_are_rejected(monkeypatch):
+    datastore.register("testuser", "Master123!")
+    kdf = KdfService(workers=0, max_queue=1)
+    monkeypatch.setattr(kdf_service, "_service", kdf)
+    release = threading.Event()
+    derive = pe._derive_master_key
+
+    def slow_derive(*args):
+        release.wait(5)
+        return derive(*args)
+
+    monkeypatch.setattr(pe, "_derive_master_key", slow_derive)
+
+    async def scenario():
+        logins = [asyncio.ensure_future(async_datastore.authenticate("testuser", "Master123!"))
+                  for _ in range(kdf.capacity() + 2)]
+        await asyncio.sleep(0.1)
+        # Turned away before they reach a thread, not queued behind the slow ones
+        assert sum(login.done() for login in logins) == 2
+        assert kdf.stats()["admitted"] == kdf.capacity()
+        release.set()
+        return await asyncio.gather(*logins, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, KdfBusyError) for result in results[kdf.capacity():])
+    assert all(result[0].username == "testuser" for result in results[:kdf.capacity()])
+    stats = kdf.stats()
+    assert stats["rejected"] == 2 and stats["admitted"] == 0
+
+def test_tuned_storage_profile_applies_pragmas(tmp_path):
+    engine = create_storage_engine("tuned", str(tmp_path / "tuned.sqlite"))
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+    engine.dispose()
+
+def test_keyset_pages_match_offset_pages():
+    datastore.set_master_password("testuser", "Master123!")
+    meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", "Master123!")
+    for i in range(23):
+        datastore.save_password(meta.id, f"user{i % 5}", f"site{i:02d}.com", "secret", keys)
+
+    seen = []
+    after = None
+    for page in range(3):
+        rows = datastore.get_passwords_page(meta.id, "username", descending=True, after=after, limit=10)
+        assert rows == datastore.get_passwords_page(meta.id, "username", descending=True, offset=page * 10, limit=10)
+        seen.extend(rows)
+        after = (rows[-1][1], rows[-1][0])
+
+    assert len(seen) == 23
+    assert [r[1] for r in seen] == sorted((r[1] for r in seen), reverse=True)
+    assert all(r[3] == "********" for r in seen)
+
+def test_page_filter_and_count():
+    datastore.set_master_password("testuser", "Master123!")
+    meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", "Master123!")
+    datastore.save_password(meta.id, "alice", "github.com", "secret", keys)
+    datastore.save_password(meta.id, "bob", "gitlab.com", "secret", keys)
+    datastore.save_password(meta.id, "carol", "example.org", "secret", keys)
+
+    assert datastore.count_passwords(meta.id) == 3
+    assert datastore.count_passwords(meta.id, "git") == 2
+    rows = datastore.get_passwords_page(meta.id, "platform", filter_text="git")
+    assert [r[2] for r in rows] == ["github.com", "gitlab.com"]
+
+def test_full_text_search_prefix_fuzzy_and_sync():
+    datastore.set_master_password("testuser", "Master123!")
+    datastore.set_master_password("other", "Master123!")
+    meta = datastore.get_meta("testuser")
+    other = datastore.get_meta("other")
+    keys = datastore.unlock("testuser", "Master123!")
+    github = datastore.save_password(meta.id, "alice", "github.com", "secret", keys)
+    gitlab = datastore.save_password(meta.id, "bob", "gitlab.com", "secret", keys)
+    datastore.save_password(meta.id, "github", "example.org", "secret", keys)
+    datastore.save_password(other.id, "mallory", "github.com", "secret", datastore.unlock("other", "Master123!"))
+
+    assert datastore.search_passwords(meta.id, "gith")[0] == github, "Platform matches rank first"
+    assert len(datastore.search_passwords(meta.id, "gith")) == 2, "Other users' entries are not returned"
+    assert datastore.search_passwords(meta.id, "bob git") == [gitlab]
+    assert datastore.search_passwords(meta.id, "gitlba") == [gitlab], "Typos fall back to close terms"
+
+    datastore.update_password(meta.id, gitlab, "bob", "bitbucket.org", "secret", keys)
+    assert datastore.search_passwords(meta.id, "gitlab") == []
+    assert datastore.search_passwords(meta.id, "bitbucket") == [gitlab]
+    datastore.delete_password(meta.id, github)
+    assert datastore.get_passwords_by_ids(meta.id, datastore.search_passwords(meta.id, "github"))[0][1] == "github"
+
+def test_import_firefox_csv_in_chunks_reports_duplicates():
+    datastore.set_master_password("testuser", "Master123!")
+    meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", "Master123!")
+    datastore.save_password(meta.id, "alice", "github.com", "existing", keys)
+    export = io.StringIO(
+        '"url","username","password","httpRealm","formActionOrigin","guid","timeCreated"\n'
+        '"https://www.github.com","alice","imported","","","{1}","1"\n'
+        '"https://gitlab.com","bob","pw-bob","","","{2}","1"\n'
+        '"https://example.org","carol","pw-carol","","","{3}","1"\n'
+        '"https://gitlab.com","bob","pw-bob-again","","","{4}","1"\n'
+        '"https://example.org","","no-username","","","{5}","1"\n'
+    )
+
+    report = importer.import_csv(meta.id, keys, export, chunk_size=2)
+
+    assert report.source_format == "firefox"
+    assert report.imported == 2
+    assert report.duplicates == [("alice", "github.com"), ("bob", "gitlab.com")]
+    assert report.skipped == 1
+    revealed = {(r[1], r[2]): r[3] for r in datastore.get_all_passwords(meta.id, keys, show_real_passwords=True)}
+    assert revealed == {("alice", "github.com"): "existing", ("bob", "gitlab.com"): "pw-bob",
+                        ("carol", "example.org"): "pw-carol"}
+
+def test_import_skips_entries_saved_concurrently(monkeypatch):
+    meta, keys = datastore.register("testuser", "Master123!")
+    audit_fields = datastore._audit_fields
+    raced = []
+
+    def racing_audit_fields(password, keys):
+        if not raced:
+            raced.append(None)
+            # Another tab saves the same entry after the duplicate lookup of the import ran
+            raced[0] = datastore.save_password(meta.id, "bob", "gitlab.com", "from-other-tab", keys)
+        return audit_fields(password, keys)
+
+    monkeypatch.setattr(datastore, "_audit_fields", racing_audit_fields)
+    export = io.StringIO(
+        "name,url,username,password\n"
+        "GitHub,https://github.com,alice,pw-alice\n"
+        "GitLab,https://gitlab.com,bob,pw-bob\n"
+        "Example,https://example.org,carol,pw-carol\n"
+    )
+
+    report = importer.import_csv(meta.id, keys, export)
+
+    assert raced[0] is not None
+    assert report.imported == 2 and report.duplicates == [("bob", "gitlab.com")]
+    revealed = {(r[1], r[2]): r[3] for r in datastore.get_all_passwords(meta.id, keys, show_real_passwords=True)}
+    assert revealed == {("alice", "github.com"): "pw-alice", ("bob", "gitlab.com"): "from-other-tab",
+                        ("carol", "example.org"): "pw-carol"}
+
+def test_import_detects_bitwarden_and_rejects_unknown_csv():
+    assert importer.detect_format(["folder", "favorite", "type", "name", "notes", "fields",
+                                   "login_uri", "login_username", "login_password", "login_totp"]) == "bitwarden"
+    assert importer.detect_format(["Group", "Title", "Username", "Password", "URL", "Notes"]) == "keepassxc"
+    with pytest.raises(ValueError):
+        importer.detect_format(["a", "b"])
+
+def test_export_archive_round_trip_and_tamper_detection():
+    datastore.set_master_password("testuser", "Master123!")
+    meta = datastore.get_meta("testuser")
+    keys = datastore.unlock("testuser", "Master123!")
+    for i in range(5):
+        datastore.save_password(meta.id, f"user{i}", "site.com", f"secret{i}", keys)
+
+    chunks = datastore.stream_passwords(meta.id, keys, chunk_size=2)
+    archive = b"".join(exporter.write_archive(chunks, "export passphrase", iterations=1000))
+
+    entries = list(exporter.read_archive(io.BytesIO(archive), "export passphrase"))
+    assert [(e[0], e[1], e[2]) for e in entries] == [(f"user{i}", "site.com", f"secret{i}") for i in range(5)]
+    with pytest.raises(exporter.ArchiveError):
+        list(exporter.read_archive(io.BytesIO(archive), "wrong passphrase"))
+    with pytest.raises(exporter.ArchiveError):
+        list(exporter.read_archive(io.BytesIO(archive[:-50]), "export passphrase"))
+
+def test_export_csv_can_be_imported_again():
+    datastore.set_master_password("testuser", "Master123!")
+    datastore.set_master_password("other", "Other123!")
+    meta = datastore.get_meta("testuser")
+    other = datastore.get_meta("other")
+    keys = datastore.unlock("testuser", "Master123!")
+    datastore.save_password(meta.id, "alice", "github.com", "p,w\"1", keys)
+
+    exported = b"".join(exporter.write_csv(datastore.stream_passwords(meta.id, keys))).decode()
+    other_keys = datastore.unlock("other", "Other123!")
+    report = importer.import_csv(other.id, other_keys, io.StringIO(exported))
+
+    assert report.imported == 1
+    assert datastore.get_all_passwords(other.id, other_keys, show_real_passwords=True)[0][1:4] == \
+        ("alice", "github.com", "p,w\"1")
+
+def _chi_square(text, alphabet):
+    expected = len(text) / len(alphabet)
+    return sum((text.count(c) - expected) ** 2 / expected for c in alphabet)
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_generate_batch_is_uniform(use_numpy):
+    if use_numpy and password_generator._numpy() is None:
+        pytest.skip("NumPy not installed")
+    alphabet = password_generator.build_alphabet()
+    passwords = password_generator.generate_batch(20000, 10, alphabet, use_numpy=use_numpy)
+
+    assert len(passwords) == 20000
+    assert all(len(p) == 10 and set(p) <= set(alphabet) for p in passwords)
+    # 93 degrees of freedom: 150 is far beyond the 0.1% critical value (~136)
+    assert _chi_square("".join(passwords), alphabet) < 150
+    # A 3 letter alphabet does not divide 256, so biased modulo mapping would show up here
+    assert _chi_square("".join(password_generator.generate_batch(1000, 100, "abc", use_numpy=use_numpy)), "abc") < 20
+
+def test_numpy_mapping_matches_translate():
+    if password_generator._numpy() is None:
+        pytest.skip("NumPy not installed")
+    mapper = password_generator._ByteMapper(password_generator.build_alphabet())
+    block = bytes(range(256)) * 4 + os.urandom(4096)
+
+    assert mapper.map(block, use_numpy=True) == mapper.map(block)
+
+def test_generate_stream_yields_lazily():
+    stream = password_generator.generate_stream(10**9, 12, "ab")
+    first = next(stream)
+    assert len(first) == 12 and set(first) <= {"a", "b"}
+
+def test_passphrase_from_compiled_wordlist(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("11111\tabacus\n11112\tabdomen\n11113\tabdominal\n11114\tabide\n11115\tabacus\n")
+
+    wordlist = load_wordlist(str(source))
+
+    assert (tmp_path / "words.txt.idx").exists()
+    assert len(wordlist) == 4, "Duplicates must not skew the word distribution"
+    assert [wordlist[i] for i in range(4)] == ["abacus", "abdomen", "abdominal", "abide"]
+    with pytest.raises(IndexError):
+        wordlist[4]
+
+    strategy = PassphraseStrategy(wordlist, word_count=5, separator=".", capitalize="title")
+    words = strategy.generate().split(".")
+    assert len(words) == 5
+    assert all(w.lower() in {"abacus", "abdomen", "abdominal", "abide"} and w[0].isupper() for w in words)
+    assert strategy.entropy_bits() == pytest.approx(10.0)
+    assert PassphraseStrategy(wordlist, word_count=5, capitalize="random").entropy_bits() == pytest.approx(15.0)
+
+def test_passphrase_entropy_counts_only_distinct_capitalizations(tmp_path):
+    # "42" and "Abide" look the same capitalized; "abacus" and "Abacus" collapse under title
+    (tmp_path / "words.txt").write_text("abacus\nAbacus\n42\nAbide\n")
+    wordlist = load_wordlist(str(tmp_path / "words.txt"))
+
+    lower = PassphraseStrategy(wordlist, word_count=4, capitalize="lower")
+    random_caps = PassphraseStrategy(wordlist, word_count=4, capitalize="random")
+    title = PassphraseStrategy(wordlist, word_count=4, capitalize="title")
+
+    assert lower.entropy_bits() == pytest.approx(8.0)
+    # abacus and Abacus each become "Abacus" half the time: forms abacus 1/8, Abacus 3/8,
+    # 42 2/8 and Abide 2/8
+    per_word = -sum(p * math.log2(p) for p in (1 / 8, 3 / 8, 2 / 8, 2 / 8))
+    assert random_caps.entropy_bits() == pytest.approx(4 * per_word)
+    assert random_caps.entropy_bits() < lower.entropy_bits() + 4
+    assert title.entropy_bits() == pytest.approx(4 * 1.5)
+
+def test_shipped_passphrase_wordlist():
+    assert wordlist_available()
+    wordlist = load_wordlist()
+
+    assert len(wordlist) == 7776
+    assert PassphraseStrategy(wordlist, word_count=6).entropy_bits() == pytest.approx(6 * math.log2(7776))
+    assert all(wordlist[i].isalpha() and wordlist[i].islower() for i in range(0, 7776, 97))
+
+@pytest.mark.parametrize("bloom_bits", [0, 10])
+def test_breach_corpus_lookup(tmp_path, bloom_bits):
+    lines = [f"{hashlib.sha1(f'leaked{i}'.encode()).hexdigest().upper()}:{i + 1}" for i in range(500)]
+    lines.append(f"{hashlib.sha1(b'leaked7').hexdigest().upper()}:100")
+    (tmp_path / "pwned.txt").write_text("\n".join(reversed(lines)) + "\n")
+    # An earlier compile with a filter that knows none of the new hashes
+    (tmp_path / "old.txt").write_text(f"{hashlib.sha1(b'old leak').hexdigest().upper()}:3\n")
+    compile_corpus(str(tmp_path / "old.txt"), str(tmp_path / "pwned.bin"), 10)
+
+    # A small run size forces the external merge of several sorted runs
+    count = compile_corpus(str(tmp_path / "pwned.txt"), str(tmp_path / "pwned.bin"), bloom_bits, run_size=64)
+    corpus = BreachCorpus(str(tmp_path / "pwned.bin"), str(tmp_path / "pwned.bin.bloom"))
+
+    assert count == len(corpus) == 500, "Repeated hashes are folded into one record"
+    assert corpus.check("leaked7") == 108
+    assert corpus.check("leaked0") == 1 and corpus.check("leaked499") == 500
+    assert corpus.check("not leaked") == 0
+    assert corpus.check("old leak") == 0
+    assert (tmp_path / "pwned.bin.bloom").exists() == bool(bloom_bits)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        ["old.txt", "pwned.txt", "pwned.bin"] + ["pwned.bin.bloom"] * bool(bloom_bits))
+
+def test_kdf_params_are_per_user_and_upgraded_on_login(monkeypatch):
+    datastore.set_master_password("alice", "Master123!")
+    datastore.set_master_password("bob", "Master123!")
+    alice, bob = datastore.get_meta("alice"), datastore.get_meta("bob")
+    assert alice.kdf_algorithm == pe.kdf_policy()[0]
+    assert alice.kdf_salt != bob.kdf_salt and alice.master_password != bob.master_password
+
+    # Accounts from before per-user parameters: PBKDF2 with the shared salt
+    master_keys = KeyRing.from_master("OldMaster!")
+    data_keys = KeyRing.generate()
+    with Session(datastore._get_engine()) as session:
+        meta = Meta(username="olduser", master_password=master_keys.encrypt("OldMaster!"),
+                    data_key=master_keys.wrap(data_keys))
+        session.add(meta)
+        session.commit()
+        meta_id = meta.id
+    pwd_id = datastore.save_password(meta_id, "user1", "siteA", "pass1", data_keys)
+
+    assert datastore.authenticate("olduser", "Wrong!") is None
+    assert datastore.get_meta("olduser").kdf_algorithm is None
+    meta, keys = datastore.authenticate("olduser", "OldMaster!")
+    assert meta.kdf_algorithm == pe.kdf_policy()[0] and meta.kdf_salt is not None
+    assert datastore.get_password_by_id(pwd_id, meta_id, keys) == "pass1"
+    assert datastore.check_master_password("olduser", "OldMaster!")
+
+    # A costlier policy is picked up on the next login
+    monkeypatch.setattr(pe, "_policy", ("pbkdf2", {"iterations": pe.ITERATIONS * 2}))
+    meta, keys = datastore.authenticate("olduser", "OldMaster!")
+    assert meta.kdf_algorithm == "pbkdf2" and json.loads(meta.kdf_params) == {"iterations": pe.ITERATIONS * 2}
+    assert datastore.get_password_by_id(pwd_id, meta_id, keys) == "pass1"
+    assert pe.calibrate("pbkdf2", target_ms=1) == pe.MIN_COST["pbkdf2"], "Calibration keeps the floor"
+
+def test_kdf_upgrade_ignores_calibration_noise_and_never_downgrades(monkeypatch):
+    def policy(iterations):
+        monkeypatch.setattr(pe, "_policy", ("pbkdf2", {"iterations": iterations}))
+
+    def stored():
+        meta = datastore.get_meta("testuser")
+        return meta.kdf_salt, json.loads(meta.kdf_params)["iterations"]
+
+    policy(20_000)
+    datastore.register("testuser", "Master123!")
+    registered = stored()
+
+    # Restarts on a busier or a faster host calibrate a little lower or higher
+    for iterations in (17_000, 24_000):
+        policy(iterations)
+        assert datastore.authenticate("testuser", "Master123!") is not None
+        assert stored() == registered, "Noise must not re-key the account"
+
+    policy(40_000)
+    datastore.authenticate("testuser", "Master123!")
+    assert stored()[1] == 40_000
+
+    policy(10_000)
+    datastore.authenticate("testuser", "Master123!")
+    assert stored()[1] == 40_000
+    assert datastore.update_master_password("testuser", "Master123!", "NewMaster123!")
+    salt, iterations = stored()
+    assert iterations == 40_000 and salt != registered[0], "A new master password keeps the higher cost"
+    assert datastore.authenticate("testuser", "NewMaster123!") is not None
+
+def test_benchmark_compare_flags_regressions():
+    baseline = {"reveal": {"min": 1.0}, "rotate": {"min": 1.0}}
+    results = {"reveal": {"min": 1.2}, "rotate": {"min": 1.5}, "new": {"min": 9.0}}
+    assert benchmark.compare(baseline, results, threshold=0.25) == [("rotate", pytest.approx(0.5))]
+
+    timing = benchmark.measure(lambda: None, rounds=3, min_round_time=0.001)
+    assert timing["loops"] > 1 and timing["min"] <= timing["median"]
+
+def test_metrics_time_operations_only_while_enabled(monkeypatch):
+    registry = metrics.get_registry()
+    registry.clear()
+    monkeypatch.setattr(metrics, "_enabled", False)
+    meta, keys = datastore.register("testuser", "Master123!")
+    assert "pg_db_seconds_count" not in registry.render()
+
+    monkeypatch.setattr(metrics, "_enabled", True)
+    datastore.authenticate("testuser", "Master123!")
+    datastore.get_all_passwords(meta.id, keys, show_real_passwords=True)
+    with pytest.raises(ZeroDivisionError):
+        with metrics.timed("page", "main"):
+            1 / 0
+    body = registry.render()
+    registry.clear()
+
+    assert 'pg_db_seconds_count{operation="login"} 1' in body
+    assert 'pg_db_seconds_bucket{operation="reveal_all",le="+Inf"} 1' in body
+    assert f'pg_kdf_seconds_count{{algorithm="{pe.kdf_policy()[0]}"}} 1' in body
+    assert 'pg_page_render_errors_total{page="main"} 1' in body
+    assert "# TYPE pg_kdf_rejected_total counter" in body
+
+def test_profiling_keeps_only_slow_calls_and_rotates(tmp_path, monkeypatch):
+    monkeypatch.setattr(bootstrap.settings(), "profile_dir", str(tmp_path))
+    monkeypatch.setattr(bootstrap.settings(), "profile_keep", 2)
+    monkeypatch.setattr(bootstrap.settings(), "profile_threshold_ms", 5)
+
+    @profiling.profiled("reveal")
+    async def on_reveal(e):
+        await asyncio.sleep(0.01)
+        return e
+
+    @profiling.profiled("page")
+    def render(slow):
+        time.sleep(0.01 if slow else 0)
+        return slow
+
+    monkeypatch.setattr(profiling, "_enabled", False)
+    assert asyncio.run(on_reveal("row")) == "row"
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setattr(profiling, "_enabled", True)
+    assert render(False) is False
+    assert list(tmp_path.iterdir()) == [], "Fast calls are not kept"
+    asyncio.run(on_reveal("row"))
+    render(True)
+    render(True)
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert len(names) == 2 and all(name.endswith("ms.prof") for name in names)
+    assert any("-page-" in name for name in names)
+
+def test_import_report_defers_heavy_imports_and_checks_budget(capsys):
+    total, rows = bootstrap.import_report(("services.password_service",))
+    names = {name.strip() for name, _, _ in rows}
+    assert "services.password_service" in names and "datastore" in names
+    assert total == pytest.approx(sum(self_ms for _, self_ms, _ in rows))
+    assert not {name.split(".")[0] for name in names} & {"numpy", "cryptography"}, "Loaded on first use only"
+
+    assert bootstrap.main(["services.password_service", "--budget-ms", "0", "--top", "3"]) == 1
+    out = capsys.readouterr().out
+    assert "Import time is over budget" in out and "services.password_service" in out
+
+def test_settings_from_dotenv_apply_to_modules_imported_first(tmp_path):
+    # Same order as benchmark.py: the app modules are imported before .env is loaded
+    (tmp_path / ".env").write_text("KDF_MAX_QUEUE=7\nSESSION_CAPACITY=3\nKEY_RING_TTL=42\n")
+    code = ("import benchmark, datastore, ui.layout; from utils.kdf_service import KdfService; "
+            "from services.session_registry import SessionRegistry; from utils.key_ring import KeyRing; "
+            "print(KdfService(workers=0)._max_queue, SessionRegistry()._capacity, SessionRegistry()._ttl, "
+            "KeyRing.generate()._ttl)")
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("KDF_MAX_QUEUE", "SESSION_CAPACITY", "SESSION_TTL", "KEY_RING_TTL")}
+    env["PYTHONPATH"] = bootstrap.APP_DIR
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["7", "3", "42", "42"]
+
+class _FakeTable:
+    # What row_patch uses of a ui.table, recording what would go to the browser
+    def __init__(self, rows):
+        self.id = 7
+        self.row_key = "id"
+        self.rows = rows
+        self.sent = []
+        self.full_updates = 0
+        self.props = types.SimpleNamespace(suspend_updates=contextlib.nullcontext)
+        self.client = types.SimpleNamespace(run_javascript=self.sent.append)
+
+    def update(self):
+        self.full_updates += 1
+
+def test_row_patch_sends_single_rows_and_falls_back_to_full_refresh():
+    table = _FakeTable([{"id": i, "password": "********"} for i in range(1, 4)])
+
+    row_patch.patch_rows(table, [{"id": 2, "password": "revealed"}])
+    assert table.sent == ['pgTable.patch(7, "id", [{"id": 2, "password": "revealed"}])']
+    assert table.rows[1] == {"id": 2, "password": "revealed"} and table.full_updates == 0
+
+    row_patch.remove_rows(table, [3])
+    assert table.sent[-1] == 'pgTable.remove(7, "id", [3])' and [row["id"] for row in table.rows] == [1, 2]
+
+    # Not on the current page: the browser gets the whole page again, no row patch
+    row_patch.patch_rows(table, [{"id": 1, "password": "x"}, {"id": 99, "password": "y"}])
+    assert table.full_updates == 1 and len(table.sent) == 2
+    assert table.rows[0] == {"id": 1, "password": "x"}
+
@@ -0,0 +1,75 @@
+import secrets
+import time
+from datetime import datetime
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from nicegui import app, ui
+from utils.profiling import profiled
+from .session_expiry import redirect_on_expiry
+
+EXPORT_LINK_TTL = 60
+
+# One-time download links: token -> (expires at, body factory, filename, media type)
+_pending_exports = {}
+
+
+@app.get('/export/{token}')
+def download_export(token: str):
+    # Starlette runs the sync generator in a worker thread, so the vault is read,
+    # decrypted and encrypted chunk by chunk while it is being sent
+    _drop_expired()
+    pending = _pending_exports.pop(token, None)
+    if pending is None:
+        raise HTTPException(status_code=404)
+    _, make_body, filename, media_type = pending
+    return StreamingResponse(
+        make_body(),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
+def _drop_expired():
+    now = time.monotonic()
+    for token in [t for t, pending in _pending_exports.items() if pending[0] < now]:
+        del _pending_exports[token]
+
+
+def _offer_download(make_body, filename: str, media_type: str):
+    _drop_expired()
+    token = secrets.token_urlsafe(32)
+    _pending_exports[token] = (time.monotonic() + EXPORT_LINK_TTL, make_body, filename, media_type)
+    ui.download.from_url(f'/export/{token}')
+
+
+def render_export_vault(service):
+    with ui.card().classes('w-full max-w-md mx-auto mt-8 p-6 shadow-lg rounded-xl'):
+        ui.label('Export Vault').classes('text-2xl font-bold mb-4 text-primary')
+
+        export_format = ui.radio({'archive': 'Encrypted archive', 'csv': 'Plain CSV'},
+                                 value='archive').props('inline').classes('mb-2')
+        passphrase = ui.input('Archive passphrase', password=True, password_toggle_button=True
+                              ).classes('w-full mb-2').bind_visibility_from(export_format, 'value',
+                                                                            value='archive')
+        ui.label('The CSV file is not encrypted. Anyone who gets it can read every password.'
+                 ).classes('text-sm text-red-500 mb-2').bind_visibility_from(export_format, 'value', value='csv')
+
+        @profiled('export')
+        @redirect_on_expiry
+        def on_export():
+            # The download runs later in its own request, where an expired key could not be reported
+            service.ensure_active()
+            stamp = datetime.now().strftime('%Y%m%d-%H%M')
+            if export_format.value == 'csv':
+                _offer_download(service.export_csv, f'vault-{stamp}.csv', 'text/csv')
+            else:
+                if not passphrase.value:
+                    ui.notify('Passphrase required', type='warning')
+                    return
+                secret = passphrase.value
+                _offer_download(lambda: service.export_archive(secret), f'vault-{stamp}.pgvault',
+                                'application/octet-stream')
+                passphrase.value = ''
+            ui.notify('Export started', type='positive')
+
+        ui.button('Export', on_click=on_export).classes('w-full')
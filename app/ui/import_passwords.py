@@ -0,0 +1,41 @@
+import csv
+import os
+import tempfile
+from nicegui import ui
+from utils.profiling import profiled
+from .session_expiry import redirect_on_expiry
+
+
+def render_import_passwords(service, on_imported=None):
+    with ui.card().classes('w-full max-w-md mx-auto mt-8 p-6 shadow-lg rounded-xl'):
+        ui.label('Import Passwords').classes('text-lg font-semibold mb-2')
+        ui.label('CSV export from Chrome, Firefox, Bitwarden or KeePass').classes('text-sm text-gray-500 mb-4')
+        result_label = ui.label('').classes('text-sm mt-2')
+
+        @profiled('import')
+        @redirect_on_expiry
+        async def on_upload(e):
+            # The importer reads from disk line by line, so the upload is never parsed in memory
+            fd, path = tempfile.mkstemp(suffix='.csv')
+            os.close(fd)
+            try:
+                await e.file.save(path)
+                report = await service.import_csv_async(path)
+            except (ValueError, UnicodeDecodeError, csv.Error) as error:
+                ui.notify(f'Import failed: {error}', type='negative')
+                return
+            finally:
+                os.unlink(path)
+
+            ui.notify(f'Imported {report.imported} passwords', type='positive')
+            result_label.text = (f'{report.source_format}: {report.imported} imported, '
+                                 f'{len(report.duplicates)} duplicates, {report.skipped} incomplete rows skipped')
+            if report.duplicates:
+                shown = ', '.join(f'{username} @ {platform}' for username, platform in report.duplicates[:5])
+                more = f' and {len(report.duplicates) - 5} more' if len(report.duplicates) > 5 else ''
+                result_label.text += f'. Already in the vault: {shown}{more}'
+            upload.reset()
+            if on_imported:
+                await on_imported()
+
+        upload = ui.upload(on_upload=on_upload, auto_upload=True).props('accept=.csv').classes('w-full')
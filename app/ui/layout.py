@@ -1,11 +1,28 @@
-from nicegui import ui
+from nicegui import app, ui
+from . import password_input, row_patch, view_passwords
 from .view_passwords import render_view_passwords
 from .update_master import render_update_master
 from .exit_app import render_exit_app
+from .export_vault import render_export_vault
+from .vault_audit import render_vault_audit
 from services.password_service import PasswordService
-import datastore as datastore
+from services.session_registry import get_session_registry
+import async_datastore
+from utils.kdf_service import KdfBusyError
+from utils import metrics
+from utils.profiling import profiled
 
-_current_service = None
+SESSION_SWEEP_INTERVAL = 60
+
+
+def start_session_sweep():
+    # Idle sessions are also swept when nobody is making requests; called once by main()
+    app.timer(SESSION_SWEEP_INTERVAL, lambda: get_session_registry().evict_expired())
+
+
+def _session_id() -> str:
+    # Every browser gets its own id in a signed cookie (needs storage_secret in ui.run)
+    return app.storage.browser['id']
 
 def setup_master_password_ui(on_success):
     with ui.card().classes('absolute-center w-full max-w-md p-6 shadow-xl rounded-2xl'):
@@ -13,45 +30,48 @@ def setup_master_password_ui(on_success):
         username = ui.input('Username').classes('w-full mb-2')
         master = ui.input('Master Password', password=True, password_toggle_button=True).classes('w-full mb-4')
 
-        def on_login():
+        @profiled('login')
+        async def on_login():
             u = username.value
             pwd = master.value
             if not u or not pwd:
                 ui.notify('All fields required', type='warning')
                 return
-            if not datastore.master_password_exists(u):
-                ui.notify('Username not found', type='negative')
+            try:
+                authenticated = await async_datastore.authenticate(u, pwd)
+            except KdfBusyError:
+                ui.notify('Server busy, please try again in a moment', type='warning')
                 return
-            if datastore.check_master_password(u, pwd):
-                meta = datastore.get_meta(u)
-                on_success(meta, pwd)
+            if authenticated:
+                on_success(*authenticated)
             else:
-                ui.notify('Wrong master password!', type='negative')
-        
-        def on_register():
+                ui.notify('Wrong username or master password!', type='negative')
+
+        @profiled('register')
+        async def on_register():
             u = username.value
             pwd = master.value
             if not u or not pwd:
                 ui.notify('All fields required', type='warning')
                 return
-            if datastore.master_password_exists(u):
-                ui.notify('Username already exists', type='negative')
+            try:
+                registered = await async_datastore.register(u, pwd)
+            except KdfBusyError:
+                ui.notify('Server busy, please try again in a moment', type='warning')
                 return
-            if datastore.set_master_password(u, pwd):
-                meta = datastore.get_meta(u)
-                on_success(meta, pwd)
+            if registered:
+                on_success(*registered)
             else:
-                ui.notify('Error creating user', type='negative')
+                ui.notify('Username already exists', type='negative')
 
-        master.on('keydown.enter', lambda: on_login())
+        master.on('keydown.enter', on_login)
         with ui.row().classes('w-full gap-2'):
             ui.button('Login', on_click=on_login).classes('w-full')
             ui.button('Register', on_click=on_register).classes('w-full')
 
-def build_main_ui(service):
+def build_main_ui(service, session_id: str):
     def on_logout():
-        global _current_service
-        _current_service = None
+        get_session_registry().remove(session_id)
         ui.navigate.to('/')
         
     with ui.header().classes('items-center bg-primary text-white justify-between px-6 py-2'):
@@ -60,6 +80,12 @@ def build_main_ui(service):
             with ui.dialog() as update_master_dialog, ui.card():
                 render_update_master(service)
             ui.icon('key', size='sm').classes('cursor-pointer').on('click', lambda: update_master_dialog.open())
+            with ui.dialog() as export_dialog, ui.card():
+                render_export_vault(service)
+            ui.icon('download', size='sm').classes('cursor-pointer').on('click', lambda: export_dialog.open())
+            with ui.dialog() as audit_dialog, ui.card():
+                render_vault_audit(service)
+            ui.icon('health_and_safety', size='sm').classes('cursor-pointer').on('click', lambda: audit_dialog.open())
             ui.icon('logout', size='sm').classes('cursor-pointer').on('click', on_logout)
             with ui.dialog() as exit_dialog, ui.card():
                 render_exit_app()
@@ -69,23 +95,35 @@ def build_main_ui(service):
 
 _styles_injector = None
 
+def register_assets():
+    # Shared head HTML and static files, added once at start-up instead of on import
+    password_input.register_assets()
+    row_patch.register_assets()
+    view_passwords.register_assets()
+
 def set_styles_injector(func):
     global _styles_injector
     _styles_injector = func
 
 @ui.page('/')
+@metrics.timed('page', 'main')
+@profiled('page')
 def render_layout():
-    global _current_service
     if _styles_injector:
         _styles_injector()
 
-    if _current_service:
-        build_main_ui(_current_service)
+    # Read while the page request is at hand; event handlers later run on the websocket
+    session_id = _session_id()
+    service = get_session_registry().get(session_id)
+    if service is not None:
+        build_main_ui(service, session_id)
         return
-        
-    def on_setup_success(meta, pwd):
-        global _current_service
-        _current_service = PasswordService(meta.username, meta.id, pwd)
+
+    def on_setup_success(meta, keys):
+        get_session_registry().put(session_id, PasswordService(meta.username, meta.id, keys))
+        if meta.unreadable_entries:
+            ui.notify(f'{meta.unreadable_entries} older password(s) could not be decrypted and were left as they were',
+                      type='warning')
         ui.navigate.to('/')
 
     setup_master_password_ui(on_setup_success)
\ No newline at end of file
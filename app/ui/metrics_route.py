@@ -0,0 +1,12 @@
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
+from nicegui import app
+from utils import metrics
+
+
+@app.get('/metrics')
+def get_metrics():
+    # Prometheus scrape target, only served while METRICS_ENABLED is set
+    if not metrics.enabled():
+        raise HTTPException(status_code=404)
+    return PlainTextResponse(metrics.get_registry().render(), media_type='text/plain; version=0.0.4')
@@ -1,51 +1,106 @@
-from nicegui import ui
+import json
+import os
+from fastapi.responses import JSONResponse
+from nicegui import app, ui
+from utils.strength import export_tables
+
+# The strength meter runs in the browser (static/strength.js) with the same tables as
+# utils/strength.py, so typing a password sends nothing to the server
+STRENGTH_JS = os.path.join(os.path.dirname(__file__), '..', 'static', 'strength.js')
+
+
+def register_assets():
+    app.add_static_file(local_file=STRENGTH_JS, url_path='/static/strength.js')
+    ui.add_head_html('<script src="/static/strength.js" defer></script>', shared=True)
+
+
+@app.get('/static/strength-tables.json')
+def strength_tables():
+    return JSONResponse(export_tables(), headers={'Cache-Control': 'public, max-age=86400'})
+
+
+def breach_text(count: int | None) -> str:
+    if not count:
+        return ''
+    return f'⚠️ Seen {count:,} times in data breaches'
+
+
+def warn_on_save(service, password: str):
+    # The server re-checks on save, whatever the browser meter showed
+    breaches = service.check_breach(password)
+    if breaches:
+        ui.notify(f'Saved, but this password has appeared in data breaches {breaches:,} times. Change it.',
+                  type='negative')
+        return
+    report = service.check_strength(password)
+    if report.score < 2:
+        ui.notify(f'Saved, but this password is {report.label}. {report.warning}'.strip(), type='warning')
+
 
 def render_password_input(service, target_input):
     with ui.dialog() as generate_dialog, ui.card():
         ui.label('Generate Password').classes('text-lg font-bold mb-2')
-        length_input = ui.number('Length', value=16, min=1, format='%.0f').classes('w-full mb-2')
-        with ui.expansion('Advanced options').classes('w-full mb-2'):
-            upper_cb = ui.checkbox('Uppercase (A-Z)', value=True)
-            lower_cb = ui.checkbox('Lowercase (a-z)', value=True)
-            num_cb = ui.checkbox('Numbers (0-9)', value=True)
-            sym_cb = ui.checkbox('Symbols (!@#)', value=True)
+        mode = ui.toggle({'characters': 'Characters', 'passphrase': 'Passphrase'}, value='characters').classes('mb-2')
+        if not service.passphrase_available():
+            mode.set_visibility(False)
+        with ui.column().classes('w-full').bind_visibility_from(mode, 'value', value='characters'):
+            length_input = ui.number('Length', value=16, min=1, format='%.0f').classes('w-full mb-2')
+            with ui.expansion('Advanced options').classes('w-full mb-2'):
+                upper_cb = ui.checkbox('Uppercase (A-Z)', value=True)
+                lower_cb = ui.checkbox('Lowercase (a-z)', value=True)
+                num_cb = ui.checkbox('Numbers (0-9)', value=True)
+                sym_cb = ui.checkbox('Symbols (!@#)', value=True)
+        with ui.column().classes('w-full').bind_visibility_from(mode, 'value', value='passphrase'):
+            words_input = ui.number('Words', value=6, min=3, max=20, format='%.0f').classes('w-full mb-2')
+            separator_input = ui.input('Separator', value='-').classes('w-full mb-2')
+            capitalize_select = ui.select({'lower': 'lowercase', 'title': 'Capitalized', 'random': 'Random'},
+                                          value='lower', label='Capitalization').classes('w-full mb-2')
+            entropy_label = ui.label('').classes('text-sm text-gray-500')
         def on_generate():
-            pwd = service.generate(
-                int(length_input.value or 16),
-                upper_cb.value, lower_cb.value,
-                num_cb.value, sym_cb.value
-            )
+            if mode.value == 'passphrase':
+                pwd, bits = service.generate_passphrase(
+                    int(words_input.value or 6),
+                    separator_input.value or '',
+                    capitalize_select.value,
+                )
+                entropy_label.text = f'{bits:.1f} bits of entropy'
+            else:
+                pwd = service.generate(
+                    int(length_input.value or 16),
+                    upper_cb.value, lower_cb.value,
+                    num_cb.value, sym_cb.value
+                )
             if pwd:
                 target_input.value = pwd
+                update_meter(pwd)
+                breach_label.text = breach_text(service.check_breach(pwd))
                 generate_dialog.close()
         ui.button('Generate', on_click=on_generate).classes('w-full mt-2')
 
     with ui.row().classes('items-center gap-1 mb-2 w-full justify-between'):
         with ui.dialog() as info_dialog, ui.card():
             ui.label('Password Strength Guide').classes('text-lg font-bold mb-2')
-            ui.label('❌ Weak: <6 characters, or missing uppercase, lowercase, or numbers or symbols')
-            ui.label('✅ Medium: >=6 characters with uppercase, lowercase and numbers and symbols')
-            ui.label('🔐 Strong: >=12 characters with uppercase, lowercase, numbers and symbols')
+            ui.label('Strength is the number of guesses an attacker needs, taking into account')
+            ui.label('common passwords, words, names, l33t spelling, keyboard walks, repeats and dates.')
+            ui.label('❌ Very weak / Weak: found within a million guesses')
+            ui.label('✅ Fair: found within a hundred million guesses')
+            ui.label('🔐 Strong / Very strong: needs ten billion guesses or more')
             ui.button('Close', on_click=info_dialog.close).classes('mt-4')
         with ui.row().classes('items-center gap-0'):
             ui.icon('info').classes('text-gray-400 cursor-pointer text-sm').on('click', lambda: info_dialog.open())
             strength_label = ui.label('').classes('text-sm font-semibold')
+            breach_label = ui.label('').classes('text-sm font-semibold ml-2').style('color: #B91C1C;')
         ui.button('Generate', on_click=lambda: generate_dialog.open()).classes('shrink-0')
+    feedback_label = ui.label('').classes('text-xs text-gray-500 -mt-2 mb-2')
+
+    def update_meter(pwd: str):
+        ui.run_javascript(f'pgStrength.render({json.dumps(pwd)}, {strength_label.id}, {feedback_label.id})')
+
+    # The breach corpus lives on the server: look the password up once the field is left
+    def on_blur():
+        breach_label.text = breach_text(service.check_breach(target_input.value))
 
-    def on_password_change():
-        pwd = target_input.value
-        if not pwd:
-            strength_label.text = ''
-            return
-        strength = service.check_strength(pwd)
-        if strength == 'weak':
-            strength_label.text = '❌ Weak'
-            strength_label.style('color: #EF4444;')
-        elif strength == 'strong':
-            strength_label.text = '🔐 Strong'
-            strength_label.style('color: #10B981;')
-        else:
-            strength_label.text = '✅ Medium'
-            strength_label.style('color: #F59E0B;')
-
-    target_input.on('keyup', lambda: on_password_change())
\ No newline at end of file
+    # Tables are fetched when the field is first focused, not on page load
+    target_input.on('focus', js_handler='() => pgStrength.load()')
+    target_input.on('blur', on_blur)
+    target_input.on('keyup', js_handler=f'(e) => pgStrength.render(e.target.value, {strength_label.id}, {feedback_label.id})')
@@ -0,0 +1,15 @@
+import hmac
+from fastapi import Header, HTTPException
+from nicegui import app
+import bootstrap
+from utils import profiling
+
+
+@app.post('/admin/profiling')
+def toggle_profiling(enabled: bool, authorization: str = Header('')):
+    # Admin switch for profiling a running server; hidden unless PROFILE_ADMIN_TOKEN is set
+    token = bootstrap.settings().profile_admin_token
+    if not token or not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        raise HTTPException(status_code=404)
+    profiling.set_enabled(enabled)
+    return {'enabled': profiling.enabled()}
@@ -0,0 +1,53 @@
+import json
+import os
+from nicegui import app, ui
+
+TABLE_PATCH_JS = os.path.join(os.path.dirname(__file__), '..', 'static', 'table_patch.js')
+
+
+def register_assets():
+    app.add_static_file(local_file=TABLE_PATCH_JS, url_path='/static/table_patch.js')
+    ui.add_head_html('<script src="/static/table_patch.js" defer></script>', shared=True)
+
+
+# A table.update() sends every row again. These keep the server copy of the rows in step
+# without triggering that, and send the browser only the rows that changed.
+
+def _send(table: ui.table, method: str, *args):
+    table.client.run_javascript(f'pgTable.{method}({table.id}, {", ".join(json.dumps(a) for a in args)})')
+
+
+def patch_rows(table: ui.table, rows: list[dict]):
+    # A row that is not on the page means the browser may hold other rows than the server
+    # copy (e.g. a page load ran in between), so the page is sent again in full instead
+    key = table.row_key
+    changed = {row[key]: row for row in rows}
+    found = set()
+    with table.props.suspend_updates():
+        for i, row in enumerate(table.rows):
+            if row[key] in changed:
+                table.rows[i] = changed[row[key]]
+                found.add(row[key])
+    if len(found) < len(changed):
+        table.update()
+        return
+    _send(table, 'patch', key, rows)
+
+
+def remove_rows(table: ui.table, keys: list):
+    key = table.row_key
+    with table.props.suspend_updates():
+        table.rows[:] = [row for row in table.rows if row[key] not in keys]
+    _send(table, 'remove', key, keys)
+
+
+def insert_rows(table: ui.table, index: int, rows: list[dict]):
+    with table.props.suspend_updates():
+        table.rows[index:index] = rows
+    _send(table, 'insert', index, rows)
+
+
+def set_pagination(table: ui.table, **changes):
+    with table.props.suspend_updates():
+        table.pagination = {**table.pagination, **changes}
+    _send(table, 'setPagination', changes)
@@ -1,8 +1,10 @@
 from nicegui import ui
-from .password_input import render_password_input
+from .password_input import render_password_input, warn_on_save
+from .session_expiry import redirect_on_expiry
+from utils.profiling import profiled
 
 
-def render_save_password(service, on_cancel=None):
+def render_save_password(service, on_cancel=None, on_saved=None):
     with ui.card().classes('w-full max-w-md mx-auto mt-8 p-6 shadow-lg rounded-xl'):
         ui.label('Save a Password').classes('text-lg font-semibold mb-4')
 
@@ -14,7 +16,9 @@ def render_save_password(service, on_cancel=None):
             
             render_password_input(service, password)
 
-        def on_save():
+        @profiled('save')
+        @redirect_on_expiry
+        async def on_save():
             u = username.value
             p_form = platform.value
             pwd = password.value
@@ -23,10 +27,13 @@ def render_save_password(service, on_cancel=None):
                 ui.notify('All fields are required!', type='warning')
                 return
 
-            saved_id = service.save(u, p_form, pwd)
+            saved_id = await service.save_async(u, p_form, pwd)
             if saved_id:
                 ui.notify(
                     f'Password saved with ID: {saved_id}', type='positive')
+                warn_on_save(service, pwd)
+                if on_saved:
+                    on_saved(saved_id, u, p_form)
                 username.value = ''
                 platform.value = ''
                 password.value = ''
@@ -0,0 +1,31 @@
+import asyncio
+import functools
+from nicegui import ui
+from utils.key_ring import KeyRingExpiredError
+
+
+def _back_to_login():
+    # The page reload drops the expired session from the registry and shows the login form
+    ui.notify('Session expired, please log in again', type='warning')
+    ui.navigate.to('/')
+
+
+def redirect_on_expiry(func):
+    # For event handlers that need the session key: once the key ring has expired or been
+    # wiped, the user is sent back to log in instead of the action failing silently
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except KeyRingExpiredError:
+                _back_to_login()
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except KeyRingExpiredError:
+            _back_to_login()
+    return wrapper
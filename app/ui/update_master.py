@@ -1,4 +1,6 @@
 from nicegui import ui
+from utils.kdf_service import KdfBusyError
+from utils.profiling import profiled
 
 def render_update_master(service):
     with ui.card().classes('w-full max-w-md mx-auto mt-8 p-6 shadow-lg rounded-xl'):
@@ -6,19 +8,55 @@ def render_update_master(service):
         
         old_master = ui.input('Old Master Password', password=True, password_toggle_button=True).classes('w-full mb-2')
         new_master = ui.input('New Master Password', password=True, password_toggle_button=True).classes('w-full mb-4')
-        
-        def on_update():
+        progress_bar = ui.linear_progress(value=0, show_value=False).classes('w-full mb-1 hidden')
+        progress_label = ui.label('').classes('text-sm text-gray-500 mb-2 hidden')
+
+        # The update runs in a worker thread, which reports here; the timer pushes it to the page
+        progress = {'done': 0, 'total': 0}
+
+        def on_progress(done, total):
+            progress['done'] = done
+            progress['total'] = total
+
+        def refresh_progress():
+            if progress['total']:
+                progress_bar.value = progress['done'] / progress['total']
+                progress_label.text = f"Re-encrypted {progress['done']} of {progress['total']} passwords"
+
+        progress_timer = ui.timer(0.2, refresh_progress, active=False)
+
+        @profiled('update_master')
+        async def on_update():
             old = old_master.value
             new = new_master.value
             if not old or not new:
                 ui.notify('Both fields required', type='warning')
                 return
-            
-            if service.update_master(old, new):
+
+            progress.update(done=0, total=0)
+            progress_bar.value = 0
+            progress_label.text = ''
+            progress_bar.classes(remove='hidden')
+            progress_label.classes(remove='hidden')
+            update_button.disable()
+            progress_timer.activate()
+            try:
+                success = await service.update_master_async(old, new, on_progress)
+            except KdfBusyError:
+                ui.notify('Server busy, please try again in a moment', type='warning')
+                return
+            finally:
+                progress_timer.deactivate()
+                refresh_progress()
+                update_button.enable()
+
+            if success:
                 ui.notify('Master password updated successfully!', type='positive')
                 old_master.value = ''
                 new_master.value = ''
+                progress_bar.classes(add='hidden')
+                progress_label.classes(add='hidden')
             else:
-                ui.notify('Failed to update. Wrong old password?', type='negative')
+                ui.notify('Failed to update. Wrong old password? Run it again to resume an interrupted update.', type='negative')
                 
-        ui.button('Update Password', on_click=on_update).classes('w-full')
+        update_button = ui.button('Update Password', on_click=on_update).classes('w-full')
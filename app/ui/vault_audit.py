@@ -0,0 +1,55 @@
+from nicegui import ui
+from utils.profiling import profiled
+from .session_expiry import redirect_on_expiry
+
+
+def render_vault_audit(service):
+    with ui.card().classes('w-full max-w-lg mx-auto mt-8 p-6 shadow-lg rounded-xl'):
+        ui.label('Vault Health').classes('text-2xl font-bold mb-4 text-primary')
+        progress_label = ui.label('').classes('text-sm text-gray-500 mb-2')
+        results = ui.column().classes('w-full gap-1')
+
+        # Older entries get their audit data first; the worker thread reports here
+        progress = {'done': 0, 'total': 0}
+
+        def on_progress(done, total):
+            progress['done'] = done
+            progress['total'] = total
+
+        def refresh_progress():
+            if progress['total']:
+                progress_label.text = f"Checked {progress['done']} of {progress['total']} older passwords"
+
+        progress_timer = ui.timer(0.2, refresh_progress, active=False)
+
+        @profiled('audit')
+        @redirect_on_expiry
+        async def on_audit():
+            progress.update(done=0, total=0)
+            progress_label.text = ''
+            audit_button.disable()
+            progress_timer.activate()
+            try:
+                await service.backfill_audit_async(on_progress)
+                groups, weak = await service.audit_async()
+            finally:
+                progress_timer.deactivate()
+                audit_button.enable()
+
+            progress_label.text = ''
+            results.clear()
+            with results:
+                if not groups and not weak:
+                    ui.label('✅ No reused or weak passwords found').classes('text-green-600')
+                    return
+                if groups:
+                    ui.label(f'🔁 {len(groups)} password(s) used more than once').classes('font-semibold mt-2')
+                    for group in groups:
+                        ui.label(', '.join(f'{platform} ({username})' for _, username, platform in group)
+                                 ).classes('text-sm text-gray-700')
+                if weak:
+                    ui.label(f'❌ {len(weak)} weak password(s)').classes('font-semibold mt-2')
+                    for _, username, platform, label in weak:
+                        ui.label(f'{platform} ({username}): {label}').classes('text-sm text-gray-700')
+
+        audit_button = ui.button('Check Vault', on_click=on_audit).classes('w-full mt-2')
@@ -1,9 +1,15 @@
+from datetime import datetime, timezone
 from nicegui import ui
+from datastore import PAGE_SIZE, SORT_COLUMNS
 from .save_password import render_save_password
-from .password_input import render_password_input
+from .import_passwords import render_import_passwords
+from .password_input import render_password_input, warn_on_save
+from utils.profiling import profiled
+from .row_patch import insert_rows, patch_rows, remove_rows, set_pagination
+from .session_expiry import redirect_on_expiry
 
 
-ui.add_head_html('''
+VIEW_STYLES = '''
 <style>
 
 .password-scroll {
@@ -20,7 +26,21 @@ ui.add_head_html('''
     z-index: 2;
 }
 </style>
-''', shared=True)
+'''
+
+
+def register_assets():
+    ui.add_head_html(VIEW_STYLES, shared=True)
+
+
+def _to_row(pwd) -> dict:
+    return {
+        'id': pwd[0],
+        'username': pwd[1],
+        'platform': pwd[2],
+        'password': pwd[3],
+        'date': pwd[4].strftime('%d %b %Y  %H:%M') if pwd[4] else ''
+    }
 
 
 def render_view_passwords(service):
@@ -29,16 +49,25 @@ def render_view_passwords(service):
             'text-2xl font-bold mb-4 text-primary')
 
         with ui.dialog() as save_dialog, ui.card().classes('w-full max-w-md'):
-            render_save_password(service, on_cancel=lambda: save_dialog.close())
+            render_save_password(service, on_cancel=lambda: save_dialog.close(),
+                                 on_saved=lambda *entry: on_saved(*entry))
+
+        with ui.dialog() as import_dialog, ui.card().classes('w-full max-w-md'):
+            render_import_passwords(service, on_imported=lambda: reload_page())
 
         with ui.row().classes('w-full items-center gap-2 mb-4'):
+            # Quasar only sends the value once typing pauses for 300 ms
+            search_input = ui.input('Search username or platform').props(
+                'clearable dense debounce=300').classes('w-64')
+            ui.button(icon='upload_file', on_click=lambda: import_dialog.open()
+                    ).props('flat').classes('ml-auto').tooltip('Import CSV')
             ui.button('+', on_click=lambda: save_dialog.open()
-                    ).classes('text-xl font-bold ml-auto')
+                    ).classes('text-xl font-bold')
 
         table_container = ui.column().classes('w-full hidden')
 
         columns = [
-            {'name': 'id', 'label': 'ID', 'field': 'id', 'sortable': True,
+            {'name': 'id', 'label': 'ID', 'field': 'id',
                 'classes': 'hidden', 'headerClasses': 'hidden'},
             {'name': 'username', 'label': 'Username', 'field': 'username',
                 'sortable': True, 'align': 'left', 'style': 'width: 15%'},
@@ -53,15 +82,124 @@ def render_view_passwords(service):
         ]
 
         with table_container:
-            table = ui.table(columns=columns, rows=[], row_key='id').classes(
-                'w-full').props('separator=cell')
+            # rowsNumber switches the Quasar table to server-side mode: sorting
+            # and paging emit 'request' and only the visible page is sent to the browser
+            pagination = {'sortBy': 'date', 'descending': True, 'page': 1,
+                          'rowsPerPage': PAGE_SIZE, 'rowsNumber': 0}
+            # Virtual scrolling keeps only the visible rows in the DOM, so large pages stay light
+            table = ui.table(columns=columns, rows=[], row_key='id', pagination=pagination).classes(
+                'w-full').style('max-height: 70vh').props(
+                f'separator=cell virtual-scroll :rows-per-page-options="[10, {PAGE_SIZE}, 50, 100, 500]"')
+
+            # (sort value, id) of the last row of every page shown so far for the current
+            # query, so stepping to the next page is a keyset query instead of an OFFSET.
+            # While searching, the ranked ids from the search index are paged instead.
+            page_keys = {}
+            current_query = {'key': None, 'total': 0, 'search_ids': []}
+            sort_fields = {'username': 1, 'platform': 2, 'date': 4}
+
+            @profiled('load_page')
+            async def load_page(request_pagination):
+                filter_text = (search_input.value or '').strip()
+                sort_by = request_pagination.get('sortBy')
+                if sort_by not in SORT_COLUMNS:
+                    sort_by = 'date'
+                descending = bool(request_pagination.get('descending'))
+                rows_per_page = request_pagination.get('rowsPerPage') or PAGE_SIZE
+                page = request_pagination.get('page') or 1
+
+                query_key = (sort_by, descending, filter_text, rows_per_page)
+                if query_key != current_query['key']:
+                    page_keys.clear()
+                    current_query['key'] = query_key
+                    if filter_text:
+                        current_query['search_ids'] = await service.search_async(filter_text)
+                        current_query['total'] = len(current_query['search_ids'])
+                    else:
+                        current_query['total'] = await service.count_async()
+
+                if filter_text:
+                    start = (page - 1) * rows_per_page
+                    passwords = await service.get_by_ids_async(
+                        current_query['search_ids'][start:start + rows_per_page])
+                else:
+                    passwords = await service.get_page_async(
+                        sort_by, descending,
+                        after=page_keys.get(page - 1),
+                        offset=(page - 1) * rows_per_page,
+                        limit=rows_per_page,
+                    )
+                if passwords and not filter_text:
+                    last = passwords[-1]
+                    page_keys[page] = (last[sort_fields[sort_by]], last[0])
 
-            def on_delete(e):
-                success = service.delete(e.args['id'])
+                table.rows = [_to_row(pwd) for pwd in passwords]
+                table.pagination = {
+                    'sortBy': sort_by,
+                    'descending': descending,
+                    'page': page,
+                    'rowsPerPage': rows_per_page,
+                    'rowsNumber': current_query['total'],
+                }
+                table.update()
+
+            async def reload_page():
+                current_query['key'] = None
+                await load_page(table.pagination)
+
+            # Single-row changes below patch the rows in the browser instead of re-sending the
+            # page. The page keys and totals are recounted on the next page load.
+            def change_total(delta):
+                current_query['key'] = None
+                current_query['total'] += delta
+                set_pagination(table, rowsNumber=current_query['total'])
+
+            def on_saved(saved_id, username, platform):
+                change_total(1)
+                shown = table.pagination
+                if (shown.get('page') != 1 or shown.get('sortBy') != 'date' or not shown.get('descending')
+                        or (search_input.value or '').strip()):
+                    return
+                # Newest first on the first page: the entry goes on top
+                insert_rows(table, 0, [_to_row((saved_id, username, platform, '********', datetime.now(timezone.utc)))])
+                rows_per_page = shown.get('rowsPerPage') or PAGE_SIZE
+                if len(table.rows) > rows_per_page:
+                    remove_rows(table, [row['id'] for row in table.rows[rows_per_page:]])
+
+            async def fill_page():
+                # After a delete the row from the next page moves up into this one
+                shown = table.pagination
+                rows_per_page = shown.get('rowsPerPage') or PAGE_SIZE
+                position = ((shown.get('page') or 1) - 1) * rows_per_page + len(table.rows)
+                if len(table.rows) >= rows_per_page or position >= current_query['total']:
+                    return
+                if (search_input.value or '').strip():
+                    passwords = await service.get_by_ids_async(current_query['search_ids'][position:position + 1])
+                else:
+                    sort_by = shown.get('sortBy') if shown.get('sortBy') in SORT_COLUMNS else 'date'
+                    passwords = await service.get_page_async(sort_by, bool(shown.get('descending')),
+                                                             offset=position, limit=1)
+                insert_rows(table, len(table.rows), [_to_row(pwd) for pwd in passwords])
+
+            async def on_request(e):
+                await load_page(e.args['pagination'])
+
+            async def on_search():
+                await load_page({**table.pagination, 'page': 1})
+
+            table.on('request', on_request)
+            search_input.on_value_change(on_search)
+
+            @profiled('delete')
+            async def on_delete(e):
+                success = await service.delete_async(e.args['id'])
                 if success:
                     ui.notify('Password deleted!', type='positive')
-                    table.rows[:] = [r for r in table.rows if r['id'] != e.args['id']]
-                    table.update()
+                    remove_rows(table, [e.args['id']])
+                    if e.args['id'] in current_query['search_ids']:
+                        current_query['search_ids'].remove(e.args['id'])
+                    change_total(-1)
+                    await fill_page()
 
             table.add_slot('body-cell-actions', '''
     <q-td :props="props" class="actions-cell">
@@ -101,8 +239,10 @@ def render_view_passwords(service):
                 def on_edit_cancel():
                     edit_dialog.close()
 
-                def on_confirm_edit():
-                    success = service.update_password(
+                @profiled('confirm_edit')
+                @redirect_on_expiry
+                async def on_confirm_edit():
+                    success = await service.update_password_async(
                         pending_edit['id'],
                         edit_username.value,
                         edit_platform.value,
@@ -110,12 +250,12 @@ def render_view_passwords(service):
                     )
                     if success:
                         ui.notify('Password updated!', type='positive')
+                        warn_on_save(service, edit_password.value)
+                        current_query['key'] = None
                         for row in table.rows:
                             if row['id'] == pending_edit['id']:
-                                row['username'] = edit_username.value
-                                row['platform'] = edit_platform.value
-                                row['password'] = '********'
-                        table.update()
+                                patch_rows(table, [{**row, 'username': edit_username.value,
+                                                    'platform': edit_platform.value, 'password': '********'}])
                     else:
                         ui.notify('Update failed. Duplicate entry?', type='negative')
 
@@ -125,17 +265,17 @@ def render_view_passwords(service):
                               on_click=on_confirm_edit)
 
 
-            def on_reveal(e):
+            @profiled('reveal')
+            @redirect_on_expiry
+            async def on_reveal(e):
                 for row in table.rows:
                     if row['id'] == e.args['id']:
                         if row['password'] != '********':
-                            row['password'] = '********'
-                            table.update()
+                            patch_rows(table, [{**row, 'password': '********'}])
                             return
-                        pwd = service.get_password(e.args['id'])
+                        pwd = await service.get_password_async(e.args['id'])
                         if pwd:
-                            row['password'] = pwd
-                            table.update()
+                            patch_rows(table, [{**row, 'password': pwd}])
                         return
 
             table.on('reveal', on_reveal)
@@ -156,18 +296,5 @@ def render_view_passwords(service):
 
             table.on('edit', on_edit)
 
-            passwords = service.get_all(show_real=False)
-
-            rows = []
-            for pwd in passwords:
-                rows.append({
-                    'id': pwd[0],
-                    'username': pwd[1],
-                    'platform': pwd[2],
-                    'password': pwd[3],
-                    'date': pwd[4].strftime('%d %b %Y  %H:%M') if pwd[4] else ''
-                })
-
-            table.rows[:] = rows
-            table.update()
+            ui.timer(0, reload_page, once=True)
             table_container.classes(remove='hidden')
@@ -0,0 +1,230 @@
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from itertools import islice
+
+# Compiled corpus layout:
+#   MAGIC | record count (uint64) | fan-out table | records
+# Records are a 20-byte SHA-1 digest followed by how often it was seen (uint32), sorted
+# by digest. The fan-out table holds 65537 record indexes, one per 2-byte digest prefix,
+# so a lookup binary-searches only the records that share the first two bytes.
+MAGIC = b'PGBR0001'
+BLOOM_MAGIC = b'PGBL0001'
+DIGEST_SIZE = 20
+_COUNT = struct.Struct('<I')
+RECORD_SIZE = DIGEST_SIZE + _COUNT.size
+_HEADER = struct.Struct('<Q')
+FANOUT_ENTRIES = 65537
+FANOUT_START = len(MAGIC) + _HEADER.size
+RECORDS_START = FANOUT_START + FANOUT_ENTRIES * 8
+BLOOM_SUFFIX = '.bloom'
+
+# Records sorted in memory at once while compiling; larger sources are merged from runs
+COMPILE_RUN_SIZE = 5_000_000
+BLOOM_BITS_PER_ENTRY = 10
+
+
+def _read_source(source_path: str):
+    # HIBP format, one "SHA1:count" per line; lines without a count count once
+    with open(source_path, encoding='ascii', errors='ignore') as f:
+        for line in f:
+            digest, _, count = line.strip().partition(':')
+            if len(digest) != DIGEST_SIZE * 2:
+                continue
+            try:
+                yield bytes.fromhex(digest) + _COUNT.pack(min(int(count or 1), 0xFFFFFFFF))
+            except ValueError:
+                continue
+
+
+def _write_runs(records, directory: str, run_size: int) -> tuple[list[str], int]:
+    paths = []
+    total = 0
+    while run := list(islice(records, run_size)):
+        run.sort()
+        path = os.path.join(directory, f'run{len(paths)}')
+        with open(path, 'wb') as f:
+            f.write(b''.join(run))
+        paths.append(path)
+        total += len(run)
+    return paths, total
+
+
+def _read_run(path: str):
+    with open(path, 'rb') as f:
+        while record := f.read(RECORD_SIZE):
+            yield record
+
+
+def _merged(paths: list[str]):
+    # Sorted records with duplicate digests folded into one, counts added up
+    current = None
+    for record in heapq.merge(*(_read_run(path) for path in paths)):
+        if current is not None and record[:DIGEST_SIZE] == current[:DIGEST_SIZE]:
+            count = _COUNT.unpack_from(current, DIGEST_SIZE)[0] + _COUNT.unpack_from(record, DIGEST_SIZE)[0]
+            current = current[:DIGEST_SIZE] + _COUNT.pack(min(count, 0xFFFFFFFF))
+            continue
+        if current is not None:
+            yield current
+        current = record
+    if current is not None:
+        yield current
+
+
+def compile_corpus(source_path: str, target_path: str, bloom_bits_per_entry: int = 0,
+                   run_size: int = COMPILE_RUN_SIZE) -> int:
+    # Sorts the source in runs of run_size records and merges them, so memory use does
+    # not grow with the corpus. With bloom_bits_per_entry > 0 a Bloom filter is written
+    # to target_path + '.bloom' as well; without one, a filter left from an earlier
+    # compile is removed.
+    os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+    tmp_path = f'{target_path}.tmp'
+    fanout = [0] * FANOUT_ENTRIES
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(target_path))) as directory:
+        paths, upper_bound = _write_runs(_read_source(source_path), directory, run_size)
+        bloom = _BloomBuilder(upper_bound, bloom_bits_per_entry) if bloom_bits_per_entry else None
+        count = 0
+        with open(tmp_path, 'wb') as target:
+            target.write(MAGIC)
+            target.write(b'\0' * (_HEADER.size + FANOUT_ENTRIES * 8))
+            for record in _merged(paths):
+                target.write(record)
+                fanout[int.from_bytes(record[:2], 'big') + 1] += 1
+                if bloom:
+                    bloom.add(record[:DIGEST_SIZE])
+                count += 1
+            for i in range(1, FANOUT_ENTRIES):
+                fanout[i] += fanout[i - 1]
+            target.seek(len(MAGIC))
+            target.write(_HEADER.pack(count))
+            target.write(struct.pack(f'<{FANOUT_ENTRIES}Q', *fanout))
+    if count == 0:
+        os.remove(tmp_path)
+        raise ValueError(f'No SHA-1 hashes found in {source_path}')
+    bloom_path = target_path + BLOOM_SUFFIX
+    if bloom:
+        bloom.write(f'{bloom_path}.tmp')
+    # The old filter goes first. Until the new one is in place lookups go to the corpus,
+    # which is only slower; a filter built from another corpus would miss new entries.
+    if os.path.exists(bloom_path):
+        os.remove(bloom_path)
+    os.replace(tmp_path, target_path)
+    if bloom:
+        os.replace(f'{bloom_path}.tmp', bloom_path)
+    return count
+
+
+def _bloom_positions(digest: bytes, bits: int, hashes: int):
+    # The digest is already uniformly random, so two slices of it give the double
+    # hashing h1 + i * h2 without hashing again
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:16], 'little') | 1
+    return ((h1 + i * h2) % bits for i in range(hashes))
+
+
+class _BloomBuilder:
+
+    def __init__(self, entries: int, bits_per_entry: int):
+        self.bits = max(entries * bits_per_entry, 64)
+        self.hashes = max(1, round(bits_per_entry * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def add(self, digest: bytes):
+        for position in _bloom_positions(digest, self.bits, self.hashes):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def write(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(BLOOM_MAGIC)
+            f.write(struct.pack('<QI', self.bits, self.hashes))
+            f.write(self.array)
+
+
+class BloomFilter:
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(BLOOM_MAGIC)] != BLOOM_MAGIC:
+            raise ValueError(f'{path} is not a compiled Bloom filter')
+        self.bits, self.hashes = struct.unpack_from('<QI', self._map, len(BLOOM_MAGIC))
+        self._start = len(BLOOM_MAGIC) + struct.calcsize('<QI')
+
+    def __contains__(self, digest: bytes) -> bool:
+        for position in _bloom_positions(digest, self.bits, self.hashes):
+            if not self._map[self._start + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class BreachCorpus:
+
+    def __init__(self, path: str, bloom_path: str | None = None):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a compiled breach corpus')
+        (self._count,) = _HEADER.unpack_from(self._map, len(MAGIC))
+        # Definite misses are answered from the filter without touching the corpus pages
+        self._bloom = BloomFilter(bloom_path) if bloom_path and os.path.exists(bloom_path) else None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def lookup(self, digest: bytes) -> int:
+        # Times the digest was seen in breaches, 0 when it is not in the corpus
+        if self._bloom is not None and digest not in self._bloom:
+            return 0
+        prefix = int.from_bytes(digest[:2], 'big')
+        low, high = struct.unpack_from('<2Q', self._map, FANOUT_START + prefix * 8)
+        while low < high:
+            middle = (low + high) // 2
+            start = RECORDS_START + middle * RECORD_SIZE
+            probe = self._map[start:start + DIGEST_SIZE]
+            if probe < digest:
+                low = middle + 1
+            elif probe > digest:
+                high = middle
+            else:
+                return _COUNT.unpack_from(self._map, start + DIGEST_SIZE)[0]
+        return 0
+
+    def check(self, password: str) -> int:
+        return self.lookup(hashlib.sha1(password.encode()).digest())
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def _default_path() -> str:
+    # BREACH_CORPUS_PATH. Imported here so the module also runs as a script from app/utils.
+    import bootstrap
+    return bootstrap.settings().breach_corpus_path
+
+
+def load_corpus(path: str | None = None) -> BreachCorpus:
+    path = path or _default_path()
+    with _loaded_lock:
+        if path not in _loaded:
+            _loaded[path] = BreachCorpus(path, path + BLOOM_SUFFIX)
+        return _loaded[path]
+
+
+def corpus_available(path: str | None = None) -> bool:
+    return os.path.exists(path or _default_path())
+
+
+if __name__ == '__main__':
+    # python utils/breach.py pwned-passwords-sha1.txt [target] [bloom bits per entry]
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    source = sys.argv[1]
+    target = sys.argv[2] if len(sys.argv) > 2 else _default_path()
+    bits_per_entry = int(sys.argv[3]) if len(sys.argv) > 3 else BLOOM_BITS_PER_ENTRY
+    print(f'{compile_corpus(source, target, bits_per_entry)} hashes written to {target}')
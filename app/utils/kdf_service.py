@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import bootstrap
+
+
+class KdfBusyError(Exception):
+    pass
+
+
+def _timed_call(func, *args):
+    started = time.time()
+    return started, func(*args)
+
+
+class KdfService:
+    # Runs key derivations in a process pool so they do not compete for the GIL of the
+    # web process. At most `workers` run at once and `max_queue` more may wait; anything
+    # beyond that is rejected straight away instead of piling up behind a login storm.
+    # Callers that queue elsewhere first, such as the async layer's threads, take a slot
+    # with admit() before they queue. With workers=0 derivations run inline in the calling
+    # thread.
+
+    def __init__(self, workers: int | None = None, max_queue: int | None = None):
+        # Defaults are KDF_WORKERS and KDF_MAX_QUEUE
+        settings = bootstrap.settings()
+        self._workers = settings.kdf_workers if workers is None else workers
+        self._max_queue = settings.kdf_max_queue if max_queue is None else max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._admitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def capacity(self) -> int:
+        return max(self._workers, 1) + self._max_queue
+
+    @contextmanager
+    def admit(self):
+        # Holds one of the capacity() slots for the block, or raises KdfBusyError when
+        # they are all taken
+        with self._lock:
+            if self._admitted >= self.capacity():
+                self._rejected += 1
+                raise KdfBusyError('Too many key derivations queued, try again shortly')
+            self._admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._admitted -= 1
+
+    def run(self, func, *args):
+        with self._lock:
+            if self._in_flight >= self.capacity():
+                self._rejected += 1
+                raise KdfBusyError('Too many key derivations queued, try again shortly')
+            self._in_flight += 1
+            if self._workers and self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        submitted = time.time()
+        started = submitted
+        try:
+            if self._workers:
+                started, result = self._executor.submit(_timed_call, func, *args).result()
+            else:
+                result = func(*args)
+            return result
+        finally:
+            wait = max(0.0, started - submitted)
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self._workers,
+                'in_flight': self._in_flight,
+                'admitted': self._admitted,
+                'queue_depth': max(0, self._in_flight - max(self._workers, 1)),
+                'max_queue': self._max_queue,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_wait_ms': self._total_wait / self._completed * 1000 if self._completed else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_kdf_service() -> KdfService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = KdfService()
+        return _service
@@ -0,0 +1,103 @@
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bootstrap
+from utils.password_utils import KdfParams, derive_master_key
+
+
+MAX_DECRYPT_WORKERS = min(8, os.cpu_count() or 1)
+# Below this many rows the thread pool costs more than it saves
+PARALLEL_DECRYPT_THRESHOLD = 64
+MAC_INFO = b'password-generator fingerprint'
+
+
+class KeyRingExpiredError(Exception):
+    pass
+
+
+class KeyRing:
+
+    def __init__(self, key: bytes, ttl: float | None = None):
+        from cryptography.fernet import Fernet
+        self._key = bytearray(key)
+        self._fernet = Fernet(bytes(self._key))
+        self._mac_key = None
+        # KEY_RING_TTL unless given
+        self._ttl = bootstrap.settings().key_ring_ttl if ttl is None else ttl
+        self._last_used = time.monotonic()
+
+    @classmethod
+    def from_master(cls, master_password: str, params: KdfParams | None = None, ttl: float | None = None) -> 'KeyRing':
+        return cls(derive_master_key(master_password, params or KdfParams.legacy()), ttl)
+
+    @classmethod
+    def generate(cls, ttl: float | None = None) -> 'KeyRing':
+        from cryptography.fernet import Fernet
+        return cls(Fernet.generate_key(), ttl)
+
+    def is_active(self) -> bool:
+        if self._fernet is None:
+            return False
+        if self._ttl and time.monotonic() - self._last_used > self._ttl:
+            self.wipe()
+            return False
+        return True
+
+    def touch(self):
+        # Counts as use for the idle TTL without touching the key; an expired ring stays expired
+        if self.is_active():
+            self._last_used = time.monotonic()
+
+    def _get_fernet(self):
+        if not self.is_active():
+            raise KeyRingExpiredError('Key ring expired, please log in again')
+        self._last_used = time.monotonic()
+        return self._fernet
+
+    def encrypt(self, password: str) -> str:
+        return self._get_fernet().encrypt(password.encode()).decode()
+
+    def decrypt(self, encrypted_password: str) -> str:
+        return self._get_fernet().decrypt(encrypted_password.encode()).decode()
+
+    def decrypt_many(self, encrypted_passwords: list[str], max_workers: int = MAX_DECRYPT_WORKERS) -> list[str | None]:
+        # Results keep the input order; rows that fail to decrypt come back as None
+        fernet = self._get_fernet()
+
+        def decrypt_one(encrypted_password: str) -> str | None:
+            try:
+                return fernet.decrypt(encrypted_password.encode()).decode()
+            except Exception:
+                return None
+
+        if max_workers <= 1 or len(encrypted_passwords) < PARALLEL_DECRYPT_THRESHOLD:
+            return [decrypt_one(p) for p in encrypted_passwords]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(decrypt_one, encrypted_passwords))
+
+    def mac(self, message: str) -> str:
+        # Keyed fingerprint for equality lookups. The MAC key is derived from the encryption
+        # key with HKDF, so the same key ring always gives the same fingerprint.
+        self._get_fernet()
+        if self._mac_key is None:
+            from cryptography.hazmat.primitives import hashes
+            from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+            hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=MAC_INFO)
+            self._mac_key = bytearray(hkdf.derive(bytes(self._key)))
+        return hmac.new(bytes(self._mac_key), message.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def wrap(self, keys: 'KeyRing') -> str:
+        keys._get_fernet()
+        return self.encrypt(bytes(keys._key).decode())
+
+    def unwrap(self, wrapped_key: str, ttl: float | None = None) -> 'KeyRing':
+        return KeyRing(self.decrypt(wrapped_key).encode(), ttl)
+
+    def wipe(self):
+        for secret in (self._key, self._mac_key or bytearray()):
+            for i in range(len(secret)):
+                secret[i] = 0
+        self._mac_key = None
+        self._fernet = None
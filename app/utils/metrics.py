@@ -0,0 +1,142 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+import bootstrap
+from utils.kdf_service import get_kdf_service
+
+# Upper bounds in seconds, from a cached page query up to a slow login
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# metric -> (Prometheus name, label name, help text)
+FAMILIES = {
+    'kdf': ('pg_kdf_seconds', 'algorithm', 'Master key derivation latency, queueing included'),
+    'db': ('pg_db_seconds', 'operation', 'Datastore call latency'),
+    'page': ('pg_page_render_seconds', 'page', 'Page build latency'),
+}
+
+# Off unless METRICS_ENABLED is set: timed calls then cost one flag check and /metrics is 404.
+# None until the setting is first read.
+_enabled = None
+
+
+def enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = bootstrap.settings().metrics_enabled
+    return _enabled
+
+
+def set_enabled(flag: bool):
+    global _enabled
+    _enabled = flag
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, failed: bool = False):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.errors += failed
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, label: str, seconds: float, failed: bool = False):
+        with self._lock:
+            histogram = self._histograms.get((metric, label))
+            if histogram is None:
+                histogram = self._histograms[(metric, label)] = Histogram()
+            histogram.observe(seconds, failed)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self) -> str:
+        # Prometheus text exposition format, one histogram and one error counter per family
+        lines = []
+        with self._lock:
+            for metric, (name, label_name, help_text) in FAMILIES.items():
+                series = sorted((label, h) for (m, label), h in self._histograms.items() if m == metric)
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for label, histogram in series:
+                    labels = f'{label_name}="{label}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+                errors = name.removesuffix('_seconds') + '_errors_total'
+                lines += [f'# HELP {errors} Calls that raised', f'# TYPE {errors} counter']
+                lines += [f'{errors}{{{label_name}="{label}"}} {h.errors}' for label, h in series]
+        lines += _kdf_service_lines()
+        return '\n'.join(lines) + '\n'
+
+
+def _kdf_service_lines() -> list[str]:
+    stats = get_kdf_service().stats()
+    return [
+        '# TYPE pg_kdf_in_flight gauge', f'pg_kdf_in_flight {stats["in_flight"]}',
+        '# TYPE pg_kdf_queue_depth gauge', f'pg_kdf_queue_depth {stats["queue_depth"]}',
+        '# TYPE pg_kdf_rejected_total counter', f'pg_kdf_rejected_total {stats["rejected"]}',
+    ]
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+class _Timer:
+    # Context manager for a block, or decorator for a whole function. Calls are only timed
+    # while metrics are enabled.
+
+    def __init__(self, metric: str, label: str):
+        self._metric = metric
+        self._label = label
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter() if enabled() else None
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self._started is not None:
+            _registry.observe(self._metric, self._label, time.perf_counter() - self._started, exc_type is not None)
+
+    def __call__(self, func):
+        metric, label = self._metric, self._label
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _registry.observe(metric, label, time.perf_counter() - started, failed)
+
+        return wrapper
+
+
+def timed(metric: str, label: str) -> _Timer:
+    return _Timer(metric, label)
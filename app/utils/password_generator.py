@@ -0,0 +1,85 @@
+import functools
+import os
+import string
+from utils.password_strategies import UppercaseStrategy, LowercaseStrategy, NumberStrategy, SymbolStrategy
+
+# Random bytes pulled from the OS per round
+ENTROPY_BLOCK_SIZE = 64 * 1024
+
+
+@functools.cache
+def _numpy():
+    # NumPy is optional and imported only for use_numpy; loading it adds about 100 ms to start-up
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def build_alphabet(use_upper: bool = True, use_lower: bool = True, use_numbers: bool = True, use_symbols: bool = True) -> str:
+    strategies = []
+    if use_upper: strategies.append(UppercaseStrategy())
+    if use_lower: strategies.append(LowercaseStrategy())
+    if use_numbers: strategies.append(NumberStrategy())
+    if use_symbols: strategies.append(SymbolStrategy())
+    all_chars = ''.join(s.get_chars() for s in strategies)
+    if not all_chars:
+        all_chars = string.ascii_letters + string.digits
+    return all_chars
+
+
+class _ByteMapper:
+    # Maps random bytes onto the alphabet without modulo bias: a byte b is kept only when
+    # b < limit, the largest multiple of the alphabet size that fits in a byte, and then
+    # becomes alphabet[b % size]. Rejected bytes are dropped and more entropy is drawn.
+
+    def __init__(self, alphabet: str):
+        if not alphabet or len(alphabet) > 256 or not alphabet.isascii():
+            raise ValueError('Alphabet must contain 1 to 256 ASCII characters')
+        encoded = alphabet.encode()
+        size = len(encoded)
+        self.limit = 256 - 256 % size
+        # bytes.translate does the mapping and the rejection in a single C-level pass
+        self._table = bytes(encoded[b % size] if b < self.limit else 0 for b in range(256))
+        self._rejected = bytes(range(self.limit, 256))
+        self._lookup = None
+
+    def map(self, block: bytes, use_numpy: bool = False) -> str:
+        # Each block is decoded once; callers slice passwords out of the resulting str
+        if use_numpy:
+            np = _numpy()
+            if self._lookup is None:
+                self._lookup = np.frombuffer(self._table, dtype=np.uint8)
+            # Map every byte with one table lookup, then drop the rejected ones by mask
+            values = np.frombuffer(block, dtype=np.uint8)
+            mapped = np.compress(values < self.limit, self._lookup.take(values))
+            return mapped.tobytes().decode('ascii')
+        return block.translate(self._table, self._rejected).decode('ascii')
+
+
+def generate_stream(n: int, length: int, alphabet: str, use_numpy: bool = False):
+    # Yields n passwords of `length` characters drawn uniformly from `alphabet`
+    if use_numpy and _numpy() is None:
+        raise RuntimeError('NumPy is not installed')
+    if n <= 0 or length <= 0:
+        return
+    mapper = _ByteMapper(alphabet)
+    # Ask for enough bytes to cover the expected rejections, capped at one block per round
+    acceptance = mapper.limit / 256
+    pending = ''
+    remaining = n
+    while remaining:
+        wanted = remaining * length - len(pending)
+        if wanted > 0:
+            block_size = min(ENTROPY_BLOCK_SIZE, int(wanted / acceptance) + 64)
+            pending += mapper.map(os.urandom(block_size), use_numpy)
+        count = min(remaining, len(pending) // length)
+        for i in range(count):
+            yield pending[i * length:(i + 1) * length]
+        pending = pending[count * length:]
+        remaining -= count
+
+
+def generate_batch(n: int, length: int, alphabet: str, use_numpy: bool = False) -> list[str]:
+    return list(generate_stream(n, length, alphabet, use_numpy))
@@ -1,4 +1,8 @@
+import functools
+import math
+import secrets
 import string
+from collections import Counter
 
 class UppercaseStrategy:
     def get_chars(self) -> str:
@@ -14,4 +18,48 @@ class NumberStrategy:
 
 class SymbolStrategy:
     def get_chars(self) -> str:
-        return string.punctuation
\ No newline at end of file
+        return string.punctuation
+
+class PassphraseStrategy:
+    # Diceware-style passphrases: words drawn uniformly with `secrets` from a compiled
+    # wordlist (see utils/wordlist.py)
+
+    CAPITALIZE_OPTIONS = ('lower', 'title', 'random')
+
+    def __init__(self, wordlist, word_count: int = 6, separator: str = '-', capitalize: str = 'lower'):
+        if capitalize not in self.CAPITALIZE_OPTIONS:
+            raise ValueError(f'capitalize must be one of {self.CAPITALIZE_OPTIONS}')
+        self._wordlist = wordlist
+        self._word_count = word_count
+        self._separator = separator
+        self._capitalize = capitalize
+
+    def generate(self) -> str:
+        words = []
+        for _ in range(self._word_count):
+            word = self._wordlist[secrets.randbelow(len(self._wordlist))]
+            if self._capitalize == 'title' or (self._capitalize == 'random' and secrets.randbits(1)):
+                word = word.capitalize()
+            words.append(word)
+        return self._separator.join(words)
+
+    def entropy_bits(self) -> float:
+        return self._word_count * _word_entropy(self._wordlist, self._capitalize)
+
+
+@functools.lru_cache(maxsize=16)
+def _word_entropy(wordlist, capitalize: str) -> float:
+    # Shannon entropy of one passphrase word. Capitalizing changes nothing for digits or
+    # words already capitalized in the list and can turn two list words into one, so the
+    # forms that can come out are counted instead of assuming one extra bit per word.
+    if capitalize == 'lower':
+        # Compiled lists hold each word once, so every word is equally likely
+        return math.log2(len(wordlist))
+    forms = Counter()
+    for i in range(len(wordlist)):
+        word = wordlist[i]
+        if capitalize == 'random':
+            forms[word] += 1
+        forms[word.capitalize()] += 1
+    total = sum(forms.values())
+    return -sum(count / total * math.log2(count / total) for count in forms.values())
@@ -1,63 +1,195 @@
 import os
 import base64
-import re
-import string
-from dotenv import load_dotenv
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import json
+import threading
+import time
+import bootstrap
+from utils.kdf_service import get_kdf_service
+from utils import metrics
 
+try:
+    from argon2.low_level import Type, hash_secret_raw
+except ImportError:
+    hash_secret_raw = None
 
-load_dotenv()
+# cryptography is imported where it is used: key derivation runs in the KDF worker
+# processes, and tools that only need the settings here start without it.
 
-SALT = os.getenv('SALT').encode()
-ALGORITHM = hashes.SHA256()
 KEY_LENGTH = 32
 ITERATIONS = 480000
+KDF_SALT_LENGTH = 16
+# Calibration never goes below these, however slow the host is
+MIN_COST = {
+    'pbkdf2': {'iterations': ITERATIONS},
+    'scrypt': {'n': 2 ** 14, 'r': 8, 'p': 1},
+    'argon2id': {'time_cost': 2, 'memory_cost': 19 * 1024, 'parallelism': 1},
+}
+# scrypt needs 128 * n * r bytes, so n is capped to keep a login at 128 MiB
+MAX_SCRYPT_N = 2 ** 17
 
 
-def derive_key(master_password: str) -> bytes:
+def legacy_salt() -> bytes:
+    # Shared salt of accounts created before per-user KDF parameters; new accounts get their own
+    salt = bootstrap.settings().salt
+    if salt is None:
+        raise RuntimeError('SALT is not set; it is needed for accounts without their own salt')
+    return salt.encode()
+
+
+def derive_key(master_password: str, salt: bytes | None = None, iterations: int = ITERATIONS) -> bytes:
+    salt = legacy_salt() if salt is None else salt
+    with metrics.timed('kdf', 'pbkdf2'):
+        return get_kdf_service().run(_derive_key, master_password, salt, iterations)
+
+
+def _derive_key(master_password: str, salt: bytes, iterations: int) -> bytes:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
     kdf = PBKDF2HMAC(
-        algorithm=ALGORITHM,
+        algorithm=hashes.SHA256(),
         length=KEY_LENGTH,
-        salt=SALT,
-        iterations=ITERATIONS,
+        salt=salt,
+        iterations=iterations,
     )
     key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
     return key
 
 
+class KdfParams:
+    # How one account's master key is derived. A salt of None stands for the shared legacy salt
+    # of accounts that predate per-user parameters.
+
+    def __init__(self, algorithm: str, salt: bytes | None, cost: dict):
+        if algorithm not in MIN_COST:
+            raise ValueError(f'Unknown key derivation algorithm: {algorithm}')
+        self.algorithm = algorithm
+        self.salt = salt
+        self.cost = dict(cost)
+
+    @classmethod
+    def legacy(cls) -> 'KdfParams':
+        return cls('pbkdf2', None, {'iterations': ITERATIONS})
+
+    @classmethod
+    def from_meta(cls, meta) -> 'KdfParams':
+        if meta.kdf_algorithm is None:
+            return cls.legacy()
+        return cls(meta.kdf_algorithm, base64.b64decode(meta.kdf_salt), json.loads(meta.kdf_params))
+
+    def to_columns(self) -> dict:
+        return {
+            'kdf_algorithm': self.algorithm,
+            'kdf_salt': base64.b64encode(self.salt).decode(),
+            'kdf_params': json.dumps(self.cost, sort_keys=True),
+        }
+
+    def work(self) -> int:
+        return _work(self.algorithm, self.cost)
+
+    def needs_upgrade(self) -> bool:
+        # True when the account should be re-keyed with the current policy on login: it has the
+        # legacy salt, another algorithm, or clearly less work than the policy asks for
+        algorithm, cost = kdf_policy()
+        if self.salt is None or self.algorithm != algorithm:
+            return True
+        # Accounts within KDF_UPGRADE_MARGIN below the policy are not re-keyed, so the
+        # calibration noise between restarts does not re-derive them at every login
+        return self.work() < _work(algorithm, cost) * (1 - bootstrap.settings().kdf_upgrade_margin)
+
+
+def _work(algorithm: str, cost: dict) -> int:
+    # Comparable cost within one algorithm; time and memory both count
+    if algorithm == 'pbkdf2':
+        return cost['iterations']
+    if algorithm == 'scrypt':
+        return cost['n'] * cost['r'] * cost['p']
+    return cost['time_cost'] * cost['memory_cost'] * cost['parallelism']
+
+
+def derive_master_key(master_password: str, params: KdfParams) -> bytes:
+    salt = legacy_salt() if params.salt is None else params.salt
+    with metrics.timed('kdf', params.algorithm):
+        return get_kdf_service().run(_derive_master_key, master_password, params.algorithm, salt, params.cost)
+
+
+def _derive_master_key(master_password: str, algorithm: str, salt: bytes, cost: dict) -> bytes:
+    if algorithm == 'pbkdf2':
+        return _derive_key(master_password, salt, cost['iterations'])
+    if algorithm == 'scrypt':
+        from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+        raw = Scrypt(salt=salt, length=KEY_LENGTH, n=cost['n'], r=cost['r'], p=cost['p']).derive(master_password.encode())
+    else:
+        if hash_secret_raw is None:
+            raise RuntimeError('argon2-cffi is required for argon2id key derivation')
+        raw = hash_secret_raw(master_password.encode(), salt, time_cost=cost['time_cost'],
+                              memory_cost=cost['memory_cost'], parallelism=cost['parallelism'],
+                              hash_len=KEY_LENGTH, type=Type.ID)
+    return base64.urlsafe_b64encode(raw)
+
+
+def _time_derivation(algorithm: str, cost: dict) -> float:
+    started = time.perf_counter()
+    _derive_master_key('calibration', algorithm, os.urandom(KDF_SALT_LENGTH), cost)
+    return max(time.perf_counter() - started, 1e-6) * 1000
+
+
+def kdf_algorithm() -> str:
+    # KDF_ALGORITHM, or the strongest one installed
+    return bootstrap.settings().kdf_algorithm or ('argon2id' if hash_secret_raw is not None else 'scrypt')
+
+
+def calibrate(algorithm: str | None = None, target_ms: float | None = None) -> dict:
+    # Cost parameters for which one derivation takes about target_ms on this host. Costs
+    # scale linearly with time, so a single probe at the minimum cost is extrapolated;
+    # scrypt's n must stay a power of two and is doubled while it fits the target.
+    algorithm = algorithm or kdf_algorithm()
+    target_ms = bootstrap.settings().kdf_target_ms if target_ms is None else target_ms
+    cost = dict(MIN_COST[algorithm])
+    elapsed = _time_derivation(algorithm, cost)
+    if algorithm == 'pbkdf2':
+        cost['iterations'] = max(cost['iterations'], int(round(cost['iterations'] * target_ms / elapsed, -3)))
+    elif algorithm == 'scrypt':
+        while elapsed * 2 <= target_ms and cost['n'] < MAX_SCRYPT_N:
+            cost['n'] *= 2
+            elapsed *= 2
+    else:
+        cost['time_cost'] = max(cost['time_cost'], round(cost['time_cost'] * target_ms / elapsed))
+    return cost
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def kdf_policy() -> tuple[str, dict]:
+    # (algorithm, cost) for new and upgraded accounts, calibrated once per process
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            algorithm = kdf_algorithm()
+            _policy = (algorithm, calibrate(algorithm))
+        return _policy
+
+
+def new_kdf_params(current: KdfParams | None = None) -> KdfParams:
+    # A fresh salt and the current policy. An account that already costs more keeps its cost,
+    # so a host that calibrates lower never weakens it.
+    algorithm, cost = kdf_policy()
+    if current is not None and current.algorithm == algorithm and current.work() > _work(algorithm, cost):
+        cost = current.cost
+    return KdfParams(algorithm, os.urandom(KDF_SALT_LENGTH), cost)
+
+
 def encrypt_password(password: str, master_password: str) -> str:
-    key = derive_key(master_password)
-    fernet = Fernet(key)
+    from cryptography.fernet import Fernet
+    fernet = Fernet(derive_key(master_password))
     encrypted = fernet.encrypt(password.encode())
     return encrypted.decode()
 
 
 def decrypt_password(encrypted_password: str, master_password: str) -> str:
-    key = derive_key(master_password)
-    fernet = Fernet(key)
+    from cryptography.fernet import Fernet
+    fernet = Fernet(derive_key(master_password))
     decrypted = fernet.decrypt(encrypted_password.encode())
     return decrypted.decode()
 
-
-def get_password_strength(password: str):
-    has_lower = re.search(r"[a-z]", password)
-    has_upper_cases = re.search(r"[A-Z]", password)
-    has_digits = re.search(r"\d", password)
-    has_special_characters = re.search(
-        f"[{re.escape(string.punctuation)}]",
-        password
-    )
-    length = len(password)
-    if length < 6 or not has_lower or not has_upper_cases or not has_digits:
-        return "weak"
-    if (
-        length >= 12
-        and has_lower
-        and has_upper_cases
-        and has_digits
-        and has_special_characters
-    ):
-        return "strong"
-    return "medium"
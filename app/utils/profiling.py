@@ -0,0 +1,91 @@
+import asyncio
+import cProfile
+import functools
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+import bootstrap
+
+# Opt-in: PROFILE_ENABLED at start-up, or POST /admin/profiling while running. None until
+# the setting is first read.
+_enabled = None
+# cProfile hooks the whole thread, so only one call is profiled at a time; the others run
+# as usual. While an async handler awaits, whatever else the event loop runs is recorded
+# in its profile too.
+_active = threading.Lock()
+
+
+def enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = bootstrap.settings().profile_enabled
+    return _enabled
+
+
+def set_enabled(flag: bool):
+    global _enabled
+    _enabled = flag
+
+
+def _keep(profiler: cProfile.Profile, operation: str, seconds: float):
+    # Calls faster than PROFILE_THRESHOLD_MS are profiled but not written out
+    settings = bootstrap.settings()
+    elapsed_ms = seconds * 1000
+    if elapsed_ms < settings.profile_threshold_ms:
+        return
+    directory = settings.profile_dir
+    os.makedirs(directory, exist_ok=True)
+    # pstats format, for `python -m pstats` or snakeviz
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    profiler.dump_stats(os.path.join(directory, f'{stamp}-{operation}-{elapsed_ms:.0f}ms.prof'))
+    _rotate(directory, settings.profile_keep)
+
+
+def _rotate(directory: str, keep: int):
+    # Oldest profiles are deleted once the directory holds more than PROFILE_KEEP
+    profiles = sorted(glob.glob(os.path.join(directory, '*.prof')), key=os.path.getmtime)
+    for path in profiles[:max(0, len(profiles) - keep)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def profiled(operation: str):
+    # Decorator for page builders and event handlers, sync or async. Does nothing beyond
+    # a flag check while profiling is off.
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not enabled() or not _active.acquire(blocking=False):
+                    return await func(*args, **kwargs)
+                profiler = cProfile.Profile()
+                started = time.perf_counter()
+                profiler.enable()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    profiler.disable()
+                    _active.release()
+                    _keep(profiler, operation, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled() or not _active.acquire(blocking=False):
+                return func(*args, **kwargs)
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                _active.release()
+                _keep(profiler, operation, time.perf_counter() - started)
+        return wrapper
+
+    return decorate
@@ -0,0 +1,607 @@
+import marshal
+import math
+import os
+import re
+import threading
+from datetime import date
+from itertools import product
+
+# Guess-based estimator after zxcvbn (Wheeler, USENIX Security 2016). The password is
+# covered by the cheapest sequence of known patterns (dictionary words, l33t, keyboard
+# walks, repeats, sequences, dates) and whatever is left is brute-forced; the score
+# comes from the number of guesses an attacker needs for that sequence.
+
+DICTIONARY_DIR = os.path.join(os.path.dirname(__file__), '..', 'wordlists')
+# Ranked lists, most common first: a word's rank is the number of guesses to find it
+DICTIONARIES = ('common_passwords', 'english', 'names')
+# Compiled lookup table, built next to the sources on first use and rebuilt when a source
+# is newer. It maps every word, and every proper prefix of one, to the word's rank in each
+# list packed RANK_BITS per list in DICTIONARIES order: 0 is "not in this list", and a
+# prefix that is no word maps to 0. Matching follows a token while it is in the table.
+TABLES_PATH = os.path.join(DICTIONARY_DIR, 'strength.tables')
+TABLES_VERSION = 1
+RANK_BITS = 16
+_RANK_MASK = (1 << RANK_BITS) - 1
+
+# Keyboard rows with their horizontal offset in key widths. Two keys are adjacent when
+# they are on the same or a neighbouring row and at most one key width apart.
+KEYBOARDS = {
+    'qwerty': [(0, '`1234567890-='), (1.5, 'qwertyuiop[]\\'), (1.75, "asdfghjkl;'"), (2.25, 'zxcvbnm,./')],
+    'keypad': [(1, '/*-'), (0, '789+'), (0, '456'), (0, '123'), (0, '0.')],
+}
+_SHIFTED_KEYS = '~!@#$%^&*()_+{}|:"<>?'
+_SHIFTED = str.maketrans(_SHIFTED_KEYS, "`1234567890-=[]\\;',./")
+
+L33T_TABLE = {
+    'a': '4@', 'b': '8', 'c': '({[<', 'e': '3', 'g': '69', 'i': '1!|',
+    'l': '1|7', 'o': '0', 's': '$5', 't': '+7', 'x': '%', 'z': '2',
+}
+_L33T_LETTERS = {}
+for _letter, _subs in L33T_TABLE.items():
+    for _sub in _subs:
+        _L33T_LETTERS.setdefault(_sub, []).append(_letter)
+MAX_L33T_VARIANTS = 16
+
+REFERENCE_YEAR = date.today().year
+MIN_YEAR_SPACE = 20
+BRUTEFORCE_CARDINALITY = 10
+MIN_GUESSES_BEFORE_GROWING_SEQUENCE = 10000
+MIN_SUBMATCH_GUESSES_SINGLE_CHAR = 10
+MIN_SUBMATCH_GUESSES_MULTI_CHAR = 50
+# Longer passwords are analysed in chunks of this many characters, keeping the
+# quadratic matching cheap; the chunks' guesses multiply
+MAX_ANALYSED_LENGTH = 64
+
+# Score n means fewer than SCORE_THRESHOLDS[n] guesses
+SCORE_THRESHOLDS = (1e3 + 5, 1e6 + 5, 1e8 + 5, 1e10 + 5)
+LABELS = ('very weak', 'weak', 'fair', 'strong', 'very strong')
+
+
+def _compile() -> dict:
+    lookup = {}
+    for index, name in enumerate(DICTIONARIES):
+        with open(os.path.join(DICTIONARY_DIR, f'{name}.txt'), encoding='utf-8') as f:
+            words = f.read().split()
+        if len(words) > _RANK_MASK:
+            raise ValueError(f'{name} has more than {_RANK_MASK} words')
+        for rank, word in enumerate(words, start=1):
+            for k in range(1, len(word)):
+                lookup.setdefault(word[:k], 0)
+            lookup[word] = lookup.get(word, 0) | rank << (RANK_BITS * index)
+    return {
+        'version': TABLES_VERSION,
+        'dictionaries': DICTIONARIES,
+        'max_word_length': max(map(len, lookup)),
+        'lookup': lookup,
+    }
+
+
+def compile_tables(target_path: str = TABLES_PATH) -> dict:
+    compiled = _compile()
+    tmp_path = f'{target_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(marshal.dumps(compiled))
+    os.replace(tmp_path, target_path)
+    return compiled
+
+
+def _load_compiled(path: str = TABLES_PATH) -> dict:
+    sources = [os.path.join(DICTIONARY_DIR, f'{name}.txt') for name in DICTIONARIES]
+    if os.path.exists(path) and all(os.path.getmtime(path) >= os.path.getmtime(source) for source in sources):
+        try:
+            with open(path, 'rb') as f:
+                # One read: marshal.load() on the file reads it a few bytes at a time
+                compiled = marshal.loads(f.read())
+            if compiled.get('version') == TABLES_VERSION and compiled.get('dictionaries') == DICTIONARIES:
+                return compiled
+        except (EOFError, ValueError, TypeError, AttributeError):
+            pass
+    try:
+        return compile_tables(path)
+    except OSError:
+        # Read-only install: build the table in memory on every start instead
+        return _compile()
+
+
+def _ranks(packed: int):
+    # (dictionary, rank) for every list a word is in
+    for index, name in enumerate(DICTIONARIES):
+        rank = packed >> (RANK_BITS * index) & _RANK_MASK
+        if rank:
+            yield name, rank
+
+
+class _Tables:
+
+    def __init__(self):
+        compiled = _load_compiled()
+        self.lookup = compiled['lookup']
+        self.max_word_length = compiled['max_word_length']
+        self.graphs = {name: _adjacency_graph(rows) for name, rows in KEYBOARDS.items()}
+
+    def ranked_lists(self) -> dict:
+        # {dictionary: words, most common first}, rebuilt from the lookup table
+        ranked = {name: {} for name in DICTIONARIES}
+        for word, packed in self.lookup.items():
+            for name, rank in _ranks(packed):
+                ranked[name][rank] = word
+        return {name: [words[rank] for rank in sorted(words)] for name, words in ranked.items()}
+
+
+def _adjacency_graph(rows):
+    # {key: {neighbour: direction}} plus the key count and average degree used for guesses
+    positions = {key: (y, offset + x) for y, (offset, row) in enumerate(rows) for x, key in enumerate(row)}
+    graph = {}
+    for key, (y, x) in positions.items():
+        graph[key] = {other: (oy - y, ox - x) for other, (oy, ox) in positions.items()
+                      if other != key and abs(oy - y) <= 1 and abs(ox - x) <= 1}
+    average_degree = sum(len(neighbours) for neighbours in graph.values()) / len(graph)
+    return graph, len(graph), average_degree
+
+
+_tables = None
+_tables_lock = threading.Lock()
+
+
+def _get_tables() -> _Tables:
+    # Loaded once and shared by every check in the process; preload() does it at start-up
+    global _tables
+    if _tables is None:
+        with _tables_lock:
+            if _tables is None:
+                _tables = _Tables()
+    return _tables
+
+
+def preload():
+    # So that the first check after start-up does not wait for the tables to load
+    _get_tables()
+
+
+class Match:
+
+    def __init__(self, pattern: str, i: int, j: int, token: str, guesses: float, **details):
+        self.pattern = pattern
+        self.i = i
+        self.j = j
+        self.token = token
+        self.guesses = guesses
+        self.details = details
+
+    def __repr__(self):
+        return f'Match({self.pattern!r}, {self.token!r}, guesses={self.guesses:g})'
+
+
+class StrengthReport:
+
+    def __init__(self, password: str, guesses: float, sequence: list[Match]):
+        self.guesses = guesses
+        self.sequence = sequence
+        self.score = sum(guesses >= threshold for threshold in SCORE_THRESHOLDS)
+        self.warning, self.suggestions = _feedback(password, self.score, sequence)
+
+    @property
+    def label(self) -> str:
+        return LABELS[self.score]
+
+    @property
+    def entropy_bits(self) -> float:
+        return math.log2(self.guesses) if self.guesses > 1 else 0.0
+
+    def __repr__(self):
+        return f'StrengthReport(score={self.score}, guesses={self.guesses:g}, warning={self.warning!r})'
+
+
+def export_tables() -> dict:
+    # Everything the browser meter (static/strength.js) needs to apply the same rules
+    tables = _get_tables()
+    return {
+        'dictionaries': tables.ranked_lists(),
+        'keyboards': KEYBOARDS,
+        'shiftedKeys': _SHIFTED_KEYS,
+        'unshiftedKeys': ''.join(chr(_SHIFTED[ord(key)]) for key in _SHIFTED_KEYS),
+        'l33t': L33T_TABLE,
+        'maxL33tVariants': MAX_L33T_VARIANTS,
+        'referenceYear': REFERENCE_YEAR,
+        'minYearSpace': MIN_YEAR_SPACE,
+        'bruteforceCardinality': BRUTEFORCE_CARDINALITY,
+        'minGuessesBeforeGrowingSequence': MIN_GUESSES_BEFORE_GROWING_SEQUENCE,
+        'minSubmatchGuessesSingleChar': MIN_SUBMATCH_GUESSES_SINGLE_CHAR,
+        'minSubmatchGuessesMultiChar': MIN_SUBMATCH_GUESSES_MULTI_CHAR,
+        'maxAnalysedLength': MAX_ANALYSED_LENGTH,
+        'scoreThresholds': SCORE_THRESHOLDS,
+        'labels': LABELS,
+    }
+
+
+def estimate_strength(password: str) -> StrengthReport:
+    guesses = 1
+    sequence = []
+    for start in range(0, max(len(password), 1), MAX_ANALYSED_LENGTH):
+        chunk = password[start:start + MAX_ANALYSED_LENGTH]
+        chunk_guesses, chunk_sequence = _most_guessable(chunk, _omnimatch(chunk))
+        guesses *= chunk_guesses
+        sequence.extend(chunk_sequence)
+    return StrengthReport(password, guesses, sequence)
+
+
+# ---- matching ---------------------------------------------------------------
+
+def _omnimatch(password: str) -> list[Match]:
+    tables = _get_tables()
+    return (_dictionary_matches(password, tables) + _reverse_matches(password, tables)
+            + _l33t_matches(password, tables) + _spatial_matches(password, tables)
+            + _repeat_matches(password) + _sequence_matches(password) + _date_matches(password))
+
+
+def _dictionary_matches(password: str, tables: _Tables, lower: str | None = None, starts=None) -> list[Match]:
+    lower = lower or password.lower()
+    matches = []
+    n = len(password)
+    lookup = tables.lookup
+    for i in (range(n) if starts is None else starts):
+        if lower[i] not in lookup:
+            continue
+        for j in range(i + 1, min(n, i + tables.max_word_length)):
+            word = lower[i:j + 1]
+            packed = lookup.get(word)
+            if packed is None:
+                break
+            if not packed:
+                continue
+            token = password[i:j + 1]
+            for name, rank in _ranks(packed):
+                matches.append(Match('dictionary', i, j, token, rank * _uppercase_variations(token),
+                                     dictionary=name, word=word, rank=rank))
+    return matches
+
+
+def _reverse_matches(password: str, tables: _Tables) -> list[Match]:
+    n = len(password)
+    matches = []
+    for match in _dictionary_matches(password[::-1], tables):
+        if len(match.token) > 2 and match.token != match.token[::-1]:
+            matches.append(Match('dictionary', n - 1 - match.j, n - 1 - match.i, match.token[::-1],
+                                 match.guesses * 2, reversed=True, **match.details))
+    return matches
+
+
+def _l33t_matches(password: str, tables: _Tables) -> list[Match]:
+    present = sorted({c for c in password if c in _L33T_LETTERS})
+    if not present:
+        return []
+    lower = password.lower()
+    matches = []
+    seen = set()
+    options = [[(c, letter) for letter in _L33T_LETTERS[c]] for c in present]
+    # Only tokens with a substituted character count, so words can only start this close
+    # before one
+    starts = sorted({i for p, c in enumerate(password) if c in _L33T_LETTERS
+                     for i in range(max(p - tables.max_word_length + 1, 0), p + 1)})
+    for substitution in list(product(*options))[:MAX_L33T_VARIANTS]:
+        subbed = lower.translate(str.maketrans(dict(substitution)))
+        for match in _dictionary_matches(password, tables, subbed, starts):
+            token = match.token
+            used = {c: letter for c, letter in substitution if c in token}
+            # Single l33t characters such as '1' or '0' are better handled elsewhere
+            if not used or len(token) == 1 or (match.i, match.j, match.details['word']) in seen:
+                continue
+            seen.add((match.i, match.j, match.details['word']))
+            matches.append(Match('dictionary', match.i, match.j, token,
+                                 match.guesses * _l33t_variations(token, used), l33t=used, **match.details))
+    return matches
+
+
+def _spatial_matches(password: str, tables: _Tables) -> list[Match]:
+    matches = []
+    unshifted = password.lower().translate(_SHIFTED)
+    for name, (graph, keys, degree) in tables.graphs.items():
+        i = 0
+        while i < len(password) - 2:
+            j = i
+            turns = 0
+            direction = None
+            while j + 1 < len(password) and unshifted[j + 1] in graph.get(unshifted[j], ()):
+                step = graph[unshifted[j]][unshifted[j + 1]]
+                if step != direction:
+                    turns += 1
+                    direction = step
+                j += 1
+            if j - i >= 2:
+                token = password[i:j + 1]
+                shifted = sum(1 for c in token if c.isupper() or c in _SHIFTED_KEYS)
+                guesses = _spatial_guesses(len(token), turns, keys, degree, shifted)
+                matches.append(Match('spatial', i, j, token, guesses, graph=name, turns=turns))
+                i = j
+            else:
+                i += 1
+    return matches
+
+
+def _repeat_matches(password: str) -> list[Match]:
+    matches = []
+    for found in re.finditer(r'(.+?)\1+', password):
+        base = found.group(1)
+        base_guesses, _ = _most_guessable(base, _omnimatch(base))
+        count = len(found.group(0)) // len(base)
+        matches.append(Match('repeat', found.start(), found.end() - 1, found.group(0),
+                             base_guesses * count, base=base, count=count))
+    return matches
+
+
+def _sequence_matches(password: str) -> list[Match]:
+    matches = []
+    n = len(password)
+    i = 0
+    while i < n - 2:
+        delta = ord(password[i + 1]) - ord(password[i])
+        j = i + 1
+        while j + 1 < n and ord(password[j + 1]) - ord(password[j]) == delta:
+            j += 1
+        if j - i >= 2 and 0 < abs(delta) <= 5:
+            token = password[i:j + 1]
+            if token[0] in 'aAzZ019':
+                base = 4
+            elif token[0].isdigit():
+                base = 10
+            else:
+                base = 26
+            matches.append(Match('sequence', i, j, token, base * len(token) * (1 if delta > 0 else 2),
+                                 ascending=delta > 0))
+        # Any later start inside the run has the same step and ends at j too
+        i = j
+    return matches
+
+
+_DATE_WITH_SEPARATOR = re.compile(r'(\d{1,4})([\s/\\_.-])(\d{1,2})\2(\d{1,4})')
+
+
+def _date_matches(password: str) -> list[Match]:
+    matches = []
+    n = len(password)
+    for i in range(n):
+        # Both kinds of date start with a digit
+        if not password[i].isdigit():
+            continue
+        for j in range(i + 3, min(n, i + 10)):
+            token = password[i:j + 1]
+            if token.isdigit():
+                year = _year_in_digits(token)
+                separator = ''
+            else:
+                found = _DATE_WITH_SEPARATOR.fullmatch(token)
+                year = found and _year_in_parts(found.group(1), found.group(3), found.group(4))
+                separator = found.group(2) if found else ''
+            if year is not None:
+                guesses = 365 * max(abs(REFERENCE_YEAR - year), MIN_YEAR_SPACE) * (4 if separator else 1)
+                matches.append(Match('date', i, j, token, guesses, year=year, separator=separator))
+    for found in re.finditer(r'(?=(19\d\d|20\d\d))', password):
+        year = int(found.group(1))
+        matches.append(Match('date', found.start(), found.start() + 3, found.group(1),
+                             max(abs(REFERENCE_YEAR - year), MIN_YEAR_SPACE), year=year, separator=''))
+    return matches
+
+
+def _year_in_digits(digits: str) -> int | None:
+    # Tries every way of cutting 4-8 digits into day, month and a 2 or 4 digit year
+    if len(digits) > 8:
+        return None
+    for year_length in (4, 2):
+        for year_first in (False, True):
+            rest_length = len(digits) - year_length
+            if not 2 <= rest_length <= 4:
+                continue
+            year = digits[:year_length] if year_first else digits[-year_length:]
+            rest = digits[year_length:] if year_first else digits[:rest_length]
+            for cut in range(1, len(rest)):
+                found = _year_in_parts(rest[:cut], rest[cut:], year) if not year_first \
+                    else _year_in_parts(year, rest[:cut], rest[cut:])
+                if found is not None:
+                    return found
+    return None
+
+
+def _year_in_parts(first: str, second: str, third: str) -> int | None:
+    if len(first) in (2, 4) and len(third) <= 2:
+        year, day_month = first, (int(second), int(third))
+    elif len(third) in (2, 4) and len(first) <= 2:
+        year, day_month = third, (int(first), int(second))
+    else:
+        return None
+    day, month = max(day_month), min(day_month)
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    if len(year) == 2:
+        return int(year) + (1900 if int(year) > 50 else 2000)
+    return int(year) if 1000 <= int(year) <= 2050 else None
+
+
+# ---- guesses ----------------------------------------------------------------
+
+def _binomial(n: int, k: int) -> int:
+    return math.comb(n, k) if 0 <= k <= n else 0
+
+
+def _uppercase_variations(token: str) -> int:
+    upper = sum(1 for c in token if c.isupper())
+    lower = sum(1 for c in token if c.islower())
+    if upper == 0:
+        return 1
+    # Capitalised first letter, last letter or whole word are the common cases
+    if lower == 0 or (upper == 1 and (token[0].isupper() or token[-1].isupper())):
+        return 2
+    return sum(_binomial(upper + lower, k) for k in range(1, min(upper, lower) + 1))
+
+
+def _l33t_variations(token: str, used: dict) -> int:
+    variations = 1
+    lower = token.lower()
+    for sub, letter in used.items():
+        subbed = lower.count(sub)
+        unsubbed = lower.count(letter)
+        if subbed == 0 or unsubbed == 0:
+            variations *= 2
+        else:
+            variations *= sum(_binomial(subbed + unsubbed, k) for k in range(1, min(subbed, unsubbed) + 1))
+    return variations
+
+
+def _spatial_guesses(length: int, turns: int, keys: int, degree: float, shifted: int) -> float:
+    guesses = 0
+    for i in range(2, length + 1):
+        for j in range(1, min(turns, i - 1) + 1):
+            guesses += _binomial(i - 1, j - 1) * keys * degree ** j
+    unshifted = length - shifted
+    if shifted and not unshifted:
+        guesses *= 2
+    elif shifted:
+        guesses *= sum(_binomial(length, k) for k in range(1, min(shifted, unshifted) + 1))
+    return guesses
+
+
+def _most_guessable(password: str, matches: list[Match]) -> tuple[float, list[Match]]:
+    # Dynamic programme over prefixes: best[k][l] is the cheapest way to cover
+    # password[:k + 1] with l matches, stored as (score, product of guesses, match, previous l,
+    # start of the match). A sequence of l matches costs l! * product + D^(l - 1), which
+    # penalises long chains of small matches the same way zxcvbn does.
+    n = len(password)
+    if n == 0:
+        return 1, []
+    by_end = [[] for _ in range(n)]
+    for match in matches:
+        by_end[match.j].append(match)
+    best = [{} for _ in range(n)]
+    # Sequence length -> (product of guesses, start) of the cheapest brute force run to begin
+    run_starts = {}
+    # A sequence has at most n matches, so the per-length factors are worked out once
+    factorials = [math.factorial(length) for length in range(n + 1)]
+    penalties = [0] + [MIN_GUESSES_BEFORE_GROWING_SEQUENCE ** (length - 1) for length in range(1, n + 1)]
+
+    def consider(match, start, guesses, k, length, product_so_far):
+        # match is None for a brute force run; its Match is only built if it is in the result
+        product_so_far *= guesses
+        score = factorials[length] * product_so_far + penalties[length]
+        current = best[k].get(length)
+        if current is None or score < current[0]:
+            best[k][length] = (score, product_so_far, match, length - 1, start)
+
+    for k in range(n):
+        for match in by_end[k]:
+            guesses = match.guesses
+            if len(match.token) < n:
+                floor = MIN_SUBMATCH_GUESSES_SINGLE_CHAR if len(match.token) == 1 else MIN_SUBMATCH_GUESSES_MULTI_CHAR
+                guesses = max(guesses, floor)
+            if match.i == 0:
+                consider(match, 0, guesses, k, 1, 1)
+            else:
+                for length, (_, product_so_far, _, _, _) in best[match.i - 1].items():
+                    consider(match, match.i, guesses, k, length + 1, product_so_far)
+        # Brute force guesses, D^run length, are never below the sub-match minimums
+        consider(None, 0, BRUTEFORCE_CARDINALITY ** (k + 1), k, 1, 1)
+        for length, (product_so_far, i) in run_starts.items():
+            consider(None, i, BRUTEFORCE_CARDINALITY ** (k - i + 1), k, length + 1, product_so_far)
+
+        # Lengths whose sequences always lose to a shorter one are dropped: whatever follows,
+        # a shorter sequence with no more guesses stays cheaper, as long as it can be
+        # followed by everything the longer one can. Keeps best[k] to a few lengths.
+        candidates = best[k]
+        fewest = fewest_open = math.inf
+        for length in sorted(candidates):
+            _, product_so_far, match, _, _ = candidates[length]
+            if match is None:
+                if product_so_far >= fewest:
+                    del candidates[length]
+                else:
+                    fewest = product_so_far
+                continue
+            if product_so_far >= fewest_open:
+                del candidates[length]
+                continue
+            fewest = min(fewest, product_so_far)
+            fewest_open = product_so_far
+            # Two brute force runs in a row are never better than one longer run, so runs
+            # only follow other matches. A run from k + 1 to K then costs product * D^(K - k):
+            # for each length the cheapest place to start one is the same for every K.
+            start = run_starts.get(length)
+            if start is None or product_so_far < start[0] * BRUTEFORCE_CARDINALITY ** (k + 1 - start[1]):
+                run_starts[length] = (product_so_far, k + 1)
+
+    length, (score, _, _, _, _) = min(best[n - 1].items(), key=lambda item: item[1][0])
+    sequence = []
+    k = n - 1
+    while length:
+        _, _, match, previous, start = best[k][length]
+        if match is None:
+            match = Match('bruteforce', start, k, password[start:k + 1], BRUTEFORCE_CARDINALITY ** (k - start + 1))
+        sequence.append(match)
+        k = start - 1
+        length = previous
+    return score, sequence[::-1]
+
+
+# ---- feedback ---------------------------------------------------------------
+
+DEFAULT_SUGGESTIONS = ['Use a few words, avoid common phrases', 'No need for symbols, digits, or uppercase letters']
+
+
+def _feedback(password: str, score: int, sequence: list[Match]) -> tuple[str, list[str]]:
+    if not password:
+        return '', DEFAULT_SUGGESTIONS
+    if score > 2:
+        return '', []
+    longest = max(sequence, key=lambda match: len(match.token))
+    warning, suggestions = _match_feedback(longest, len(sequence) == 1)
+    return warning, ['Add another word or two. Uncommon words are better.'] + suggestions
+
+
+def _match_feedback(match: Match, whole: bool) -> tuple[str, list[str]]:
+    if match.pattern == 'dictionary':
+        return _dictionary_feedback(match, whole)
+    if match.pattern == 'spatial':
+        if match.details['turns'] == 1:
+            return 'Straight rows of keys are easy to guess', ['Use a longer keyboard pattern with more turns']
+        return 'Short keyboard patterns are easy to guess', ['Use a longer keyboard pattern with more turns']
+    if match.pattern == 'repeat':
+        if len(match.details['base']) == 1:
+            return 'Repeats like "aaa" are easy to guess', ['Avoid repeated words and characters']
+        return 'Repeats like "abcabcabc" are only slightly harder to guess than "abc"', \
+            ['Avoid repeated words and characters']
+    if match.pattern == 'sequence':
+        return 'Sequences like abc or 6543 are easy to guess', ['Avoid sequences']
+    if match.pattern == 'date':
+        if match.details['separator'] or len(match.token) > 4:
+            return 'Dates are often easy to guess', ['Avoid dates and years that are associated with you']
+        return 'Recent years are easy to guess', ['Avoid recent years', 'Avoid years that are associated with you']
+    return '', []
+
+
+def _dictionary_feedback(match: Match, whole: bool) -> tuple[str, list[str]]:
+    name = match.details['dictionary']
+    warning = ''
+    if name == 'common_passwords':
+        if whole and not match.details.get('l33t') and not match.details.get('reversed'):
+            if match.details['rank'] <= 10:
+                warning = 'This is a top-10 common password'
+            elif match.details['rank'] <= 100:
+                warning = 'This is a top-100 common password'
+            else:
+                warning = 'This is a very common password'
+        else:
+            warning = 'This is similar to a commonly used password'
+    elif name == 'english' and whole:
+        warning = 'A word by itself is easy to guess'
+    elif name == 'names':
+        warning = 'Names and surnames by themselves are easy to guess' if whole \
+            else 'Common names and surnames are easy to guess'
+
+    suggestions = []
+    token = match.token
+    if token[:1].isupper() and token[1:].lower() == token[1:]:
+        suggestions.append("Capitalization doesn't help very much")
+    elif token.isupper() and token.lower() != token:
+        suggestions.append('All-uppercase is almost as easy to guess as all-lowercase')
+    if match.details.get('reversed') and len(token) >= 4:
+        suggestions.append("Reversed words aren't much harder to guess")
+    if match.details.get('l33t'):
+        suggestions.append("Predictable substitutions like '@' instead of 'a' don't help very much")
+    return warning, suggestions
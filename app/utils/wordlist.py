@@ -0,0 +1,97 @@
+import mmap
+import os
+import struct
+import threading
+import bootstrap
+
+# Compiled wordlist layout:
+#   MAGIC | word count (uint32) | count + 1 offsets (uint32) | UTF-8 words back to back
+# Word i is blob[offsets[i]:offsets[i + 1]], so a lookup is two offset reads and a slice
+# of the memory map; nothing is parsed into Python lists at start-up.
+MAGIC = b'PGWL0001'
+_UINT32 = struct.Struct('<I')
+INDEX_SUFFIX = '.idx'
+
+
+def _read_words(source_path: str):
+    # Accepts plain lists (one word per line) and diceware lists ("11111<TAB>abacus"):
+    # the word is the last field on the line
+    seen = set()
+    with open(source_path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.split()
+            if not fields or line.startswith('#'):
+                continue
+            word = fields[-1]
+            if word not in seen:
+                seen.add(word)
+                yield word
+
+
+def compile_wordlist(source_path: str, target_path: str) -> int:
+    offsets = [0]
+    tmp_path = f'{target_path}.tmp'
+    blob_path = f'{target_path}.blob'
+    with open(blob_path, 'wb') as blob:
+        for word in _read_words(source_path):
+            encoded = word.encode()
+            blob.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    count = len(offsets) - 1
+    if count == 0:
+        os.remove(blob_path)
+        raise ValueError(f'No words found in {source_path}')
+    with open(tmp_path, 'wb') as target, open(blob_path, 'rb') as blob:
+        target.write(MAGIC)
+        target.write(_UINT32.pack(count))
+        target.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        while chunk := blob.read(1024 * 1024):
+            target.write(chunk)
+    os.remove(blob_path)
+    os.replace(tmp_path, target_path)
+    return count
+
+
+class Wordlist:
+
+    def __init__(self, index_path: str):
+        with open(index_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{index_path} is not a compiled wordlist')
+        (self._count,) = _UINT32.unpack_from(self._map, len(MAGIC))
+        self._offsets_start = len(MAGIC) + _UINT32.size
+        self._blob_start = self._offsets_start + (self._count + 1) * _UINT32.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start, end = struct.unpack_from('<2I', self._map, self._offsets_start + index * _UINT32.size)
+        return self._map[self._blob_start + start:self._blob_start + end].decode()
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_wordlist(source_path: str | None = None) -> Wordlist:
+    # The index is built next to the source list on first use and rebuilt when the
+    # source is newer; later processes only map the existing index
+    source_path = source_path or bootstrap.settings().wordlist_path
+    index_path = source_path if source_path.endswith(INDEX_SUFFIX) else source_path + INDEX_SUFFIX
+    with _loaded_lock:
+        if index_path not in _loaded:
+            if index_path != source_path and os.path.exists(source_path) and (
+                    not os.path.exists(index_path)
+                    or os.path.getmtime(index_path) < os.path.getmtime(source_path)):
+                compile_wordlist(source_path, index_path)
+            _loaded[index_path] = Wordlist(index_path)
+        return _loaded[index_path]
+
+
+def wordlist_available(source_path: str | None = None) -> bool:
+    source_path = source_path or bootstrap.settings().wordlist_path
+    return os.path.exists(source_path) or os.path.exists(source_path + INDEX_SUFFIX)